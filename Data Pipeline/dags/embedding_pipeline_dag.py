@@ -1,8 +1,12 @@
 import logging
 import os
 import subprocess
+import shutil
 import json
 import glob
+import sqlite3
+import zlib
+import numpy as np
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
 from airflow import DAG
@@ -16,7 +20,7 @@ from google.cloud import storage
 from google.oauth2 import service_account
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
+from pinecone import Pinecone
 from urllib.parse import urlparse
 
 # Configuration (Cleaned up)
@@ -40,6 +44,22 @@ for var_name, var_value in {
 TMP_DIR = "/opt/airflow/tmp/embeddings"
 BATCH_SIZE = 32
 MAX_BATCHES = 10
+PINECONE_INDEX_NAME = "airflowtest"
+UPSERT_BATCH_SIZE = 100
+# Set to "false" to keep chunk text out of Pinecone metadata (served from the document store instead)
+PINECONE_STORE_TEXT = os.getenv("PINECONE_STORE_TEXT", "true").lower() == "true"
+DOC_STORE_FILE = f"{TMP_DIR}/docstore.sqlite"
+VECTOR_SNAPSHOT_DIR = f"{TMP_DIR}/vectors"
+FAQ_INDEX_FILE = f"{TMP_DIR}/faq.npz"
+# Model Pipeline/python-service and the virtualenv of its requirements, installed by the
+# Airflow image and used to precompute the FAQ answers
+SERVICE_DIR = os.getenv("ASKNEU_SERVICE_DIR", "/opt/airflow/python-service")
+SERVICE_PYTHON = os.getenv("ASKNEU_SERVICE_PYTHON", "/opt/airflow/python-service-venv/bin/python")
+# Query log files uploaded by the python-service (ASKNEU_QUERY_LOG_UPLOAD_URL), mined for FAQ questions
+QUERY_LOG_PREFIX = "query_logs"
+QUERY_LOG_DIR = f"{TMP_DIR}/query_logs"
+QUERY_LOG_DAYS = 7  # Matches the service's FAQ_CONFIG["mine_hours"]
+ARTIFACTS_PREFIX = "artifacts"
 DVC_REPO_PATH = "/opt/airflow/dags/src"
 DVC_REMOTE_NAME = "gcs-store"
 DVC_REMOTE_URL = f"gs://{GCS_BUCKET_NAME}/dvc-storage"
@@ -107,7 +127,7 @@ def list_and_batch_files():
     bucket = storage_client.bucket(GCS_BUCKET_NAME)
     blobs = list(bucket.list_blobs(prefix="scraped_texts/"))
     files = [b.name for b in blobs if b.name.endswith(".txt")]
-    for f in glob.glob(f"{TMP_DIR}/batch_*.json"):
+    for f in glob.glob(f"{TMP_DIR}/batch_*.json") + glob.glob(f"{TMP_DIR}/chunks_*.jsonl") + glob.glob(f"{TMP_DIR}/vectors_*.npy"):
         os.remove(f)
     os.makedirs(TMP_DIR, exist_ok=True)
     for batch_idx, i in enumerate(range(0, len(files), BATCH_SIZE)):
@@ -120,7 +140,7 @@ def process_batch(batch_idx: int):
     storage_client = storage.Client(credentials=credentials)
     bucket = storage_client.bucket(GCS_BUCKET_NAME)
     embeddings = OpenAIEmbeddings(model="text-embedding-3-small", openai_api_key=OPENAI_API_KEY)
-    vector_store = PineconeVectorStore(index_name="airflowtest", embedding=embeddings, pinecone_api_key=PINECONE_API_KEY)
+    index = Pinecone(api_key=PINECONE_API_KEY).Index(PINECONE_INDEX_NAME)
 
     batch_file = f"{TMP_DIR}/batch_{batch_idx}.json"
     if not os.path.exists(batch_file):
@@ -129,6 +149,8 @@ def process_batch(batch_idx: int):
     with open(batch_file, "r") as f:
         file_paths = json.load(f)
 
+    # Chunk records and vectors for the local document store and vector snapshot
+    records, record_vectors = [], []
     processed, failed = 0, 0
     for file_path in file_paths:
         try:
@@ -145,17 +167,145 @@ def process_batch(batch_idx: int):
             parsed_url = urlparse(source)
             subdomain = parsed_url.hostname.split('.')[0] if parsed_url.hostname else "Northeastern"
             unix_date = datetime.fromisoformat(date_line).timestamp()
-            vector_store.add_texts(
-                texts=chunks,
-                metadatas=[{"source": source, "date": date_line, "unix_time": unix_date, "subdomain": subdomain} for _ in chunks],
-                ids=[f"{filename_stem}_{i}" for i in range(len(chunks))]
-            )
+            metadata = {"source": source, "date": date_line, "unix_time": unix_date, "subdomain": subdomain}
+            ids = [f"{filename_stem}_{i}" for i in range(len(chunks))]
+            vectors = embeddings.embed_documents(chunks)
+            upserts = [
+                {"id": chunk_id, "values": vector, "metadata": {**metadata, "text": chunk} if PINECONE_STORE_TEXT else metadata}
+                for chunk_id, vector, chunk in zip(ids, vectors, chunks)
+            ]
+            for start in range(0, len(upserts), UPSERT_BATCH_SIZE):
+                index.upsert(vectors=upserts[start:start + UPSERT_BATCH_SIZE])
+            records.extend({"id": chunk_id, "namespace": "", "text": chunk, "metadata": metadata} for chunk_id, chunk in zip(ids, chunks))
+            record_vectors.extend(vectors)
             processed += 1
         except Exception as e:
             logging.error(f"Error processing {file_path}: {str(e)}")
             failed += 1
+    # Rewritten on every (re)try of this batch
+    with open(f"{TMP_DIR}/chunks_{batch_idx}.jsonl", "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    np.save(f"{TMP_DIR}/vectors_{batch_idx}.npy", np.asarray(record_vectors, dtype=np.float32))
     return {"processed": processed, "failed": failed}
 
+def build_document_store():
+    """Pack the chunk records of all batches into a SQLite document store and upload it to GCS."""
+    if os.path.exists(DOC_STORE_FILE):
+        os.remove(DOC_STORE_FILE)
+
+    conn = sqlite3.connect(DOC_STORE_FILE)
+    conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute("CREATE TABLE chunks (namespace TEXT, id TEXT, text BLOB, metadata TEXT, PRIMARY KEY (namespace, id)) WITHOUT ROWID")
+
+    count = 0
+    for records_path in sorted(glob.glob(f"{TMP_DIR}/chunks_*.jsonl")):
+        with open(records_path, "r") as f:
+            rows = []
+            for line in f:
+                record = json.loads(line)
+                rows.append((
+                    record["namespace"],
+                    record["id"],
+                    zlib.compress(record["text"].encode("utf-8")),
+                    json.dumps(record["metadata"], separators=(",", ":"))
+                ))
+            conn.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?)", rows)
+            count += len(rows)
+    if not count:
+        conn.close()
+        raise AirflowFailException("No chunk records found to build the document store!")
+
+    build_id = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    conn.executemany("INSERT INTO meta VALUES (?, ?)", [("build_id", build_id), ("chunks", str(count))])
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+
+    credentials = get_gcp_credentials()
+    storage_client = storage.Client(credentials=credentials)
+    bucket = storage_client.bucket(GCS_BUCKET_NAME)
+    bucket.blob(f"{ARTIFACTS_PREFIX}/docstore.sqlite").upload_from_filename(DOC_STORE_FILE)
+    logging.info(f"Uploaded document store build {build_id} with {count} chunks")
+    return count
+
+def build_vector_snapshot():
+    """Write a normalized vector matrix per namespace for the service's local index and upload it to GCS."""
+    ids, metadatas, vectors = {}, {}, {}
+    for records_path in sorted(glob.glob(f"{TMP_DIR}/chunks_*.jsonl")):
+        vectors_path = records_path.replace("chunks_", "vectors_").replace(".jsonl", ".npy")
+        if not os.path.exists(vectors_path):
+            continue
+        batch_vectors = np.load(vectors_path)
+        with open(records_path, "r") as f:
+            for record, vector in zip(map(json.loads, f), batch_vectors):
+                namespace = record["namespace"] or "__default__"
+                ids.setdefault(namespace, []).append(record["id"])
+                metadatas.setdefault(namespace, []).append(record["metadata"])
+                vectors.setdefault(namespace, []).append(vector)
+    if not ids:
+        raise AirflowFailException("No chunk vectors found to build the vector snapshot!")
+
+    credentials = get_gcp_credentials()
+    storage_client = storage.Client(credentials=credentials)
+    bucket = storage_client.bucket(GCS_BUCKET_NAME)
+
+    for namespace in ids:
+        matrix = np.asarray(vectors[namespace], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        namespace_dir = os.path.join(VECTOR_SNAPSHOT_DIR, namespace)
+        os.makedirs(namespace_dir, exist_ok=True)
+        np.save(os.path.join(namespace_dir, "vectors.npy"), matrix / norms)
+        with open(os.path.join(namespace_dir, "rows.json"), "w") as f:
+            json.dump({"ids": ids[namespace], "metadata": metadatas[namespace]}, f, separators=(",", ":"))
+        for file_name in ("vectors.npy", "rows.json"):
+            bucket.blob(f"{ARTIFACTS_PREFIX}/vectors/{namespace}/{file_name}").upload_from_filename(
+                os.path.join(namespace_dir, file_name)
+            )
+        logging.info(f"Uploaded vector snapshot for namespace {namespace} with {len(matrix)} vectors")
+    return sum(len(namespace_ids) for namespace_ids in ids.values())
+
+def download_query_logs(bucket) -> int:
+    """Download the query log files the python-service uploaded during the last QUERY_LOG_DAYS days."""
+    shutil.rmtree(QUERY_LOG_DIR, ignore_errors=True)
+    os.makedirs(QUERY_LOG_DIR, exist_ok=True)
+    since = datetime.now().astimezone() - timedelta(days=QUERY_LOG_DAYS)
+    downloaded = 0
+    for blob in bucket.list_blobs(prefix=f"{QUERY_LOG_PREFIX}/"):
+        file_name = os.path.basename(blob.name)
+        if not file_name.endswith(".jsonl.gz") or blob.updated < since:
+            continue
+        blob.download_to_filename(os.path.join(QUERY_LOG_DIR, file_name))
+        downloaded += 1
+    logging.info(f"Downloaded {downloaded} query log files from gs://{GCS_BUCKET_NAME}/{QUERY_LOG_PREFIX}")
+    return downloaded
+
+def build_faq_index():
+    """Precompute the FAQ answers against the new document store and vector snapshot and upload the index to GCS."""
+    if not os.path.isfile(os.path.join(SERVICE_DIR, "main.py")) or not os.path.isfile(SERVICE_PYTHON):
+        raise AirflowFailException(f"python-service not installed at {SERVICE_DIR} ({SERVICE_PYTHON}); rebuild the Airflow image")
+
+    if os.path.exists(FAQ_INDEX_FILE):
+        os.remove(FAQ_INDEX_FILE)
+
+    credentials = get_gcp_credentials()
+    storage_client = storage.Client(credentials=credentials)
+    bucket = storage_client.bucket(GCS_BUCKET_NAME)
+    if not download_query_logs(bucket):
+        logging.warning("No query logs uploaded by the python-service, only the curated FAQ questions are precomputed")
+
+    # The service reads the artifacts just built in TMP_DIR, so the answers match the new corpus
+    env = {**os.environ, "ASKNEU_ARTIFACTS_DIR": TMP_DIR, "ASKNEU_QUERY_LOG_DIR": QUERY_LOG_DIR}
+    subprocess.run([SERVICE_PYTHON, "main.py", "faq", "--output", FAQ_INDEX_FILE], cwd=SERVICE_DIR, env=env, check=True)
+    if not os.path.exists(FAQ_INDEX_FILE):
+        logging.warning("No FAQ questions were precomputed")
+        return 0
+
+    bucket.blob(f"{ARTIFACTS_PREFIX}/faq.npz").upload_from_filename(FAQ_INDEX_FILE)
+    logging.info(f"Uploaded FAQ index ({os.path.getsize(FAQ_INDEX_FILE)} bytes)")
+    return os.path.getsize(FAQ_INDEX_FILE)
+
 # (Your existing DAG definition remains unchanged, as it's correct)
 
 
@@ -245,6 +395,22 @@ with DAG(
             process_tasks.append(task)
         list_files >> process_tasks
 
+    # Local serving artifacts
+    with TaskGroup("artifacts_group") as artifact_tasks:
+        build_doc_store = PythonOperator(
+            task_id="build_document_store",
+            python_callable=build_document_store
+        )
+        build_vectors = PythonOperator(
+            task_id="build_vector_snapshot",
+            python_callable=build_vector_snapshot
+        )
+        build_faq = PythonOperator(
+            task_id="build_faq_index",
+            python_callable=build_faq_index
+        )
+        [build_doc_store, build_vectors] >> build_faq
+
     # Notification and cleanup
     email_summary = PythonOperator(
         task_id="prepare_email_summary",
@@ -268,5 +434,5 @@ with DAG(
     scrape_data >> validate >> [upload_gcs, version_scraped_data]
     upload_gcs >> embedding_tasks
     version_scraped_data >> embedding_tasks
-    embedding_tasks >> version_processed_batches
+    embedding_tasks >> artifact_tasks >> version_processed_batches
     version_processed_batches >> email_summary >> notifications >> cleanup
\ No newline at end of file
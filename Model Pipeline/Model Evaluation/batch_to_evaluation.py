@@ -0,0 +1,91 @@
+import argparse
+import json
+import re
+import pandas as pd
+
+
+QUESTIONS_FILE = "Model Pipeline/Model Evaluation/question.xlsx"
+
+
+def normalize_question(question):
+    """Collapse whitespace so sheet cells and batch input lines match."""
+    return re.sub(r"\s+", " ", str(question)).strip()
+
+
+def export_questions(sheet_file, questions_file):
+    """Write the sheet's questions one per line, as input for `python main.py batch`."""
+    df = pd.read_excel(sheet_file)
+    questions = [normalize_question(q) for q in df['Question'] if not pd.isna(q)]
+    with open(questions_file, 'w') as f:
+        f.write("\n".join(questions) + "\n")
+    print(f"Wrote {len(questions)} questions to {questions_file}")
+
+
+def load_batch_results(results_file):
+    """
+    Read `main.py batch` JSONL output into {question: (answer, synthesis tier)}.
+
+    Failed questions (error or synthesis_error) are skipped; when a question was
+    answered again after a resume, the last answer wins.
+    """
+    results = {}
+    with open(results_file, 'r') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A line cut short by a crash
+            metrics = result.get('metrics', {})
+            if 'error' in result or 'synthesis_error' in metrics:
+                continue
+            # The answer as shown to users, without the appended sources
+            answer = result.get('answer', '').split("Sources:", 1)[0].strip()
+            results[normalize_question(result.get('question', ''))] = (answer, metrics.get('synthesis_tier'))
+    return results
+
+
+def merge_batch_results(sheet_file, results_file, output_file):
+    """Fill 'Model Generated' and 'Tier' of the sheet's questions from batch results."""
+    df = pd.read_excel(sheet_file)
+    results = load_batch_results(results_file)
+    for column in ('Model Generated', 'Tier'):
+        if column not in df.columns:
+            df[column] = None
+        df[column] = df[column].astype(object)
+
+    matched = 0
+    for i, question in df['Question'].items():
+        result = results.get(normalize_question(question)) if not pd.isna(question) else None
+        if result is None:
+            continue
+        df.loc[i, 'Model Generated'], df.loc[i, 'Tier'] = result
+        matched += 1
+
+    df.to_excel(output_file, index=False)
+    print(f"Filled {matched}/{len(df)} questions from {results_file} into {output_file}")
+    if matched < len(df):
+        print("Questions without a successful batch answer keep their previous answer and no tier")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move `main.py batch` results into the evaluation sheet")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    questions_parser = subparsers.add_parser('questions', help="Export the sheet's questions for main.py batch")
+    questions_parser.add_argument('output', help="Questions file, one per line")
+    questions_parser.add_argument('--sheet', default=QUESTIONS_FILE, help="Evaluation sheet")
+
+    merge_parser = subparsers.add_parser('merge', help="Fill answers and synthesis tiers from batch results")
+    merge_parser.add_argument('results', help="JSONL output of main.py batch")
+    merge_parser.add_argument('--sheet', default=QUESTIONS_FILE, help="Evaluation sheet")
+    merge_parser.add_argument('--output', help="Sheet to write (default: update --sheet in place)")
+
+    args = parser.parse_args()
+    if args.command == 'questions':
+        export_questions(args.sheet, args.output)
+    else:
+        merge_batch_results(args.sheet, args.results, args.output or args.sheet)
+
+
+if __name__ == "__main__":
+    main()
@@ -170,6 +170,14 @@ def main():
         # Calculate overall average
         overall_avg = sum(avg_scores.values()) / len(avg_scores)
         print(f"\nOverall Average Score: {overall_avg:.2f}")
+        
+        # Quality per synthesis model tier (the 'synthesis_tier' metric of batch results)
+        if 'Tier' in result_df.columns:
+            tier_scores = result_df.groupby('Tier')[score_columns].mean()
+            tier_scores['Overall'] = tier_scores.mean(axis=1)
+            tier_scores['Questions'] = result_df.groupby('Tier').size()
+            print("\nAverage Scores by Tier:")
+            print(tier_scores.round(2).to_string())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,159 @@
+"""
+Answer cache module that combines the LRU answer cache with user feedback.
+Answers rated positive are pinned: they are kept outside the LRU/TTL bounds until the
+index is rebuilt. Questions with a negative rating are evicted and never cached again
+for the current index. With a shared tier, ratings are recorded there as well and
+checked on every lookup, so a rating given to one worker applies to all of them.
+Lookups are counted per rating bucket.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from cache import LRUCache
+
+# Rating buckets of the lookup counters
+RATING_BUCKETS = ("positive", "negative", "unrated")
+
+
+class AnswerCache:
+    """LRU answer cache with pinned (positively rated) and excluded (negatively rated) keys."""
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: Optional[float],
+        max_pinned: int = 1000,
+        max_excluded: int = 10000,
+        entries: Optional[Any] = None,
+        ratings: Optional[Any] = None
+    ):
+        """
+        Create an empty cache.
+
+        Args:
+            maxsize: Unrated answers kept, least recently used evicted first
+            ttl: Seconds an unrated answer stays valid
+            max_pinned: Pinned answers kept; the oldest pin is dropped beyond this
+            max_excluded: Negatively rated keys remembered
+            entries: Cache of the unrated answers with the LRUCache interface (e.g. a
+                shared_cache.LayeredCache); defaults to an LRUCache of maxsize and ttl
+            ratings: Cache shared by workers (e.g. a shared_cache.LayeredCache) in which
+                ratings and pinned answers are recorded; None keeps ratings per process
+        """
+        self.entries = entries if entries is not None else LRUCache(maxsize, ttl)
+        self.ratings = ratings
+        self.max_pinned = max_pinned
+        # Pinned keys map to the answer, or to None until the next answer for the key is computed
+        self.pinned = OrderedDict()
+        self.excluded = LRUCache(max_excluded)
+        self.lookups = {bucket: {"hits": 0, "misses": 0} for bucket in RATING_BUCKETS}
+        self._lock = threading.Lock()
+
+    def bucket(self, key: Tuple) -> str:
+        """Rating bucket of a key."""
+        if self.excluded.peek(key) is not None:
+            return "negative"
+        if key in self.pinned:
+            return "positive"
+        return "unrated"
+
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        """Return the cached answer for a key, or None; excluded keys always miss."""
+        with self._lock:
+            bucket = self.bucket(key)
+            value = self.pinned[key] if bucket == "positive" else None
+        # Outside the lock: a shared entries tier may take a network round trip
+        if bucket != "negative" and self.ratings is not None:
+            # Adopt a rating another worker recorded
+            rating = self.ratings.get(key)
+            if rating is not None and rating.get("rating") == "negative":
+                self._exclude(key)
+                bucket, value = "negative", None
+            elif rating is not None and bucket == "unrated":
+                with self._lock:
+                    if self.excluded.peek(key) is None:
+                        self._pin(key, rating.get("answer"))
+                bucket, value = "positive", rating.get("answer")
+        if value is None and bucket != "negative":
+            value = self.entries.get(key)
+        with self._lock:
+            self.lookups[bucket]["hits" if value is not None else "misses"] += 1
+        return value
+
+    def set(self, key: Tuple, value: Dict[str, Any]) -> None:
+        """Cache a freshly computed answer, filling a pending pin; excluded keys are skipped."""
+        with self._lock:
+            if self.excluded.peek(key) is not None:
+                return
+            pending_pin = key in self.pinned and self.pinned[key] is None
+            if pending_pin:
+                self.pinned[key] = value
+        if pending_pin:
+            self._share_rating(key, {"rating": "positive", "answer": value})
+        else:
+            self.entries.set(key, value)
+
+    def _pin(self, key: Tuple, value: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Pin a key in this process (the caller holds the lock) and return its pinned answer."""
+        for stale in [pinned for pinned in self.pinned if pinned[0] != key[0]]:
+            del self.pinned[stale]
+        self.pinned[key] = self.pinned.get(key) or value
+        self.pinned.move_to_end(key)
+        while len(self.pinned) > self.max_pinned:
+            self.pinned.popitem(last=False)
+        return self.pinned[key]
+
+    def pin(self, key: Tuple) -> None:
+        """
+        Pin the answer of a positively rated question unless it was rated negative.
+
+        Keys start with the index version, so pins of an older index are dropped.
+        """
+        if self.ratings is not None:
+            rating = self.ratings.get(key)
+            if rating is not None and rating.get("rating") == "negative":
+                # Another worker rated it negative first
+                self._exclude(key)
+                return
+        value = self.entries.peek(key)
+        with self._lock:
+            if self.excluded.peek(key) is not None:
+                return
+            value = self._pin(key, value)
+        self.entries.delete(key)
+        self._share_rating(key, {"rating": "positive", "answer": value})
+
+    def _exclude(self, key: Tuple) -> None:
+        """Evict a key and stop caching it in this process."""
+        with self._lock:
+            self.pinned.pop(key, None)
+            self.excluded.set(key, True)
+        self.entries.delete(key)
+
+    def exclude(self, key: Tuple) -> None:
+        """Evict a negatively rated answer and stop caching its question."""
+        self._exclude(key)
+        self._share_rating(key, {"rating": "negative"})
+
+    def _share_rating(self, key: Tuple, rating: Dict[str, Any]) -> None:
+        if self.ratings is not None:
+            self.ratings.set(key, rating)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return LRU counters, pin/exclusion counts and the hit rate per rating bucket."""
+        with self._lock:
+            buckets = {
+                bucket: {
+                    **counts,
+                    "hit_rate": counts["hits"] / (counts["hits"] + counts["misses"]) if counts["hits"] + counts["misses"] else 0.0
+                }
+                for bucket, counts in self.lookups.items()
+            }
+            return {
+                **self.entries.stats(),
+                "pinned": sum(1 for value in self.pinned.values() if value is not None),
+                "pending_pins": sum(1 for value in self.pinned.values() if value is None),
+                "excluded": len(self.excluded),
+                "buckets": buckets
+            }
@@ -0,0 +1,268 @@
+"""
+Offline throughput/latency/memory benchmark of the full RAGAgent graph.
+The agent is built with the local stand-ins from benchmarks.stand_ins instead of
+Pinecone, OpenAI, Gemini and Cohere, over a synthetic corpus, so it runs without API
+keys or network. With the default zero-latency stand-ins the numbers are the agent's
+own overhead (graph, state copies, reranking and filtering code); realistic latency
+distributions and failure rates can be set per service.
+
+Per mode and concurrency it reports throughput, errors, p50/p95/p99 of every stage in
+processing_time plus 'other' (total minus the named stages: graph plumbing), and the
+peak and retained Python memory of a second, traced pass. --output writes the results
+as JSON and --baseline compares against an earlier output, exiting non-zero when the
+'total' or 'other' p95 or the throughput regressed by more than --max-regression.
+
+Run from the python-service directory:
+    python -m benchmarks.agent_overhead
+    python -m benchmarks.agent_overhead --concurrency 1 8 --llm-latency 400,1500,0.01 --rerank-latency 120,300,0.02
+    python -m benchmarks.agent_overhead --output overhead.json --baseline baseline.json
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+import numpy as np
+import config
+from benchmarks.local_index import percentile_ms
+
+TOPICS = [
+    "co-op", "course registration", "tuition payment", "financial aid", "housing", "dining plans",
+    "graduation", "transcripts", "international student visas", "library services", "health insurance",
+    "academic advising", "parking permits", "study abroad", "Canvas", "exam schedules"
+]
+SUBDOMAINS = ["catalog", "registrar", "studentfinance", "international", "canvas", "housing"]
+QUESTION_TEMPLATES = [
+    "How do I apply for {topic}?",
+    "What are the deadlines for {topic} in the {term} term?",
+    "Who should I contact about {topic}?",
+    "How does {topic} work for graduate students?",
+    "Compare {topic} and {other} for first-year students",
+    "What changed in {topic} and {other} this year?"
+]
+TERMS = ["fall", "spring", "summer 1", "summer 2"]
+TIMED_STAGES = ["condense", "namespace_routing", "routing", "decomposition", "search", "reranking", "synthesis"]
+
+
+def build_corpus(store: Any, chunks: int, chunk_chars: int, seed: int = 0) -> None:
+    """Fill the default namespace with synthetic page chunks about campus topics."""
+    rng = np.random.default_rng(seed)
+    texts, metadatas, ids = [], [], []
+    for i in range(chunks):
+        topic, other = rng.choice(TOPICS, size=2, replace=False)
+        sentence = f"Information about {topic} at Northeastern University, including {other} and related policies. "
+        texts.append((sentence * (chunk_chars // len(sentence) + 1))[:chunk_chars])
+        unix_time = 1735689600.0 + float(rng.integers(0, 365)) * 86400
+        metadatas.append({
+            "source": f"https://{SUBDOMAINS[i % len(SUBDOMAINS)]}.northeastern.edu/page_{i}",
+            "subdomain": SUBDOMAINS[i % len(SUBDOMAINS)],
+            "date": time.strftime("%Y-%m-%d", time.gmtime(unix_time)),
+            "unix_time": unix_time
+        })
+        ids.append(f"page_{i}")
+    store.add_texts(texts, metadatas, ids)
+
+
+def build_questions(n: int, offset: int = 0) -> List[str]:
+    """Return n distinct questions, so query-keyed caches do not hide the work."""
+    questions = []
+    for i in range(offset, offset + n):
+        template = QUESTION_TEMPLATES[i % len(QUESTION_TEMPLATES)]
+        question = template.format(
+            topic=TOPICS[i % len(TOPICS)],
+            other=TOPICS[(i * 7 + 3) % len(TOPICS)],
+            term=TERMS[i % len(TERMS)]
+        )
+        questions.append(f"{question} (#{i})")
+    return questions
+
+
+def add_stand_in_arguments(parser: argparse.ArgumentParser, latencies: Optional[Dict[str, str]] = None) -> None:
+    """Add the corpus and stand-in latency options read by build_agent."""
+    latencies = latencies or {}
+    parser.add_argument("--chunks", type=int, default=2000, help="Synthetic corpus size")
+    parser.add_argument("--chunk-chars", type=int, default=1200, help="Synthetic chunk length")
+    parser.add_argument("--answer-chars", type=int, default=800, help="Length of the stand-in answers")
+    parser.add_argument("--complex-share", type=float, default=0.3, help="Share of questions the router calls complex")
+    parser.add_argument("--embed-latency", default=latencies.get("embed", "0"),
+                        help="Embedding latency as median_ms[,p95_ms[,failure_rate]]")
+    parser.add_argument("--search-latency", default=latencies.get("search", "0"), help="Vector search latency, same format")
+    parser.add_argument("--rerank-latency", default=latencies.get("rerank", "0"), help="Rerank latency, same format")
+    parser.add_argument("--llm-latency", default=latencies.get("llm", "0"), help="Chat model latency, same format")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the corpus and latency draws")
+
+
+def build_agent(args: argparse.Namespace) -> Any:
+    """Create a RAGAgent wired to the stand-ins and to no deployed artifacts or caches."""
+    # Point the artifact and cache paths at an empty directory so the run only depends on the stand-ins
+    empty_dir = tempfile.mkdtemp(prefix="askneu-bench-")
+    config.DOC_STORE_PATH = os.path.join(empty_dir, "docstore.sqlite")
+    config.LOCAL_INDEX_PATH = os.path.join(empty_dir, "vectors")
+    config.BM25_INDEX_PATH = os.path.join(empty_dir, "bm25")
+    config.RERANK_CONFIG["onnx_model_dir"] = os.path.join(empty_dir, "cross-encoder")
+    config.FAQ_CONFIG["path"] = os.path.join(empty_dir, "faq.npz")
+    config.LLM_CACHE_CONFIG["enabled"] = False
+    config.SHARED_CACHE_CONFIG["backend"] = "none"
+
+    # Imported here so the options above can be reused (benchmarks.service_load --url) without the service dependencies
+    from rag_agent import RAGAgent, LexicalReranker, NoopReranker
+    from benchmarks.stand_ins import LatencyModel, HashEmbeddings, InMemoryVectorStore, StandInReranker, StandInChatModel
+
+    embeddings = HashEmbeddings(latency=LatencyModel.parse(args.embed_latency, args.seed))
+    vectorstore = InMemoryVectorStore(embeddings, LatencyModel.parse(args.search_latency, args.seed + 1))
+    build_corpus(vectorstore, args.chunks, args.chunk_chars, args.seed)
+
+    llm_latency = LatencyModel.parse(args.llm_latency, args.seed + 2)
+    llms = {
+        name: StandInChatModel(latency=llm_latency, complex_share=args.complex_share, answer_chars=args.answer_chars)
+        for name in config.MODEL_CONFIG
+        if name != "embeddings"
+    }
+    rerankers = {
+        "cohere": StandInReranker(LatencyModel.parse(args.rerank_latency, args.seed + 3)),
+        "lexical": LexicalReranker(),
+        "noop": NoopReranker()
+    }
+    return RAGAgent(embeddings=embeddings, vectorstore=vectorstore, rerankers=rerankers, llms=llms)
+
+
+def reset_caches(agent: Any) -> None:
+    """Clear the agent's in-memory caches between runs."""
+    agent.embedding_cache.clear()
+    agent.rerank_cache.clear()
+
+
+def run_load(agent: Any, questions: List[str], mode: str, concurrency: int) -> Dict[str, Any]:
+    """Answer the questions with the given concurrency and collect per-stage latencies."""
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        reports = list(pool.map(lambda question: agent.answer_question(question, "default", mode), questions))
+        elapsed = time.perf_counter() - start
+
+    stages = {}
+    errors = 0
+    for report in reports:
+        if "error" in report:
+            errors += 1
+            continue
+        timing = report["processing_time"]
+        for stage in TIMED_STAGES + ["total"]:
+            if stage in timing:
+                stages.setdefault(stage, []).append(timing[stage])
+        stages.setdefault("other", []).append(timing["total"] - sum(timing.get(stage, 0.0) for stage in TIMED_STAGES))
+
+    return {
+        "requests": len(questions),
+        "errors": errors,
+        "throughput": len(questions) / elapsed,
+        "stages": {
+            stage: {f"p{q}": percentile_ms(latencies, q) for q in (50, 95, 99)}
+            for stage, latencies in stages.items()
+        }
+    }
+
+
+def measure_memory(agent: Any, questions: List[str], mode: str, concurrency: int) -> Dict[str, float]:
+    """Trace Python allocations over a run: peak while running and retained afterwards."""
+    gc.collect()
+    tracemalloc.start()
+    run_load(agent, questions, mode, concurrency)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"peak_mib": peak / (1024 * 1024), "retained_kib": retained / 1024}
+
+
+def print_result(mode: str, concurrency: int, result: Dict[str, Any]) -> None:
+    """Print one run as a table."""
+    print(f"\n{mode}, concurrency {concurrency}: {result['throughput']:.1f} req/s, "
+          f"{result['errors']}/{result['requests']} errors, peak {result['peak_mib']:.1f} MiB, "
+          f"retained {result['retained_kib']:.0f} KiB")
+    print(f"{'stage':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, percentiles in result["stages"].items():
+        print(f"{stage:<20}{percentiles['p50']:>10.2f}{percentiles['p95']:>10.2f}{percentiles['p99']:>10.2f}")
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Return the regressions of total/other p95 and throughput against a baseline."""
+    regressions = []
+    for mode, runs in results.items():
+        for concurrency, result in runs.items():
+            before = baseline.get(mode, {}).get(concurrency)
+            if before is None:
+                continue
+            for stage in ("total", "other"):
+                old, new = before["stages"].get(stage, {}).get("p95"), result["stages"].get(stage, {}).get("p95")
+                # Sub-millisecond stages are too noisy to compare relatively
+                if old and new and new > max(old, 1.0) * (1 + max_regression):
+                    regressions.append(f"{mode}/c{concurrency} {stage} p95 {old:.2f} -> {new:.2f} ms")
+            if result["throughput"] < before["throughput"] / (1 + max_regression):
+                regressions.append(f"{mode}/c{concurrency} throughput {before['throughput']:.1f} -> {result['throughput']:.1f} req/s")
+    return regressions
+
+
+def main():
+    """Command-line entry point for the benchmark."""
+    parser = argparse.ArgumentParser(description="Offline RAGAgent overhead benchmark")
+    parser.add_argument("--queries", type=int, default=200, help="Questions per run")
+    parser.add_argument("--modes", nargs="+", default=["direct", "deepsearch"], help="Search modes to run")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8], help="Concurrent requests per run")
+    add_stand_in_arguments(parser)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the traced memory pass")
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="Earlier --output to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    # Per-request logging would dominate the measured overhead
+    logging.disable(logging.WARNING)
+
+    agent = build_agent(args)
+    print(f"Stand-in agent over {args.chunks} chunks; latencies embed={args.embed_latency} search={args.search_latency} "
+          f"rerank={args.rerank_latency} llm={args.llm_latency}")
+
+    results = {}
+    offset = 0
+    for mode in args.modes:
+        for concurrency in args.concurrency:
+            # Warm up imports, graph compilation paths and allocator
+            run_load(agent, build_questions(min(10, args.queries), offset), mode, concurrency)
+            offset += args.queries
+
+            reset_caches(agent)
+            result = run_load(agent, build_questions(args.queries, offset), mode, concurrency)
+            offset += args.queries
+
+            result.update({"peak_mib": 0.0, "retained_kib": 0.0})
+            if not args.no_memory:
+                reset_caches(agent)
+                result.update(measure_memory(agent, build_questions(args.queries, offset), mode, concurrency))
+                offset += args.queries
+
+            results.setdefault(mode, {})[str(concurrency)] = result
+            print_result(mode, concurrency, result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.max_regression:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Memory benchmark of the per-request document representation.
+Simulates one request carrying k retrieved chunks through the graph nodes, each
+returning a {**state, ...} copy that a checkpointer serializes, and compares
+LangChain Documents with ChunkRecords. Chunks come from the deployed document store
+when available, otherwise synthetic text of a typical chunk size is used.
+
+Run from the python-service directory:
+    python -m benchmarks.chunk_memory
+    python -m benchmarks.chunk_memory --k 32 --concurrency 50
+"""
+
+import argparse
+import itertools
+import pickle
+import tracemalloc
+from typing import List, Dict, Any, Callable
+from langchain_core.documents import Document
+import config
+from chunk_record import ChunkRecord
+from doc_store import load_document_store
+
+# Nodes a deepsearch request passes through
+GRAPH_STEPS = ["route_query", "decompose_query", "retrieve_documents_complex", "synthesize_answer"]
+
+
+def load_records(k: int, chunk_chars: int) -> List[Dict[str, Any]]:
+    """Return k chunk records from the document store, or synthetic ones."""
+    doc_store = load_document_store(config.DOC_STORE_PATH)
+    if doc_store is not None:
+        ids = [chunk_id for chunk_id, _ in itertools.islice(doc_store.iter_metadata(), k)]
+        records = doc_store.get_records(ids)
+        if records:
+            return [{"id": chunk_id, **record} for chunk_id, record in records.items()]
+
+    return [
+        {
+            "id": f"page_{i}",
+            "text": ("Northeastern University co-op and course registration details. " * (chunk_chars // 64 + 1))[:chunk_chars],
+            "metadata": {
+                "source": f"https://catalog.northeastern.edu/page_{i}",
+                "date": "2025-03-01",
+                "unix_time": 1740787200.0,
+                "subdomain": "catalog"
+            }
+        }
+        for i in range(k)
+    ]
+
+
+def as_documents(records: List[Dict[str, Any]]) -> List[Any]:
+    """Build LangChain Documents the way retrieval did before ChunkRecords."""
+    docs = []
+    for i, record in enumerate(records):
+        metadata = dict(record["metadata"])
+        metadata["score"] = 1.0 / (i + 1)
+        docs.append(Document(id=record["id"], page_content=record["text"], metadata=metadata))
+    return docs
+
+
+def as_chunks(records: List[Dict[str, Any]]) -> List[Any]:
+    """Build ChunkRecords referencing the fetched text and metadata."""
+    return [ChunkRecord(record["id"], record["text"], record["metadata"], 1.0 / (i + 1)) for i, record in enumerate(records)]
+
+
+def run_request(records: List[Dict[str, Any]], build: Callable) -> Dict[str, int]:
+    """Measure retained (state plus checkpoints) and peak bytes of one request across the graph steps."""
+    tracemalloc.start()
+    state = {"query": "How do I register for co-op?", "docs": [], "timing": {}, "metrics": {}}
+    checkpoints = []
+    for step in GRAPH_STEPS:
+        if step.startswith("retrieve"):
+            state = {**state, "docs": build(records)}
+        else:
+            state = {**state}
+        checkpoints.append(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"retained": retained, "peak": peak, "checkpoint": sum(len(checkpoint) for checkpoint in checkpoints)}
+
+
+def main():
+    """Command-line entry point for the benchmark."""
+    parser = argparse.ArgumentParser(description="Per-request document memory benchmark")
+    parser.add_argument("--k", type=int, default=24, help="Chunks carried through a request")
+    parser.add_argument("--chunk-chars", type=int, default=1500, help="Synthetic chunk length")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent requests to extrapolate to")
+    args = parser.parse_args()
+
+    records = load_records(args.k, args.chunk_chars)
+    # Text is allocated before measuring: both representations reference the fetched strings
+    print(f"{len(records)} chunks, {sum(len(record['text']) for record in records) / len(records):.0f} chars on average")
+    print(f"{'representation':<18}{'retained KiB':>14}{'peak KiB':>12}{'checkpoints KiB':>17}{'x' + str(args.concurrency) + ' MiB':>12}")
+    for label, build in [("Document", as_documents), ("ChunkRecord", as_chunks)]:
+        run_request(records, build)  # warm up allocator and imports
+        result = run_request(records, build)
+        total = result["retained"] * args.concurrency / (1024 * 1024)
+        print(f"{label:<18}{result['retained'] / 1024:>14.1f}{result['peak'] / 1024:>12.1f}"
+              f"{result['checkpoint'] / 1024:>17.1f}{total:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmark of hybrid (BM25 + vector) retrieval against the vector-only path.
+Uses the deployed document store and local vector snapshot. Latency is measured
+for every stage; with a labeled query file and --embed, hit@k of the expected
+source URL is compared for vector-only and hybrid retrieval.
+
+Run from the python-service directory:
+    python -m benchmarks.hybrid_search
+    python -m benchmarks.hybrid_search --labels labeled_queries.jsonl --embed
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import List, Any
+import numpy as np
+import config
+from bm25_index import BM25Index, BM25Store, reciprocal_rank_fusion
+from doc_store import load_document_store
+from local_index import LocalVectorStore, namespace_dir
+from benchmarks.local_index import percentile_ms
+
+SAMPLE_QUERIES = [
+    "What are the prerequisites for CS 5800?",
+    "How do I get an I-20 extension?",
+    "Where is the Snell Library?",
+    "How do I publish a course in Canvas?",
+    "What should faculty do at the start of the term?",
+    "How do I submit an assignment on Canvas?",
+    "When is the add/drop deadline?",
+    "How do I connect to the VPN?",
+]
+
+
+def report(label: str, latencies: List[float]) -> None:
+    """Print p50/p95 latency of a stage."""
+    print(f"{label:<28}{percentile_ms(latencies, 50):>10.3f}{percentile_ms(latencies, 95):>10.3f}")
+
+
+def hit_at_k(docs: List[Any], source: str) -> bool:
+    """Check whether any retrieved chunk comes from the expected source URL."""
+    return any(doc.metadata.get("source") == source for doc in docs)
+
+
+def main():
+    """Command-line entry point for the benchmark."""
+    parser = argparse.ArgumentParser(description="Hybrid vs vector-only retrieval benchmark")
+    parser.add_argument("--doc-store", default=config.DOC_STORE_PATH, help="Document store path")
+    parser.add_argument("--snapshot", default=config.LOCAL_INDEX_PATH, help="Local vector snapshot directory")
+    parser.add_argument("--namespace", default="", help="Pinecone namespace (empty for the unnamed namespace)")
+    parser.add_argument("--labels", help="JSONL file of {\"query\": ..., \"source\": ...} pairs")
+    parser.add_argument("--embed", action="store_true", help="Embed queries with OpenAI (needed for quality numbers)")
+    parser.add_argument("--k", type=int, default=7, help="Top-k per retriever")
+    parser.add_argument("--repeat", type=int, default=20, help="Timing repetitions per query")
+    args = parser.parse_args()
+
+    doc_store = load_document_store(args.doc_store)
+    if doc_store is None:
+        raise SystemExit(f"No document store found at {args.doc_store}")
+
+    labeled = []
+    if args.labels:
+        with open(args.labels, "r") as f:
+            labeled = [json.loads(line) for line in f if line.strip()]
+    queries = [item["query"] for item in labeled] or SAMPLE_QUERIES
+
+    # Index build, size and load time
+    start = time.perf_counter()
+    index = BM25Index.build(doc_store.iter_texts(args.namespace), doc_store.build_id)
+    build_time = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "index.npz")
+        index.save(path)
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        index = BM25Index.load(path)
+        load_time = time.perf_counter() - start
+    print(f"BM25: {len(index)} chunks, {len(index.terms)} terms, {size / 1024:.0f} KiB, "
+          f"built in {build_time:.2f}s, loaded in {load_time * 1000:.1f}ms")
+
+    print(f"{'stage':<28}{'p50 ms':>10}{'p95 ms':>10}")
+    latencies = []
+    for query in queries:
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            index.search(query, args.k)
+            latencies.append(time.perf_counter() - start)
+    report("bm25 search", latencies)
+
+    lexical = BM25Store(doc_store, tempfile.mkdtemp())
+    lexical.indexes[args.namespace] = index
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        lexical.search(query, args.k, args.namespace)
+        latencies.append(time.perf_counter() - start)
+    report("bm25 search + doc fetch", latencies)
+
+    if not os.path.isdir(os.path.join(args.snapshot, namespace_dir(args.namespace))):
+        print(f"No vector snapshot at {args.snapshot}, skipping the vector-only comparison")
+        return
+
+    embeddings = None
+    if args.embed:
+        from langchain_openai import OpenAIEmbeddings
+        embeddings = OpenAIEmbeddings(
+            model=config.MODEL_CONFIG["embeddings"]["model_name"],
+            api_key=config.MODEL_CONFIG["embeddings"]["api_key"]
+        )
+    vectors = LocalVectorStore(args.snapshot, embeddings, doc_store)
+    namespace_index = vectors.namespaces[namespace_dir(args.namespace)]
+
+    if embeddings is not None:
+        query_vectors = np.asarray(embeddings.embed_documents(queries), dtype=np.float32)
+    else:
+        # Without embeddings, indexed vectors stand in for query vectors (latency only)
+        rng = np.random.default_rng(0)
+        query_vectors = np.asarray(namespace_index.vectors[rng.choice(len(namespace_index), size=len(queries))])
+
+    vector_latencies, fusion_latencies = [], []
+    vector_hits, hybrid_hits = 0, 0
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        vector_docs = [doc for doc, _ in vectors.similarity_search_by_vector_with_score(
+            query_vectors[i], k=args.k, namespace=args.namespace or None
+        )]
+        vector_latencies.append(time.perf_counter() - start)
+
+        lexical_docs = lexical.search(query, args.k, args.namespace)
+        start = time.perf_counter()
+        hybrid_docs = reciprocal_rank_fusion([vector_docs, lexical_docs], k=config.BM25_CONFIG["rrf_k"])[:args.k]
+        fusion_latencies.append(time.perf_counter() - start)
+
+        if labeled and embeddings is not None:
+            vector_hits += hit_at_k(vector_docs, labeled[i]["source"])
+            hybrid_hits += hit_at_k(hybrid_docs, labeled[i]["source"])
+
+    report("vector search (local)", vector_latencies)
+    report("rrf fusion", fusion_latencies)
+
+    if labeled and embeddings is not None:
+        print(f"hit@{args.k}: vector-only {vector_hits / len(labeled):.3f}, hybrid {hybrid_hits / len(labeled):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Recall/latency benchmark for the local vector index.
+Compares the approximate IVF search against brute force on a deployed snapshot
+namespace or on synthetic clustered vectors.
+
+Run from the python-service directory:
+    python -m benchmarks.local_index --rows 5000 --dim 1536
+    python -m benchmarks.local_index --snapshot artifacts/vectors/__default__
+"""
+
+import argparse
+import tempfile
+import time
+from typing import List
+import numpy as np
+from local_index import NamespaceIndex, normalize_rows, write_snapshot
+
+
+def percentile_ms(latencies: List[float], q: float) -> float:
+    """Return a latency percentile in milliseconds."""
+    return float(np.percentile(latencies, q) * 1000)
+
+
+def synthetic_snapshot(path: str, rows: int, dim: int, clusters: int, seed: int = 0) -> None:
+    """Write a snapshot of clustered random vectors, roughly shaped like page chunks."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    assignments = rng.integers(0, clusters, size=rows)
+    vectors = centers[assignments] + rng.normal(scale=0.6, size=(rows, dim))
+    subdomains = ["canvas", "catalog", "registrar", "studentfinance", "international"]
+    metadatas = [
+        {"subdomain": subdomains[i % len(subdomains)], "unix_time": float(1700000000 + i)}
+        for i in range(rows)
+    ]
+    write_snapshot(path, [f"chunk_{i}" for i in range(rows)], vectors, metadatas)
+
+
+def run(index: NamespaceIndex, queries: np.ndarray, k: int, nprobes: List[int]) -> None:
+    """Print recall@k and latency for brute force and each nprobe setting."""
+    truth, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = index.search(query, k, exact=True)
+        latencies.append(time.perf_counter() - start)
+        truth.append({row for row, _ in hits})
+
+    print(f"{'mode':<14}{'recall@' + str(k):>10}{'p50 ms':>10}{'p95 ms':>10}")
+    print(f"{'brute force':<14}{1.0:>10.3f}{percentile_ms(latencies, 50):>10.3f}{percentile_ms(latencies, 95):>10.3f}")
+
+    if index.centroids is None:
+        print("IVF not built (too few rows for nlist)")
+        return
+
+    for nprobe in nprobes:
+        recalls, latencies = [], []
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            hits = index.search(query, k, exact=False, nprobe=nprobe)
+            latencies.append(time.perf_counter() - start)
+            recalls.append(len({row for row, _ in hits} & expected) / max(len(expected), 1))
+        label = f"ivf nprobe={nprobe}"
+        print(f"{label:<14}{np.mean(recalls):>10.3f}{percentile_ms(latencies, 50):>10.3f}{percentile_ms(latencies, 95):>10.3f}")
+
+    # Filtered search over one subdomain, the common pushdown case
+    if "subdomain" in index.columns:
+        subdomain = index.columns["subdomain"][0]
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, k, filter={"subdomain": {"$in": [subdomain]}}, exact=True)
+            latencies.append(time.perf_counter() - start)
+        label = "filtered exact"
+        print(f"{label:<14}{'-':>10}{percentile_ms(latencies, 50):>10.3f}{percentile_ms(latencies, 95):>10.3f}")
+
+
+def main():
+    """Command-line entry point for the benchmark."""
+    parser = argparse.ArgumentParser(description="Local vector index recall/latency benchmark")
+    parser.add_argument("--snapshot", help="Namespace snapshot directory (default: synthetic data)")
+    parser.add_argument("--rows", type=int, default=5000, help="Synthetic rows")
+    parser.add_argument("--dim", type=int, default=1536, help="Synthetic vector dimension")
+    parser.add_argument("--clusters", type=int, default=200, help="Synthetic clusters")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("--k", type=int, default=10, help="Top-k")
+    parser.add_argument("--nlist", type=int, default=64, help="IVF cells")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="IVF cells to scan")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.snapshot
+        if path is None:
+            path = tmp_dir
+            synthetic_snapshot(path, args.rows, args.dim, args.clusters)
+
+        start = time.perf_counter()
+        index = NamespaceIndex(path, nlist=args.nlist)
+        print(f"Loaded {len(index)} vectors and built IVF in {time.perf_counter() - start:.2f} seconds")
+
+        # Queries are perturbed copies of indexed vectors
+        rng = np.random.default_rng(1)
+        rows = rng.choice(len(index), size=min(args.queries, len(index)), replace=False)
+        base = np.asarray(index.vectors[rows])
+        queries = normalize_rows(base + rng.normal(scale=0.5 / np.sqrt(base.shape[1]), size=base.shape))
+
+        run(index, queries, args.k, args.nprobe)
+
+
+if __name__ == "__main__":
+    main()
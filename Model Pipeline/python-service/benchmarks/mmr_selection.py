@@ -0,0 +1,70 @@
+"""
+Benchmark of the MMR selection cost over over-fetched candidates.
+Times the vectorized selection against a straightforward per-candidate loop
+for the fetch sizes we would use in SEARCH_CONFIG.
+
+Run from the python-service directory:
+    python -m benchmarks.mmr_selection
+"""
+
+import argparse
+import time
+from typing import List
+import numpy as np
+from mmr import maximal_marginal_relevance
+from local_index import normalize_rows
+from benchmarks.local_index import percentile_ms
+
+
+def loop_mmr(query_vector: np.ndarray, candidate_vectors: np.ndarray, k: int, lambda_mult: float) -> List[int]:
+    """Reference MMR that rescores every remaining candidate against the selection each step."""
+    candidates = normalize_rows(candidate_vectors)
+    query = normalize_rows(query_vector)
+    selected = []
+    remaining = list(range(len(candidates)))
+    while remaining and len(selected) < k:
+        best, best_score = None, -np.inf
+        for i in remaining:
+            redundancy = max((float(candidates[i] @ candidates[j]) for j in selected), default=0.0)
+            score = lambda_mult * float(candidates[i] @ query) - (1 - lambda_mult) * redundancy
+            if score > best_score:
+                best, best_score = i, score
+        selected.append(best)
+        remaining.remove(best)
+    return selected
+
+
+def main():
+    """Command-line entry point for the benchmark."""
+    parser = argparse.ArgumentParser(description="MMR selection cost benchmark")
+    parser.add_argument("--dim", type=int, default=1536, help="Vector dimension")
+    parser.add_argument("--k", type=int, default=7, help="Documents selected")
+    parser.add_argument("--fetch-k", type=int, nargs="+", default=[14, 28, 56, 112], help="Candidates fetched")
+    parser.add_argument("--lambda-mult", type=float, default=0.5, help="MMR relevance/diversity trade-off")
+    parser.add_argument("--repeat", type=int, default=200, help="Selections per setting")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'fetch_k':>8}{'vectorized p50 ms':>20}{'p95 ms':>10}{'loop p50 ms':>14}{'same picks':>12}")
+    for fetch_k in args.fetch_k:
+        # Candidates come in groups of near-identical chunks, as when one page yields several chunks
+        pages = rng.normal(size=(max(fetch_k // 4, 1), args.dim))
+        candidates = pages[rng.integers(0, len(pages), size=fetch_k)] + rng.normal(scale=0.3, size=(fetch_k, args.dim))
+        query = pages[0] + rng.normal(scale=0.5, size=args.dim)
+
+        fast, slow = [], []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            picks = maximal_marginal_relevance(query, candidates, args.k, args.lambda_mult)
+            fast.append(time.perf_counter() - start)
+        for _ in range(max(args.repeat // 10, 1)):
+            start = time.perf_counter()
+            reference = loop_mmr(query, candidates, args.k, args.lambda_mult)
+            slow.append(time.perf_counter() - start)
+
+        print(f"{fetch_k:>8}{percentile_ms(fast, 50):>20.3f}{percentile_ms(fast, 95):>10.3f}"
+              f"{percentile_ms(slow, 50):>14.3f}{str(picks == reference):>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Accuracy/latency benchmark for the centroid namespace router.
+Builds the router from a local vector snapshot and reports routing accuracy, the
+share of queries routed, the routing cost and the search latency saved by searching
+the routed namespace/subdomain instead of the whole default namespace.
+
+With a labeled JSONL file ({"query": ..., "namespace": ..., "subdomain": ...}) and
+--embed, real queries are used; otherwise held-out chunk vectors labeled with their
+own namespace/subdomain stand in for queries.
+
+Run from the python-service directory:
+    python -m benchmarks.namespace_router
+    python -m benchmarks.namespace_router --labels labeled_queries.jsonl --embed
+"""
+
+import argparse
+import json
+import time
+from typing import List, Dict, Any, Tuple
+import numpy as np
+import config
+from local_index import LocalVectorStore, DEFAULT_NAMESPACE_DIR, namespace_dir
+from namespace_router import NamespaceRouter
+from benchmarks.local_index import percentile_ms
+
+
+class _NoDocuments:
+    """Document store stand-in; the benchmark only needs vectors and metadata columns."""
+    build_id = "benchmark"
+
+
+def sample_chunk_queries(store: LocalVectorStore, per_group: int, seed: int = 0) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    """Draw chunk vectors from every namespace/subdomain as pseudo-queries with known labels."""
+    rng = np.random.default_rng(seed)
+    vectors, labels = [], []
+    for name, index in store.namespaces.items():
+        namespace = "default" if name == DEFAULT_NAMESPACE_DIR else name
+        subdomains = index.columns.get("subdomain", np.full(len(index), None, dtype=object))
+        for subdomain in set(subdomains.tolist()):
+            rows = np.flatnonzero(subdomains == subdomain)
+            for row in rng.choice(rows, size=min(per_group, len(rows)), replace=False):
+                vectors.append(np.asarray(index.vectors[row]))
+                labels.append({"namespace": namespace, "subdomain": subdomain})
+    return np.asarray(vectors, dtype=np.float32), labels
+
+
+def main():
+    """Command-line entry point for the benchmark."""
+    parser = argparse.ArgumentParser(description="Namespace router accuracy/latency benchmark")
+    parser.add_argument("--snapshot", default=config.LOCAL_INDEX_PATH, help="Local vector snapshot directory")
+    parser.add_argument("--labels", help="JSONL file of {\"query\", \"namespace\", \"subdomain\"} records")
+    parser.add_argument("--embed", action="store_true", help="Embed labeled queries with OpenAI")
+    parser.add_argument("--per-group", type=int, default=20, help="Pseudo-queries per subdomain without labels")
+    parser.add_argument("--k", type=int, default=7, help="Top-k of the timed searches")
+    args = parser.parse_args()
+
+    store = LocalVectorStore(args.snapshot, None, _NoDocuments())
+    if not store.namespaces:
+        raise SystemExit(f"No vector snapshot found at {args.snapshot}")
+
+    start = time.perf_counter()
+    router = NamespaceRouter.from_local_store(store)
+    print(f"Router: {len(router)} centroids over {router.namespaces}, built in {time.perf_counter() - start:.2f}s")
+
+    if args.labels and args.embed:
+        from langchain_openai import OpenAIEmbeddings
+        with open(args.labels, "r") as f:
+            labels = [json.loads(line) for line in f if line.strip()]
+        embeddings = OpenAIEmbeddings(
+            model=config.MODEL_CONFIG["embeddings"]["model_name"],
+            api_key=config.MODEL_CONFIG["embeddings"]["api_key"]
+        )
+        query_vectors = np.asarray(embeddings.embed_documents([item["query"] for item in labels]), dtype=np.float32)
+    else:
+        query_vectors, labels = sample_chunk_queries(store, args.per_group)
+    print(f"Queries: {len(labels)}")
+
+    routes, route_latencies = [], []
+    for query_vector in query_vectors:
+        start = time.perf_counter()
+        routes.append(router.route(query_vector))
+        route_latencies.append(time.perf_counter() - start)
+
+    routed = [(route, label) for route, label in zip(routes, labels) if route["routed"]]
+    namespace_correct = sum(route["namespace"] == label["namespace"] for route, label in routed)
+    filtered = [(route, label) for route, label in routed if route["subdomain"] is not None]
+    subdomain_correct = sum(route["subdomain"] == label.get("subdomain") for route, label in filtered)
+    print(f"routed: {len(routed) / len(labels):.3f}, namespace accuracy when routed: "
+          f"{namespace_correct / max(len(routed), 1):.3f}")
+    print(f"subdomain filter applied: {len(filtered) / len(labels):.3f}, subdomain accuracy when applied: "
+          f"{subdomain_correct / max(len(filtered), 1):.3f}")
+
+    # Search latency of the broad default search against the routed search
+    default_index = store.namespaces.get(DEFAULT_NAMESPACE_DIR) or next(iter(store.namespaces.values()))
+    broad_latencies, routed_latencies = [], []
+    for query_vector, route in zip(query_vectors, routes):
+        query_vector = query_vector / max(np.linalg.norm(query_vector), 1e-12)
+        start = time.perf_counter()
+        default_index.search(query_vector, args.k)
+        broad_latencies.append(time.perf_counter() - start)
+
+        index = default_index
+        search_filter = None
+        if route["routed"]:
+            index = store.namespaces.get(namespace_dir(None if route["namespace"] == "default" else route["namespace"]), index)
+            if route["subdomain"] is not None:
+                search_filter = {"subdomain": {"$in": [route["subdomain"]]}}
+        start = time.perf_counter()
+        index.search(query_vector, args.k, filter=search_filter)
+        routed_latencies.append(time.perf_counter() - start)
+
+    print(f"{'stage':<24}{'p50 ms':>10}{'p95 ms':>10}")
+    for label, latencies in [("route", route_latencies), ("broad search", broad_latencies), ("routed search", routed_latencies)]:
+        print(f"{label:<24}{percentile_ms(latencies, 50):>10.3f}{percentile_ms(latencies, 95):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Local stand-in for a Redis server, for exercising the shared cache tier without Redis.
+Speaks the subset of the Redis protocol the service uses (PING, AUTH, SELECT, GET,
+SET with EX/PX, DEL, EXISTS, DBSIZE, FLUSHDB) and keeps keys in memory with expiry.
+
+Run from the python-service directory:
+    python -m benchmarks.redis_stand_in --port 6379
+"""
+
+import argparse
+import socketserver
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+
+class StandInRedisServer:
+    """Threaded in-memory server answering Redis-protocol commands."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        """
+        Args:
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free one)
+            latency: Seconds added to every reply, to simulate a network hop
+        """
+        self.latency = latency
+        self.commands = 0
+        self._data = {}
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                while True:
+                    try:
+                        args = server._read_command(self.rfile)
+                    except (ConnectionError, ValueError):
+                        return
+                    if args is None:
+                        return
+                    if server.latency:
+                        time.sleep(server.latency)
+                    self.wfile.write(server.execute(args))
+
+        self._server = socketserver.ThreadingTCPServer((host, port), Handler, bind_and_activate=False)
+        self._server.daemon_threads = True
+        self._server.allow_reuse_address = True
+        self._server.server_bind()
+        self._server.server_activate()
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"redis://{self.host}:{self.port}/0"
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def start(self) -> "StandInRedisServer":
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, name="redis-stand-in", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._server.shutdown()
+        self._server.server_close()
+
+    @staticmethod
+    def _read_command(reader: Any) -> Optional[List[bytes]]:
+        """Read one command array, or return None when the client disconnects."""
+        line = reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # Inline command, e.g. typed into telnet
+            return line.split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(reader.readline()[1:-2])
+            args.append(reader.read(length + 2)[:-2])
+        return args
+
+    def _live(self, key: bytes, now: float) -> Optional[Tuple[bytes, Optional[float]]]:
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            del self._data[key]
+            return None
+        return entry
+
+    def execute(self, args: List[bytes]) -> bytes:
+        """Run one command and return the encoded reply."""
+        if not args:
+            return b"-ERR empty command\r\n"
+        command = args[0].upper()
+        now = time.monotonic()
+        with self._lock:
+            self.commands += 1
+            if command == b"PING":
+                return b"+PONG\r\n"
+            if command in (b"AUTH", b"SELECT"):
+                return b"+OK\r\n"
+            if command == b"GET" and len(args) == 2:
+                entry = self._live(args[1], now)
+                return b"$-1\r\n" if entry is None else b"$%d\r\n%s\r\n" % (len(entry[0]), entry[0])
+            if command == b"SET" and len(args) >= 3:
+                expires = None
+                options = [arg.upper() for arg in args[3:]]
+                for option, value in zip(options, args[4:]):
+                    if option == b"EX":
+                        expires = now + int(value)
+                    elif option == b"PX":
+                        expires = now + int(value) / 1000
+                self._data[args[1]] = (args[2], expires)
+                return b"+OK\r\n"
+            if command in (b"DEL", b"EXISTS"):
+                found = [key for key in args[1:] if self._live(key, now) is not None]
+                if command == b"DEL":
+                    for key in found:
+                        del self._data[key]
+                return b":%d\r\n" % len(found)
+            if command == b"DBSIZE":
+                return b":%d\r\n" % len(self._data)
+            if command == b"FLUSHDB":
+                self._data.clear()
+                return b"+OK\r\n"
+        return b"-ERR unknown command '%s'\r\n" % args[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "keys": len(self._data),
+                "bytes": sum(len(value) for value, _ in self._data.values()),
+                "commands": self.commands
+            }
+
+
+def main():
+    """Command-line entry point: serve until interrupted."""
+    parser = argparse.ArgumentParser(description="In-memory Redis-protocol stand-in server")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=6379, help="Port to listen on")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Milliseconds added to every reply")
+    args = parser.parse_args()
+
+    server = StandInRedisServer(args.host, args.port, args.latency_ms / 1000)
+    print(f"Serving on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
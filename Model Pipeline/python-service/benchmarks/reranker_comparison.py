@@ -0,0 +1,119 @@
+"""
+Latency/quality comparison of the reranker backends over the evaluation questions.
+Candidates come from the local BM25 index over the document store (offline) or from
+the full RAGAgent retrieval (--agent, needs API keys). Quality is agreement with a
+reference backend, Cohere by default: overlap@k and NDCG@k of each backend's top-k.
+
+Run from the python-service directory:
+    python -m benchmarks.reranker_comparison
+    python -m benchmarks.reranker_comparison --agent --backends cohere lexical onnx noop
+"""
+
+import argparse
+import math
+import os
+import time
+from typing import List, Dict, Any
+import numpy as np
+import pandas as pd
+import config
+from bm25_index import BM25Store
+from doc_store import load_document_store
+from rag_agent import CohereReranker, CircuitBreaker, LexicalReranker, NoopReranker, OnnxCrossEncoderReranker
+from benchmarks.local_index import percentile_ms
+
+QUESTIONS_FILE = os.path.join(os.path.dirname(__file__), "..", "..", "Model Evaluation", "question.xlsx")
+
+
+def ndcg_at_k(ranking: List[int], reference: List[int], k: int) -> float:
+    """NDCG@k of a ranking, using graded relevance from the position in the reference ranking."""
+    relevance = {doc: len(reference) - rank for rank, doc in enumerate(reference[:k])}
+    dcg = sum(relevance.get(doc, 0) / math.log2(rank + 2) for rank, doc in enumerate(ranking[:k]))
+    ideal = sum(rel / math.log2(rank + 2) for rank, rel in enumerate(sorted(relevance.values(), reverse=True)))
+    return dcg / ideal if ideal else 0.0
+
+
+def build_rerankers(names: List[str]) -> Dict[str, Any]:
+    """Create the requested reranker backends, skipping those that are unavailable."""
+    rerankers = {}
+    for name in names:
+        try:
+            if name == "cohere":
+                import cohere
+                if not config.COHERE_API_KEY:
+                    raise RuntimeError("COHERE_API_KEY is not set")
+                client = cohere.Client(api_key=config.COHERE_API_KEY, timeout=config.RERANK_CONFIG["timeout"])
+                # The breaker never opens here so every question is measured
+                rerankers[name] = CohereReranker(client, config.RERANK_CONFIG["model"], CircuitBreaker(10 ** 9, 0, math.inf))
+            elif name == "lexical":
+                rerankers[name] = LexicalReranker()
+            elif name == "onnx":
+                rerankers[name] = OnnxCrossEncoderReranker(config.RERANK_CONFIG["onnx_model_dir"])
+            elif name == "noop":
+                rerankers[name] = NoopReranker()
+        except Exception as e:
+            print(f"Skipping {name}: {e}")
+    return rerankers
+
+
+def main():
+    """Command-line entry point for the comparison."""
+    parser = argparse.ArgumentParser(description="Reranker backend latency/quality comparison")
+    parser.add_argument("--questions", default=QUESTIONS_FILE, help="Excel file with a 'Question' column")
+    parser.add_argument("--backends", nargs="+", default=["cohere", "lexical", "onnx", "noop"], help="Backends to compare")
+    parser.add_argument("--reference", default="cohere", help="Backend whose ranking is treated as ground truth")
+    parser.add_argument("--agent", action="store_true", help="Retrieve candidates with RAGAgent instead of local BM25")
+    parser.add_argument("--namespace", default="default", help="Namespace to retrieve from")
+    parser.add_argument("--candidates", type=int, default=20, help="Candidates per question")
+    parser.add_argument("--k", type=int, default=7, help="Top-k compared")
+    args = parser.parse_args()
+
+    questions = pd.read_excel(args.questions)["Question"].dropna().astype(str).tolist()
+
+    if args.agent:
+        from main import get_rag_agent
+        agent = get_rag_agent()
+        node_config = {**config.get_namespace_config(args.namespace, "direct"), "rerank": False}
+        retrieve = lambda question: agent.search_documents(question, args.namespace, args.candidates, node_config)
+    else:
+        doc_store = load_document_store(config.DOC_STORE_PATH)
+        if doc_store is None:
+            raise SystemExit(f"No document store at {config.DOC_STORE_PATH}; use --agent to retrieve from Pinecone")
+        lexical_store = BM25Store(doc_store)
+        namespace = "" if args.namespace == "default" else args.namespace
+        retrieve = lambda question: lexical_store.search(question, args.candidates, namespace)
+
+    rerankers = build_rerankers(args.backends)
+    latencies = {name: [] for name in rerankers}
+    rankings = {name: [] for name in rerankers}
+
+    for question in questions:
+        documents = [doc.page_content for doc in retrieve(question)]
+        if len(documents) < 2:
+            continue
+        for name, reranker in rerankers.items():
+            start = time.perf_counter()
+            try:
+                results = reranker.rerank(question, documents, len(documents))
+            except Exception as e:
+                print(f"{name} failed: {e}")
+                results = [(i, None) for i in range(len(documents))]
+            latencies[name].append(time.perf_counter() - start)
+            rankings[name].append([index for index, _ in results])
+
+    print(f"{len(rankings[next(iter(rankings))]) if rankings else 0} questions, reference: {args.reference}")
+    print(f"{'backend':<10}{'p50 ms':>10}{'p95 ms':>10}{'overlap@' + str(args.k):>12}{'ndcg@' + str(args.k):>10}")
+    for name in rerankers:
+        if not latencies[name]:
+            continue
+        row = f"{name:<10}{percentile_ms(latencies[name], 50):>10.2f}{percentile_ms(latencies[name], 95):>10.2f}"
+        if args.reference in rankings and name != args.reference:
+            pairs = list(zip(rankings[name], rankings[args.reference]))
+            overlap = np.mean([len(set(r[:args.k]) & set(ref[:args.k])) / args.k for r, ref in pairs])
+            ndcg = np.mean([ndcg_at_k(r, ref, args.k) for r, ref in pairs])
+            row += f"{overlap:>12.3f}{ndcg:>10.3f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
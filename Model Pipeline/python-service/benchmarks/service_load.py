@@ -0,0 +1,305 @@
+"""
+HTTP load generator that replays captured /query traffic against python_service.
+Records ({"query", "namespace", "search_mode", "timestamp"} per line, optionally
+gzipped) are sent open-loop: either at their original spacing sped up by --speedup,
+or at a fixed --rps. Several speed-ups or rates run as consecutive load steps.
+
+The target is a deployed service (--url) or, with --stub, the Flask app started
+in-process on a local port with the stand-in agent of benchmarks.agent_overhead
+(realistic stand-in latencies by default, no API keys or network needed).
+
+Per step it reports offered and achieved throughput, mean concurrency, latency
+percentiles (from the scheduled send time, so client-side queueing counts) and the
+error rate, and marks the first saturated step: achieved throughput below 90% of
+the offered rate, error rate above --max-error-rate, or p95 above --latency-factor
+times the first step's p95. --output writes the steps and a per-window time series
+of throughput, concurrency and latency as JSON.
+
+Run from the python-service directory:
+    python -m benchmarks.service_load traffic.jsonl --stub --rps 2 4 8 16 --duration 30
+    python -m benchmarks.service_load traffic.jsonl.gz --url https://askneu.example.run.app --speedup 1 5 10
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from benchmarks.local_index import percentile_ms
+
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    """Convert an epoch number or ISO 8601 string to epoch seconds."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def load_traffic(path: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Read captured queries, oldest first; records without a query are skipped."""
+    opener = gzip.open if path.endswith(".gz") else open
+    records = []
+    with opener(path, "rt") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not record.get("query"):
+                continue
+            records.append({
+                "query": record["query"],
+                "namespace": record.get("namespace", "default"),
+                "search_mode": record.get("search_mode", "direct"),
+                "timestamp": parse_timestamp(record.get("timestamp"))
+            })
+            if limit and len(records) >= limit:
+                break
+    if all(record["timestamp"] is not None for record in records):
+        records.sort(key=lambda record: record["timestamp"])
+    return records
+
+
+def schedule_replay(records: List[Dict[str, Any]], speedup: float) -> List[Tuple[float, Dict[str, Any]]]:
+    """Send offsets that keep the captured spacing, compressed by the speed-up."""
+    if any(record["timestamp"] is None for record in records):
+        raise ValueError("Replay needs a timestamp on every record; use --rps instead")
+    start = records[0]["timestamp"]
+    return [((record["timestamp"] - start) / speedup, record) for record in records]
+
+
+def schedule_rps(records: List[Dict[str, Any]], rps: float, duration: float) -> List[Tuple[float, Dict[str, Any]]]:
+    """Evenly spaced send offsets at a fixed rate, cycling through the records."""
+    count = max(int(rps * duration), 1)
+    return [(i / rps, records[i % len(records)]) for i in range(count)]
+
+
+class LoadRunner:
+    """Sends scheduled /query requests open-loop and records their outcomes."""
+
+    def __init__(self, url: str, max_concurrency: int, timeout: float):
+        self.url = url.rstrip("/") + "/query"
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def send(self, record: Dict[str, Any]) -> Tuple[int, Optional[str], float]:
+        """POST one query; returns (HTTP status or 0, error or None, time to first byte)."""
+        payload = {key: record[key] for key in ("query", "namespace", "search_mode")}
+        request = urllib.request.Request(
+            self.url, data=json.dumps(payload).encode("utf-8"), headers={"Content-Type": "application/json"}
+        )
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                first = response.read(1)
+                ttfb = time.perf_counter() - start
+                body = first + response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            return e.code, f"HTTP {e.code}", time.perf_counter() - start
+        except Exception as e:
+            return 0, type(e).__name__, time.perf_counter() - start
+
+        # Progressive responses are event streams; errors arrive as an 'error' event
+        if record["search_mode"] == "progressive":
+            return status, "error event" if b"event: error" in body else None, ttfb
+        try:
+            error = json.loads(body).get("error")
+        except ValueError:
+            error = "invalid JSON"
+        return status, error, ttfb
+
+    def _run_one(self, scheduled: float, origin: float, record: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self.in_flight += 1
+            concurrency = self.in_flight
+        sent = time.perf_counter() - origin
+        try:
+            status, error, ttfb = self.send(record)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        return {
+            "scheduled": scheduled,
+            "sent": sent,
+            "finished": time.perf_counter() - origin,
+            "concurrency": concurrency,
+            "status": status,
+            "error": error,
+            "ttfb": ttfb,
+            "search_mode": record["search_mode"]
+        }
+
+    def run(self, schedule: List[Tuple[float, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Send every request at its offset (or as soon as a worker frees up) and wait for all."""
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            origin = time.perf_counter()
+            futures = []
+            for offset, record in schedule:
+                delay = offset - (time.perf_counter() - origin)
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(pool.submit(self._run_one, offset, origin, record))
+            return [future.result() for future in futures]
+
+
+def summarize_step(results: List[Dict[str, Any]], schedule_span: float) -> Dict[str, Any]:
+    """Throughput, concurrency, latency percentiles and errors of one load step."""
+    latencies = [result["finished"] - result["scheduled"] for result in results]
+    ok = [result for result in results if result["error"] is None]
+    wall = max(result["finished"] for result in results)
+    busy = sum(result["finished"] - result["sent"] for result in results)
+    return {
+        "requests": len(results),
+        "offered_rps": (len(results) - 1) / schedule_span if schedule_span > 0 else float(len(results)),
+        "achieved_rps": len(ok) / wall,
+        "mean_concurrency": busy / wall,
+        "max_concurrency": max(result["concurrency"] for result in results),
+        "error_rate": 1 - len(ok) / len(results),
+        "errors": sorted({str(result["error"]) for result in results if result["error"]}),
+        **{f"p{q}_ms": percentile_ms(latencies, q) for q in (50, 95, 99)},
+        "ttfb_p50_ms": percentile_ms([result["ttfb"] for result in results], 50)
+    }
+
+
+def time_series(results: List[Dict[str, Any]], window: float) -> List[Dict[str, Any]]:
+    """Per-window completions per second, mean concurrency, p95 latency and errors."""
+    end = max(result["finished"] for result in results)
+    series = []
+    for start in np.arange(0.0, end, window):
+        stop = start + window
+        done = [result for result in results if start <= result["finished"] < stop]
+        # Mean concurrency is the requests' overlap with the window divided by its length
+        overlap = sum(max(0.0, min(result["finished"], stop) - max(result["sent"], start)) for result in results)
+        series.append({
+            "t": round(float(start), 3),
+            "throughput": len(done) / window,
+            "concurrency": overlap / window,
+            "p95_ms": percentile_ms([result["finished"] - result["scheduled"] for result in done], 95) if done else None,
+            "errors": sum(result["error"] is not None for result in done)
+        })
+    return series
+
+
+def find_saturation(steps: List[Dict[str, Any]], max_error_rate: float, latency_factor: float) -> Optional[int]:
+    """Index of the first saturated step, or None if every step kept up."""
+    baseline_p95 = steps[0]["p95_ms"]
+    for i, step in enumerate(steps):
+        reasons = []
+        if step["achieved_rps"] < 0.9 * step["offered_rps"]:
+            reasons.append("throughput below offered rate")
+        if step["error_rate"] > max_error_rate:
+            reasons.append(f"error rate {step['error_rate']:.1%}")
+        if i > 0 and step["p95_ms"] > latency_factor * baseline_p95:
+            reasons.append(f"p95 {step['p95_ms'] / baseline_p95:.1f}x the first step")
+        if reasons:
+            step["saturated"] = ", ".join(reasons)
+            return i
+    return None
+
+
+def start_stub_service(args: argparse.Namespace) -> str:
+    """Serve python_service in-process with the stand-in agent and return its base URL."""
+    from werkzeug.serving import make_server
+    import main as service_main
+    from benchmarks.agent_overhead import build_agent
+
+    logging.disable(logging.WARNING)
+    service_main._rag_agent = build_agent(args)
+    import python_service
+
+    server = make_server("127.0.0.1", args.port, python_service.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def main():
+    """Command-line entry point for the load generator."""
+    from benchmarks.agent_overhead import add_stand_in_arguments
+
+    parser = argparse.ArgumentParser(description="Replay /query traffic against python_service")
+    parser.add_argument("traffic", help="JSONL (or .jsonl.gz) of captured queries")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="Base URL of a running service")
+    target.add_argument("--stub", action="store_true", help="Serve the app in-process with stand-in dependencies")
+    rate = parser.add_mutually_exclusive_group()
+    rate.add_argument("--speedup", type=float, nargs="+", default=[1.0], help="Replay speed-ups, one step each")
+    rate.add_argument("--rps", type=float, nargs="+", help="Fixed request rates, one step each")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds per fixed-rate step")
+    parser.add_argument("--limit", type=int, help="Use at most this many captured queries")
+    parser.add_argument("--max-concurrency", type=int, default=64, help="Most requests in flight")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Request timeout in seconds")
+    parser.add_argument("--window", type=float, default=1.0, help="Time series window in seconds")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Error rate that counts as saturated")
+    parser.add_argument("--latency-factor", type=float, default=2.0, help="p95 growth that counts as saturated")
+    parser.add_argument("--port", type=int, default=0, help="Port of the stub service (0 picks a free one)")
+    parser.add_argument("--output", help="Write steps and time series as JSON")
+    add_stand_in_arguments(parser, {"embed": "40,120", "search": "60,150", "rerank": "100,250", "llm": "400,1200"})
+    args = parser.parse_args()
+
+    records = load_traffic(args.traffic, args.limit)
+    if not records:
+        raise SystemExit(f"No queries found in {args.traffic}")
+
+    url = args.url
+    if args.stub:
+        url = start_stub_service(args)
+        # The service prints every request to stderr
+        sys.stderr = open(os.devnull, "w")
+    print(f"Target {url}, {len(records)} captured queries")
+
+    if args.rps:
+        steps = [(f"{rps:g} rps", schedule_rps(records, rps, args.duration)) for rps in args.rps]
+    else:
+        steps = [(f"x{speedup:g}", schedule_replay(records, speedup)) for speedup in args.speedup]
+
+    runner = LoadRunner(url, args.max_concurrency, args.timeout)
+    summaries = []
+    for label, schedule in steps:
+        results = runner.run(schedule)
+        summary = summarize_step(results, schedule[-1][0])
+        summary.update({"step": label, "series": time_series(results, args.window)})
+        summaries.append(summary)
+
+    saturated = find_saturation(summaries, args.max_error_rate, args.latency_factor)
+
+    print(f"{'step':<12}{'offered/s':>10}{'achieved/s':>11}{'conc':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for summary in summaries:
+        print(f"{summary['step']:<12}{summary['offered_rps']:>10.2f}{summary['achieved_rps']:>11.2f}"
+              f"{summary['mean_concurrency']:>7.1f}{summary['p50_ms']:>10.0f}{summary['p95_ms']:>10.0f}"
+              f"{summary['p99_ms']:>10.0f}{summary['error_rate']:>8.1%}")
+        if summary["errors"]:
+            print(f"{'':<12}errors: {', '.join(map(str, summary['errors']))}")
+
+    if saturated is None:
+        print(f"\nNo saturation up to {summaries[-1]['achieved_rps']:.2f} req/s "
+              f"at {summaries[-1]['mean_concurrency']:.1f} concurrent requests")
+    else:
+        print(f"\nSaturated at step {summaries[saturated]['step']} ({summaries[saturated]['saturated']})")
+        if saturated > 0:
+            healthy = summaries[saturated - 1]
+            print(f"Last healthy step {healthy['step']}: {healthy['achieved_rps']:.2f} req/s "
+                  f"at {healthy['mean_concurrency']:.1f} concurrent requests")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"target": url, "saturated_step": saturated, "steps": summaries}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Hit-rate/latency benchmark for the shared cache tier.
+Several worker processes replay the same Zipf-distributed question stream against
+their own embedding and answer caches, once per backend: in-process only ("none"),
+the SQLite tier of one host, and the Redis-protocol tier (a local stand-in server
+unless --redis-url is given). Reports the hit rate of each tier, lookup latency per
+outcome, and the size of the serialized values.
+
+Run from the python-service directory:
+    python -m benchmarks.shared_cache --workers 4 --requests 5000 --distinct 3000
+    python -m benchmarks.shared_cache --backends redis --redis-url redis://localhost:6379/0
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from multiprocessing import Pool
+from typing import List, Dict, Any, Optional
+import numpy as np
+import config
+from benchmarks.local_index import percentile_ms
+from benchmarks.redis_stand_in import StandInRedisServer
+from shared_cache import encode_value, layered_cache
+
+# Lookup outcomes, in the order they are reported
+OUTCOMES = ("local", "shared", "miss")
+
+
+def make_vector(question: int, dim: int) -> List[float]:
+    """Deterministic stand-in for the embedding of a question."""
+    return np.random.default_rng(question).normal(size=dim).astype(np.float32).tolist()
+
+
+def make_answer(question: int, answer_chars: int) -> Dict[str, Any]:
+    """Stand-in for a cached answer report."""
+    sentence = f"Here is what Northeastern University says about topic {question}. "
+    return {
+        "question": f"Question {question}",
+        "answer": (sentence * (answer_chars // len(sentence) + 1))[:answer_chars],
+        "doc_ids": [f"chunk_{question}_{i}" for i in range(5)],
+        "metrics": {"query_type": "simple", "sources_found": 3, "documents_retrieved": 5}
+    }
+
+
+def run_worker(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Replay one worker's question stream and return its lookup outcomes and latencies."""
+    cache_config = {**config.SHARED_CACHE_CONFIG, **job["cache_config"]}
+    caches = {
+        "embeddings": layered_cache("embeddings", job["local_size"], version="bench", cache_config=cache_config),
+        "answers": layered_cache("answers", job["local_size"], 3600, cache_config=cache_config)
+    }
+    rng = np.random.default_rng(job["seed"])
+    questions = (rng.zipf(job["zipf"], size=job["requests"]) - 1) % job["distinct"]
+
+    latencies = {name: {outcome: [] for outcome in OUTCOMES} for name in caches}
+    for question in questions.tolist():
+        for name, cache in caches.items():
+            local = getattr(cache, "local", cache)
+            local_hits = local.hits
+            start = time.perf_counter()
+            value = cache.get(question)
+            elapsed = time.perf_counter() - start
+            if value is None:
+                outcome = "miss"
+                value = make_vector(question, job["dim"]) if name == "embeddings" else make_answer(question, job["answer_chars"])
+                cache.set(question, value)
+            else:
+                outcome = "local" if local.hits > local_hits else "shared"
+            latencies[name][outcome].append(elapsed)
+    return latencies
+
+
+def start_backend(backend: str, args: argparse.Namespace, tmp_dir: str) -> Dict[str, Any]:
+    """Return the cache configuration of a backend, starting the Redis stand-in if needed."""
+    if backend == "sqlite":
+        return {"backend": "sqlite", "sqlite_path": os.path.join(tmp_dir, f"shared-{time.time_ns()}.sqlite")}
+    if backend == "redis":
+        url = args.redis_url
+        if url is None:
+            url = StandInRedisServer(latency=args.redis_latency_ms / 1000).start().url
+        return {"backend": "redis", "redis_url": url, "key_prefix": f"bench{time.time_ns()}"}
+    return {"backend": "none"}
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge the workers' latencies into hit rates and latency percentiles per cache and outcome."""
+    summary = {}
+    for name in results[0]:
+        merged = {outcome: [t for result in results for t in result[name][outcome]] for outcome in OUTCOMES}
+        lookups = sum(len(times) for times in merged.values())
+        summary[name] = {
+            "lookups": lookups,
+            "hit_rate": (len(merged["local"]) + len(merged["shared"])) / lookups if lookups else 0.0,
+            **{
+                outcome: {
+                    "share": len(times) / lookups if lookups else 0.0,
+                    "p50_ms": percentile_ms(times, 50) if times else None,
+                    "p99_ms": percentile_ms(times, 99) if times else None
+                }
+                for outcome, times in merged.items()
+            }
+        }
+    return summary
+
+
+def value_sizes(dim: int, answer_chars: int) -> Dict[str, Dict[str, int]]:
+    """Bytes of a vector and an answer as plain JSON and as stored in the shared tier."""
+    vector, answer = make_vector(0, dim), make_answer(0, answer_chars)
+    return {
+        name: {"json": len(json.dumps(value).encode("utf-8")), "encoded": len(encode_value(value))}
+        for name, value in (("embeddings", vector), ("answers", answer))
+    }
+
+
+def print_summary(backend: str, summary: Dict[str, Any]) -> None:
+    for name, stats in summary.items():
+        cells = "".join(
+            f"{stats[outcome]['share']:>8.1%}"
+            + (f"{stats[outcome]['p50_ms']:>8.3f}{stats[outcome]['p99_ms']:>8.3f}" if stats[outcome]["p50_ms"] is not None else f"{'-':>8}{'-':>8}")
+            for outcome in OUTCOMES
+        )
+        print(f"{backend:<8}{name:<12}{stats['hit_rate']:>8.1%}{cells}")
+
+
+def main():
+    """Command-line entry point for the benchmark."""
+    parser = argparse.ArgumentParser(description="Shared cache tier hit-rate/latency benchmark")
+    parser.add_argument("--backends", nargs="+", default=["none", "sqlite", "redis"], choices=["none", "sqlite", "redis"],
+                        help="Shared tiers to compare")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes sharing the tier")
+    parser.add_argument("--requests", type=int, default=5000, help="Questions per worker")
+    parser.add_argument("--distinct", type=int, default=3000, help="Distinct questions")
+    parser.add_argument("--zipf", type=float, default=1.2, help="Zipf exponent of question popularity")
+    parser.add_argument("--local-size", type=int, default=500, help="Entries of each worker's local tier")
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension")
+    parser.add_argument("--answer-chars", type=int, default=1500, help="Answer length")
+    parser.add_argument("--redis-url", default=None, help="Redis server to use (default: a local stand-in)")
+    parser.add_argument("--redis-latency-ms", type=float, default=0.0, help="Latency added by the stand-in server")
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    sizes = value_sizes(args.dim, args.answer_chars)
+    for name, size in sizes.items():
+        print(f"{name}: {size['json']} bytes as JSON, {size['encoded']} bytes in the shared tier")
+    print(f"\n{'backend':<8}{'cache':<12}{'hits':>8}" + "".join(f"{outcome:>8}{'p50 ms':>8}{'p99 ms':>8}" for outcome in OUTCOMES))
+
+    results = {"sizes": sizes, "backends": {}}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for backend in args.backends:
+            cache_config = start_backend(backend, args, tmp_dir)
+            jobs = [
+                {
+                    "cache_config": cache_config,
+                    "local_size": args.local_size,
+                    "requests": args.requests,
+                    "distinct": args.distinct,
+                    "zipf": args.zipf,
+                    "dim": args.dim,
+                    "answer_chars": args.answer_chars,
+                    "seed": worker
+                }
+                for worker in range(args.workers)
+            ]
+            with Pool(args.workers) as pool:
+                summary = summarize(pool.map(run_worker, jobs))
+            results["backends"][backend] = summary
+            print_summary(backend, summary)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
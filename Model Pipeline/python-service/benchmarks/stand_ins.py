@@ -0,0 +1,222 @@
+"""
+Local stand-ins for the external services RAGAgent talks to, for offline benchmarks.
+Each stand-in sleeps for a latency drawn from a configurable lognormal distribution and
+fails at a configurable rate, so the graph can be exercised without API keys or network:
+hashed bag-of-words embeddings, an in-memory vector store, a token-overlap reranker and
+a chat model that answers the router, decomposition, condense and synthesis prompts.
+"""
+
+import json
+import math
+import random
+import threading
+import time
+import zlib
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from bm25_index import tokenize
+from local_index import build_columns, filter_mask, normalize_rows, top_k_indices
+from rag_agent import Reranker
+
+
+class StandInError(Exception):
+    """Injected failure of a stand-in service."""
+
+
+class LatencyModel:
+    """Lognormal service time given by its median and p95, plus a failure rate."""
+
+    def __init__(self, median: float = 0.0, p95: Optional[float] = None, failure_rate: float = 0.0, seed: int = 0):
+        """
+        Args:
+            median: Median latency in seconds (0 disables sleeping)
+            p95: 95th percentile latency in seconds; defaults to the median (no spread)
+            failure_rate: Share of calls that raise StandInError after their latency
+            seed: Seed of the latency and failure draws
+        """
+        self.median = median
+        self.sigma = math.log(p95 / median) / 1.645 if median > 0 and p95 and p95 > median else 0.0
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec: str, seed: int = 0) -> "LatencyModel":
+        """Build a model from 'median_ms[,p95_ms[,failure_rate]]', e.g. '300,900,0.01'."""
+        parts = [float(part) for part in spec.split(",")] if spec else []
+        median_ms = parts[0] if parts else 0.0
+        p95_ms = parts[1] if len(parts) > 1 else None
+        failure_rate = parts[2] if len(parts) > 2 else 0.0
+        return cls(median_ms / 1000, p95_ms / 1000 if p95_ms is not None else None, failure_rate, seed)
+
+    def sample(self) -> Tuple[float, bool]:
+        """Draw the latency of one call and whether it fails."""
+        with self._lock:
+            latency = self.median * math.exp(self._random.gauss(0.0, self.sigma)) if self.median > 0 else 0.0
+            failed = self._random.random() < self.failure_rate
+        return latency, failed
+
+    def wait(self, service: str) -> None:
+        """Sleep for one call's latency and raise if the call fails."""
+        latency, failed = self.sample()
+        if latency:
+            time.sleep(latency)
+        if failed:
+            raise StandInError(f"Injected {service} failure")
+
+
+def stable_hash(text: str) -> int:
+    """Process-independent hash of a string (the built-in hash is salted per process)."""
+    return zlib.crc32(text.encode("utf-8"))
+
+
+class HashEmbeddings:
+    """Hashed bag-of-words embeddings, so texts sharing words have similar vectors."""
+
+    def __init__(self, dim: int = 256, latency: Optional[LatencyModel] = None):
+        self.dim = dim
+        self.latency = latency or LatencyModel()
+
+    def vectorize(self, texts: List[str]) -> np.ndarray:
+        """Embed texts without latency or failures (used to build the corpus)."""
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text) or [text]
+            for token in tokens:
+                value = stable_hash(token)
+                vectors[row, value % self.dim] += 1.0 if value & 1 << 31 else -1.0
+        return normalize_rows(vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        self.latency.wait("embedding")
+        return self.vectorize([text])[0].tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.latency.wait("embedding")
+        return self.vectorize(texts).tolist()
+
+
+class InMemoryVectorStore:
+    """Exact cosine search over in-memory vectors, per namespace, with Pinecone-style filters."""
+
+    def __init__(self, embedding: HashEmbeddings, latency: Optional[LatencyModel] = None):
+        self.embedding = embedding
+        self.latency = latency or LatencyModel()
+        self.namespaces = {}
+
+    def add_texts(
+        self,
+        texts: List[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+        namespace: Optional[str] = None
+    ) -> None:
+        """Embed and add texts to a namespace."""
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [f"{namespace or 'default'}_{i}" for i in range(len(texts))]
+        current = self.namespaces.get(namespace)
+        if current is not None:
+            texts = current["texts"] + list(texts)
+            metadatas = current["metadatas"] + list(metadatas)
+            ids = current["ids"] + list(ids)
+        self.namespaces[namespace] = {
+            "ids": list(ids),
+            "texts": list(texts),
+            "metadatas": list(metadatas),
+            "vectors": self.embedding.vectorize(texts),
+            "columns": build_columns(metadatas)
+        }
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        namespace: Optional[str] = None
+    ) -> List[Tuple[Document, float]]:
+        """Return (Document, cosine score) pairs of the top-k texts of a namespace."""
+        self.latency.wait("vector search")
+        data = self.namespaces.get(namespace)
+        if data is None:
+            return []
+
+        scores = data["vectors"] @ normalize_rows(np.asarray(embedding, dtype=np.float32))
+        if filter:
+            scores = np.where(filter_mask(data["columns"], filter, len(scores)), scores, -np.inf)
+        rows = [row for row in top_k_indices(scores, k) if np.isfinite(scores[row])]
+        # Fresh metadata per result, like a response deserialized from the network
+        return [
+            (Document(id=data["ids"][row], page_content=data["texts"][row], metadata=dict(data["metadatas"][row])), float(scores[row]))
+            for row in rows
+        ]
+
+
+class StandInReranker(Reranker):
+    """Reranker scoring documents by the share of query tokens they contain."""
+
+    name = "stand-in"
+
+    def __init__(self, latency: Optional[LatencyModel] = None):
+        self.latency = latency or LatencyModel()
+
+    def rerank(self, query: str, documents: List[str], top_n: int) -> List[Tuple[int, Optional[float]]]:
+        self.latency.wait("rerank")
+        query_tokens = set(tokenize(query))
+        scores = [
+            0.1 + 0.9 * len(query_tokens & set(tokenize(document))) / max(len(query_tokens), 1)
+            for document in documents
+        ]
+        order = sorted(range(len(documents)), key=lambda i: scores[i], reverse=True)[:top_n]
+        return [(i, scores[i]) for i in order]
+
+
+def _between(text: str, start: str, end: str) -> Optional[str]:
+    """Return the text between two markers, or None if the start marker is missing."""
+    if start not in text:
+        return None
+    return text.split(start, 1)[1].split(end, 1)[0].strip()
+
+
+def stand_in_response(prompt: str, complex_share: float = 0.3, answer_chars: int = 800) -> str:
+    """Answer one of the agent's prompts the way a well-behaved model would."""
+    question = _between(prompt, "complexity:\n", "\n\nRespond")
+    if question is not None:
+        # The same question is always classified the same way
+        return "complex" if stable_hash(question) % 1000 < complex_share * 1000 else "simple"
+
+    question = _between(prompt, "comprehensively:\n", "\n\nEach")
+    if question is not None:
+        return json.dumps({"sub_questions": [f"{question} (part {part})" for part in (1, 2)]})
+
+    question = _between(prompt, "Follow-up question:", "\n")
+    if question is not None:
+        return question
+
+    question = _between(prompt, "QUESTION:\n", "\n\nEXTRACTED SOURCES")
+    sources = _between(prompt, "EXTRACTED SOURCES:\n", "\n\nYou are") or ""
+    sentence = f"Here is what Northeastern University says about {question or 'this topic'}. "
+    answer = (sentence * (answer_chars // len(sentence) + 1))[:answer_chars]
+    return answer + "\n\nSources:\n" + "\n".join(f"- {source}" for source in sources.splitlines() if source)
+
+
+class StandInChatModel(BaseChatModel):
+    """Chat model answering the agent's prompts locally after a simulated latency."""
+
+    latency: Any = None
+    complex_share: float = 0.3
+    answer_chars: int = 800
+
+    @property
+    def _llm_type(self) -> str:
+        return "stand-in"
+
+    def _generate(self, messages: List[Any], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency is not None:
+            self.latency.wait("chat model")
+        prompt = "\n".join(str(message.content) for message in messages)
+        content = stand_in_response(prompt, self.complex_share, self.answer_chars)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
@@ -0,0 +1,252 @@
+"""
+Lexical retrieval module with a local BM25 inverted index.
+Indexes are built from the chunks in the document store, serialized as compact
+postings arrays per namespace, and fused with vector results by reciprocal rank.
+"""
+
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+import numpy as np
+from chunk_record import ChunkRecord
+from doc_store import document_key
+from local_index import build_columns, filter_mask
+import config
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+_STOPWORDS = frozenset("""
+a an and are as at be by can do does for from has have how i if in is it its me my
+of on or our so than that the their them then there these this to was we were what
+when where which who will with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase terms for BM25.
+
+    Short alphabetic tokens followed by a number are also joined, so "CS 5800",
+    "CS5800" and "cs-5800" all produce the term "cs5800", and "I-20" produces "i20".
+    """
+    tokens = _TOKEN_PATTERN.findall(text.lower())
+    terms = [token for token in tokens if token not in _STOPWORDS]
+    for current, following in zip(tokens, tokens[1:]):
+        if current.isalpha() and len(current) <= 5 and following.isdigit():
+            terms.append(current + following)
+    return terms
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Any]], k: int = 60) -> List[Any]:
+    """Merge ranked document lists by reciprocal rank fusion, best first."""
+    scores, docs = {}, {}
+    for results in result_lists:
+        for rank, doc in enumerate(results):
+            key = document_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            docs.setdefault(key, doc)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    for key in ranked:
+        docs[key].metadata["rrf_score"] = scores[key]
+    return [docs[key] for key in ranked]
+
+
+class BM25Index:
+    """BM25 index over one namespace stored as flat postings arrays."""
+
+    def __init__(
+        self,
+        chunk_ids: np.ndarray,
+        terms: np.ndarray,
+        offsets: np.ndarray,
+        doc_ids: np.ndarray,
+        tfs: np.ndarray,
+        doc_lengths: np.ndarray,
+        build_id: str,
+        k1: float = config.BM25_CONFIG["k1"],
+        b: float = config.BM25_CONFIG["b"]
+    ):
+        """Create an index from postings arrays, where term i owns doc_ids[offsets[i]:offsets[i+1]]."""
+        self.chunk_ids = chunk_ids
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.build_id = build_id
+        self.k1 = k1
+        self.vocabulary = {term: i for i, term in enumerate(terms.tolist())}
+
+        # Per-document length normalization of the BM25 denominator
+        average_length = float(doc_lengths.mean()) if len(doc_lengths) else 1.0
+        self._length_norm = (k1 * (1 - b + b * doc_lengths / max(average_length, 1.0))).astype(np.float32)
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    @classmethod
+    def build(cls, texts: Iterable[Tuple[str, str]], build_id: str) -> "BM25Index":
+        """Build an index from (chunk id, text) pairs."""
+        chunk_ids, doc_lengths = [], []
+        postings = {}
+        for doc_id, (chunk_id, text) in enumerate(texts):
+            counts = Counter(tokenize(text))
+            chunk_ids.append(chunk_id)
+            doc_lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                postings.setdefault(term, []).append((doc_id, min(count, np.iinfo(np.uint16).max)))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+        flat = [posting for term in terms for posting in postings[term]]
+
+        return cls(
+            chunk_ids=np.array(chunk_ids, dtype=str),
+            terms=np.array(terms, dtype=str),
+            offsets=offsets,
+            doc_ids=np.array([doc_id for doc_id, _ in flat], dtype=np.int32),
+            tfs=np.array([count for _, count in flat], dtype=np.uint16),
+            doc_lengths=np.array(doc_lengths, dtype=np.int32),
+            build_id=build_id
+        )
+
+    def save(self, path: str) -> None:
+        """Serialize the postings arrays to an uncompressed .npz file."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            chunk_ids=self.chunk_ids,
+            terms=self.terms,
+            offsets=self.offsets,
+            doc_ids=self.doc_ids,
+            tfs=self.tfs,
+            doc_lengths=self.doc_lengths,
+            build_id=np.array(self.build_id)
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Load an index serialized with save()."""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                chunk_ids=data["chunk_ids"],
+                terms=data["terms"],
+                offsets=data["offsets"],
+                doc_ids=data["doc_ids"],
+                tfs=data["tfs"],
+                doc_lengths=data["doc_lengths"],
+                build_id=str(data["build_id"])
+            )
+
+    def search(self, query: str, k: int, mask: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        """Return (chunk id, BM25 score) pairs of the top-k matching chunks, restricted to mask if given."""
+        scores = np.zeros(len(self.chunk_ids), dtype=np.float32)
+        n_docs = len(self.chunk_ids)
+
+        for term in set(tokenize(query)):
+            term_index = self.vocabulary.get(term)
+            if term_index is None:
+                continue
+            start, end = self.offsets[term_index], self.offsets[term_index + 1]
+            docs = self.doc_ids[start:end]
+            tfs = self.tfs[start:end].astype(np.float32)
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + self._length_norm[docs])
+
+        if mask is not None:
+            scores[~mask] = 0.0
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k)[:k]]
+        matched = matched[np.argsort(-scores[matched])]
+        return [(str(self.chunk_ids[i]), float(scores[i])) for i in matched]
+
+
+class BM25Store:
+    """Per-namespace BM25 indexes kept in sync with the document store."""
+
+    def __init__(self, doc_store: Any, path: str = config.BM25_INDEX_PATH):
+        """Create a store that loads or builds namespace indexes on first use."""
+        self.doc_store = doc_store
+        self.path = path
+        self.indexes = {}
+        self.columns = {}
+        self._lock = threading.Lock()
+
+    def _index_path(self, namespace: str) -> str:
+        return os.path.join(self.path, f"{namespace or '__default__'}.npz")
+
+    def get_index(self, namespace: Optional[str]) -> BM25Index:
+        """Return the namespace index, loading it from disk or rebuilding it if stale."""
+        namespace = namespace or ""
+        index = self.indexes.get(namespace)
+        if index is not None:
+            return index
+
+        with self._lock:
+            if namespace in self.indexes:
+                return self.indexes[namespace]
+
+            index_path = self._index_path(namespace)
+            if os.path.exists(index_path):
+                index = BM25Index.load(index_path)
+                if index.build_id != self.doc_store.build_id:
+                    logger.info(f"BM25 index {index_path} is stale (build {index.build_id}), rebuilding")
+                    index = None
+
+            if index is None:
+                index = BM25Index.build(self.doc_store.iter_texts(namespace), self.doc_store.build_id)
+                try:
+                    index.save(index_path)
+                except OSError as e:
+                    logger.warning(f"Could not save BM25 index to {index_path}: {str(e)}")
+
+            # Metadata columns aligned with the index rows, for filtered searches
+            metadata = dict(self.doc_store.iter_metadata(namespace))
+            self.columns[namespace] = build_columns([metadata.get(chunk_id, {}) for chunk_id in index.chunk_ids.tolist()])
+
+            logger.info(f"Loaded BM25 index for namespace '{namespace or 'default'}' with {len(index)} chunks")
+            self.indexes[namespace] = index
+            return index
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        namespace: Optional[str] = None,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[ChunkRecord]:
+        """Return the top-k chunks of a namespace by BM25 score, optionally metadata-filtered."""
+        index = self.get_index(namespace)
+        mask = filter_mask(self.columns[namespace or ""], filter, len(index)) if filter else None
+        hits = index.search(query, k, mask)
+        scores = dict(hits)
+        docs = self.doc_store.get_chunks([chunk_id for chunk_id, _ in hits], namespace=namespace or "")
+        for doc in docs:
+            doc.metadata["bm25_score"] = scores[doc.id]
+        return docs
+
+
+if __name__ == "__main__":
+    # Prebuild the BM25 indexes of every namespace, e.g. when deploying new artifacts
+    from doc_store import load_document_store
+
+    doc_store = load_document_store(config.DOC_STORE_PATH)
+    if doc_store is None:
+        raise SystemExit(f"No document store found at {config.DOC_STORE_PATH}")
+    store = BM25Store(doc_store)
+    for namespace in doc_store.namespaces():
+        store.get_index(namespace)
@@ -0,0 +1,218 @@
+"""
+Cache module with the bounded in-process caches used by the RAG agent, and a
+SQLite-backed cache for results that should survive restarts.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+# Returned by get() on a miss when no default is given
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with a size bound, optional TTL and hit/miss/eviction counters."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        """
+        Create an empty cache.
+
+        Args:
+            maxsize: Maximum number of entries kept; the least recently used entry is evicted first
+            ttl: Seconds an entry stays valid, or None to keep entries until evicted
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default on a miss or expired entry."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and self.ttl is not None and time.monotonic() - entry[1] > self.ttl:
+                del self._data[key]
+                self.evictions += 1
+                entry = _MISSING
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value without counting a lookup or refreshing its recency."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or (self.ttl is not None and time.monotonic() - entry[1] > self.ttl):
+                return default
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entries beyond maxsize."""
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        """Remove a key if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Return a snapshot of the (key, value) pairs, least recently used first."""
+        with self._lock:
+            return [(key, entry[0]) for key, entry in self._data.items()]
+
+    def clear(self) -> None:
+        """Remove all entries and reset the counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size and hit/miss/eviction counters."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for cache keys: lowercase, single spaces, no trailing punctuation."""
+    return re.sub(r"\s+", " ", query.lower()).strip().rstrip("?!. ")
+
+
+def template_version(template: str) -> str:
+    """Short fingerprint of a prompt template, so edited prompts do not reuse old outputs."""
+    return hashlib.sha1(template.encode("utf-8")).hexdigest()[:12]
+
+
+class PersistentCache:
+    """Bounded, thread-safe cache of JSON values in a SQLite file with an in-memory LRU in front."""
+
+    def __init__(self, path: str, maxsize: int = 10000, ttl: Optional[float] = None, memory_size: int = 1024):
+        """
+        Open or create the cache file.
+
+        Args:
+            path: SQLite file path
+            maxsize: Maximum number of entries kept on disk; the least recently used are evicted first
+            ttl: Seconds an entry stays valid, or None to keep entries until evicted
+            memory_size: Entries also kept in memory
+        """
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.memory = LRUCache(memory_size, ttl)
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT, created REAL, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the cached value for key, or default on a miss or expired entry."""
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            with self._lock:
+                self.hits += 1
+            return value
+
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return default
+            self._conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+
+        value = json.loads(row[0])
+        self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a JSON-serializable value, evicting the least recently used entries beyond maxsize."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now)
+            )
+            excess = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.maxsize
+            evicted = []
+            if excess > 0:
+                evicted = [row[0] for row in self._conn.execute(
+                    "SELECT key FROM entries ORDER BY last_used LIMIT ?", (excess,)
+                )]
+                self._conn.executemany("DELETE FROM entries WHERE key = ?", [(old_key,) for old_key in evicted])
+                self.evictions += len(evicted)
+            self._conn.commit()
+        for old_key in evicted:
+            self.memory.delete(old_key)
+        self.memory.set(key, value)
+
+    def clear(self) -> None:
+        """Remove all entries and reset the counters."""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+        self.memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size and hit/miss/eviction counters."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
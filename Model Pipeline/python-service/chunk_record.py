@@ -0,0 +1,53 @@
+"""
+Chunk record module with the compact document representation used inside the RAG graph.
+Retrieval produces ChunkRecords, which reference the chunk text instead of copying it into
+LangChain Documents; conversion to and from Documents only happens at the edges.
+"""
+
+from typing import List, Dict, Any, Optional
+from langchain_core.documents import Document
+
+
+class ChunkRecord:
+    """Retrieved chunk with its id, text, source URL, retrieval score and metadata."""
+
+    __slots__ = ("id", "text", "source", "score", "metadata")
+
+    def __init__(
+        self,
+        id: Optional[str],
+        text: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        score: Optional[float] = None
+    ):
+        """Create a record; the text and metadata are referenced, not copied."""
+        self.id = id
+        self.text = text
+        self.metadata = metadata if metadata is not None else {}
+        self.source = self.metadata.get("source")
+        self.score = score
+
+    @property
+    def page_content(self) -> str:
+        """The chunk text, under the attribute name LangChain Documents use."""
+        return self.text
+
+    def __repr__(self) -> str:
+        return f"ChunkRecord(id={self.id!r}, source={self.source!r}, score={self.score!r})"
+
+    @classmethod
+    def from_document(cls, doc: Any, score: Optional[float] = None) -> "ChunkRecord":
+        """Wrap a LangChain Document returned by an external vector store."""
+        return cls(getattr(doc, "id", None), doc.page_content, doc.metadata, score)
+
+    def to_document(self) -> Document:
+        """Convert to a LangChain Document, with the retrieval score in the metadata."""
+        metadata = dict(self.metadata)
+        if self.score is not None:
+            metadata["score"] = self.score
+        return Document(id=self.id, page_content=self.text, metadata=metadata)
+
+
+def to_documents(chunks: List[ChunkRecord]) -> List[Document]:
+    """Convert chunk records to LangChain Documents for callers outside the graph."""
+    return [chunk.to_document() for chunk in chunks]
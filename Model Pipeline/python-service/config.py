@@ -24,6 +24,165 @@ PINECONE_API_KEY =os.getenv("PINECONE_API_KEY")
 # Pinecone index name
 PINECONE_INDEX_NAME = "askneu"
 
+# Local artifacts built by the embedding DAG
+ARTIFACTS_DIR = os.getenv("ASKNEU_ARTIFACTS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "artifacts"))
+DOC_STORE_PATH = os.path.join(ARTIFACTS_DIR, "docstore.sqlite")
+LOCAL_INDEX_PATH = os.path.join(ARTIFACTS_DIR, "vectors")
+BM25_INDEX_PATH = os.path.join(ARTIFACTS_DIR, "bm25")
+
+# Caches written by the service and kept across restarts
+CACHE_DIR = os.getenv("ASKNEU_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache"))
+
+# Answer ratings (durable, shared by the workers of a host)
+FEEDBACK_DIR = os.getenv("ASKNEU_FEEDBACK_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "feedback"))
+
+# Rotating log of the questions users ask
+QUERY_LOG_DIR = os.getenv("ASKNEU_QUERY_LOG_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "query_logs"))
+
+# Document store configuration
+DOC_STORE_CONFIG = {
+    "mmap_size": 256 * 1024 * 1024  # Bytes of the SQLite file to memory-map
+}
+
+# Local vector index configuration
+LOCAL_INDEX_CONFIG = {
+    "exact": True,  # Brute-force top-k; False uses the approximate IVF search
+    "nlist": 64,  # IVF cells built at load time for approximate search
+    "nprobe": 8,  # IVF cells scanned per query
+    "fallback": True  # Serve from the local index when Pinecone is unavailable
+}
+
+# Near-duplicate chunk filtering applied before reranking and synthesis
+DEDUP_CONFIG = {
+    "enabled": True,
+    "threshold": 0.82,  # Minimum SimHash bit similarity (0-1); ~0.82 is a handful of edited words per chunk
+    "shingle_size": 3  # Words per shingle
+}
+
+# BM25 lexical index configuration
+BM25_CONFIG = {
+    "k1": 1.2,
+    "b": 0.75,
+    "rrf_k": 60  # Reciprocal rank fusion constant for hybrid retrieval
+}
+
+# Reranking configuration
+RERANK_CONFIG = {
+    "model": "rerank-v3.5",
+    "cache_size": 2048,  # Cached rerank results (query + candidate ids)
+    "cache_ttl": 3600,  # Seconds
+    "timeout": 3.0,  # Seconds before a Cohere request is abandoned
+    "slow_threshold": 1.5,  # Cohere calls slower than this count as failures
+    "failure_threshold": 3,  # Consecutive failed/slow calls that open the circuit
+    "reset_timeout": 30,  # Seconds before an open circuit lets a trial call through
+    "onnx_model_dir": os.path.join(ARTIFACTS_DIR, "cross-encoder")  # model.onnx + tokenizer.json
+}
+
+# Query-to-namespace/subdomain routing from centroids of the local vector snapshot
+ROUTER_CONFIG = {
+    "enabled": True,  # Only active when a local vector snapshot is deployed
+    "route_namespaces": ["auto", "default"],  # Requested namespaces the router may narrow
+    "temperature": 0.05,  # Softmax temperature over centroid cosine similarities
+    "min_confidence": 0.7,  # Probability needed to switch to a narrower namespace
+    "subdomain_min_confidence": 0.6,  # Probability needed to filter the search to one subdomain
+    "min_subdomain_chunks": 50  # Smaller subdomains are pooled and never routed to
+}
+
+# /query/batch limits
+BATCH_CONFIG = {
+    "max_items": 100,  # Questions accepted per request
+    "workers": 8  # Questions answered concurrently within a request
+}
+
+# Cache of intermediate LLM outputs (query routing and decomposition)
+LLM_CACHE_CONFIG = {
+    "enabled": True,
+    "path": os.path.join(CACHE_DIR, "llm_outputs.sqlite"),
+    "maxsize": 20000,  # Entries kept on disk
+    "ttl": 7 * 24 * 3600,  # Seconds; independent of index rebuilds
+    "memory_size": 2048  # Entries also kept in memory
+}
+
+# Tier shared by the workers of a host (SQLite in shared memory) or by all hosts (Redis protocol),
+# layered behind the in-process caches; "none" keeps every cache per process
+SHARED_CACHE_CONFIG = {
+    "backend": os.getenv("ASKNEU_SHARED_CACHE", "none"),  # "none", "sqlite" or "redis"
+    "caches": ["embeddings", "rerank", "answers", "llm_outputs"],  # Caches layered over the shared tier
+    "key_prefix": "askneu",
+    "default_ttl": 24 * 3600,  # Seconds in the shared tier for caches without their own TTL
+    "sqlite_path": os.getenv(
+        "ASKNEU_SHARED_CACHE_PATH",
+        os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else CACHE_DIR, "askneu-shared-cache.sqlite")
+    ),
+    "sqlite_maxsize": 200000,  # Entries kept in the SQLite tier; the oldest are evicted first
+    "redis_url": os.getenv("ASKNEU_REDIS_URL", "redis://localhost:6379/0"),
+    "timeout": 0.25,  # Seconds before a shared tier call is abandoned
+    "retry_interval": 30  # Seconds the shared tier is skipped after an error
+}
+
+# Final answers of one-off questions (follow-ups within a session are never cached)
+ANSWER_CACHE_CONFIG = {
+    "enabled": True,
+    "maxsize": 2000,  # Answers kept in memory
+    "ttl": 6 * 3600,  # Seconds; keys also include the document store build and prompt version
+    "max_pinned": 1000,  # Positively rated answers kept outside the LRU/TTL bounds until the index is rebuilt
+    "max_excluded": 10000,  # Negatively rated questions that are never cached
+    "rating_lookback_days": 30,  # Stored ratings applied when a worker starts
+    "ratings_refresh": 10  # Seconds a worker keeps a rating read from the shared tier before reading it again
+}
+
+# Precomputed answers to frequent questions, rebuilt after every document store build (python main.py faq)
+FAQ_CONFIG = {
+    "enabled": True,
+    "path": os.path.join(ARTIFACTS_DIR, "faq.npz"),
+    "questions_path": os.path.join(os.path.dirname(os.path.abspath(__file__)), "faq_questions.txt"),  # Curated questions, one per line
+    "min_similarity": 0.93,  # Cosine similarity to a FAQ question needed to serve its answer
+    "mine_top_n": 200,  # Most frequent logged questions precomputed along with the curated ones
+    "mine_hours": 7 * 24,  # How far back the query log is mined
+    "mine_min_count": 3  # Times a logged question must have been asked to be precomputed
+}
+
+# Asynchronous /query log, used for traffic replay and cache warming
+QUERY_LOG_CONFIG = {
+    "enabled": True,
+    "path": QUERY_LOG_DIR,
+    "max_file_records": 50000,  # Records per file before rotating
+    "rotate_seconds": 3600,  # A new file is started at least this often
+    "max_files": 168,  # Oldest files are deleted beyond this
+    "queue_size": 10000,  # Records waiting for the writer; when full, records are dropped instead of blocking
+    "flush_interval": 1.0,  # Seconds between batched writes
+    "upload_url": os.getenv("ASKNEU_QUERY_LOG_UPLOAD_URL"),  # gs://bucket/prefix finished files are copied to for FAQ mining; None keeps them local
+    "warm_top_n": 200,  # Most frequent recent questions replayed by 'main.py warm'
+    "warm_hours": 24  # How far back 'main.py warm' counts questions
+}
+
+# Feedback store; answers and ratings are buffered and written by a background flusher
+FEEDBACK_CONFIG = {
+    "backend": "sqlite",  # 'sqlite' or 'jsonl' (append-only file for local use)
+    "paths": {
+        "sqlite": os.path.join(FEEDBACK_DIR, "feedback.sqlite"),
+        "jsonl": os.path.join(FEEDBACK_DIR, "feedback.jsonl")
+    },
+    "queue_size": 5000,  # Records buffered in memory; when full, further records are dropped and counted
+    "batch_size": 500,  # Records written per transaction
+    "flush_interval": 1.0,  # Seconds between flushes
+    "recent_answers": 10000,  # Answer contexts kept in memory so feedback is attributed without reading the store
+    "answer_retention_days": 90  # Unrated answer contexts older than this are deleted (sqlite)
+}
+
+# Per-session conversation memory for follow-up questions
+CONVERSATION_CONFIG = {
+    "max_sessions": 10000,  # Least recently active sessions are evicted beyond this
+    "session_ttl": 1800,  # Seconds of inactivity before a session is dropped
+    "max_turns": 4,  # Turns kept verbatim; older turns are folded into the summary
+    "history_token_budget": 1500,  # Estimated tokens of verbatim turns before folding early
+    "summary_token_budget": 300,  # Oldest summary lines are dropped beyond this
+    "answer_chars": 1200,  # Stored answers are truncated to this length
+    "summary_line_chars": 240,  # Length cap of one summarized turn
+    "condense_followups": True,  # Rewrite follow-ups into standalone questions for retrieval
+    "condense_llm": "gemini"  # LLM used for the rewrite
+}
+
 # Models configuration
 MODEL_CONFIG = {
     "openai": {
@@ -32,6 +191,12 @@ MODEL_CONFIG = {
         "max_retries": 2,
         "api_key": OPENAI_API_KEY
     },
+    "openai_mini": {
+        "model_name": "gpt-4.1-mini",
+        "temperature": 0.1,
+        "max_retries": 2,
+        "api_key": OPENAI_API_KEY
+    },
     "gemini": {
         "model_name": "gemini-2.0-flash",  
         "temperature": 0.1,
@@ -40,23 +205,67 @@ MODEL_CONFIG = {
     },
     "embeddings": {
         "model_name": "text-embedding-3-small",
-        "api_key": OPENAI_API_KEY
+        "api_key": OPENAI_API_KEY,
+        "cache_size": 4096  # Query embeddings kept in memory
     }
 }
 
+# Tiered synthesis model selection for namespace configs with "tiered_llm"
+LLM_TIER_CONFIG = {
+    "tiers": {"small": "gemini", "medium": "openai_mini", "large": "openai"},  # MODEL_CONFIG names
+    "small_max_context_tokens": 2500,  # Simple queries with more context than this use the medium tier
+    "medium_max_context_tokens": 6000,  # Any query with more context than this uses the large tier
+    "latency_budget": 15.0,  # Target seconds per request, counted from the timing of earlier steps
+    "large_min_remaining": 6.0,  # Seconds of budget left needed to synthesize with the large tier
+    "medium_min_remaining": 3.0  # Below this the small tier is used
+}
+
 
 SEARCH_CONFIG = {
     "default": {  # Default namespace
         "direct": {
             "top_n": 7,
             "llm": "gemini",  # Using Gemini for direct search
-            "rerank": True
+            "rerank": True,
+            "reranker": "cohere",  # 'cohere', 'lexical', 'onnx' or 'noop'
+            "reranker_fallback": "lexical",  # Used when the reranker fails, is slow or its circuit is open
+            "rerank_max_k": 7,  # Most documents kept after reranking
+            "rerank_min_score": 0.05,  # Documents scoring below this relevance are dropped
+            "ids_only": False,  # Query Pinecone for ids/scores only and read text from the document store
+            "backend": "pinecone",  # 'pinecone' or 'local' (in-process snapshot of the index)
+            "hybrid": False,  # Fuse BM25 results with vector results before reranking
+            "bm25_top_n": 7,  # Lexical candidates fused in hybrid mode
+            "mmr": False,  # Over-fetch and select a diverse top_n by maximal marginal relevance
+            "mmr_fetch_k": 28,  # Candidates fetched (with vectors) for MMR selection
+            "mmr_lambda": 0.5,  # 1.0 = relevance only, 0.0 = diversity only
+            "subdomains": None,  # Restrict retrieval to these subdomains, e.g. ["catalog", "registrar"]
+            "max_age_days": None,  # Skip pages scraped more than this many days ago
+            "recency_half_life_days": None,  # Age at which the recency boost halves; None disables decay
+            "recency_weight": 0.3  # Share of the final score that depends on page age
         },
         "deepsearch": {
             "top_n": 6,  # For simple queries
             "sub_query_top_n": 4,  # For each sub-question in complex queries
             "llm": "openai",  # Use OpenAI for deep search
-            "rerank": True
+            "tiered_llm": True,  # Pick the synthesis model per query from LLM_TIER_CONFIG instead of "llm"
+            "rerank": True,
+            "rerank_strategy": "merged",  # Complex queries: 'merged' (one call), 'concurrent' or 'sequential' per sub-question
+            "rerank_top_k": 8,  # Global cut on the merged candidate list for complex queries
+            "reranker": "cohere",
+            "reranker_fallback": "lexical",
+            "rerank_max_k": 8,
+            "rerank_min_score": 0.05,
+            "ids_only": False,
+            "backend": "pinecone",
+            "hybrid": False,
+            "bm25_top_n": 6,
+            "mmr": False,
+            "mmr_fetch_k": 24,
+            "mmr_lambda": 0.5,
+            "subdomains": None,
+            "max_age_days": None,
+            "recency_half_life_days": None,
+            "recency_weight": 0.3
         }
     },
     "classroom": {
@@ -84,6 +293,27 @@ SEARCH_CONFIG = {
             "llm": "openai",
             "rerank": True
         }
+    },
+    "all": {  # Federated alias searching every namespace concurrently
+        "direct": {
+            "shards": ["default", "classroom", "course"],  # Namespaces searched with this alias's settings
+            "shard_timeout": 2.0,  # Seconds to wait for shards; slower shards are left out of the results
+            "top_n": 8,
+            "llm": "gemini",
+            "rerank": True,
+            "rerank_max_k": 8
+        },
+        "deepsearch": {
+            "shards": ["default", "classroom", "course"],
+            "shard_timeout": 3.0,
+            "top_n": 8,
+            "sub_query_top_n": 4,
+            "llm": "openai",
+            "rerank": True,
+            "rerank_strategy": "merged",
+            "rerank_top_k": 8,
+            "rerank_max_k": 8
+        }
     }
 }
 
@@ -94,6 +324,9 @@ SYNTHESIS_PROMPT_TEMPLATE = """
 CONTEXT:
 {contexts}
 
+CONVERSATION HISTORY:
+{history}
+
 QUESTION:
 {question}
 
@@ -106,6 +339,7 @@ Guidelines:
 - Present information about NEU as factual knowledge without mentioning "context," "provided information," or any references to your information sources in the main body of your answer
 - DO NOT mention or refer to sources within your main answer
 - Answer the question comprehensively using the provided context
+- Use the conversation history only to understand what the question refers to
 - After your complete answer, ALWAYS include a "Sources" section that lists all the URLs provided in the EXTRACTED SOURCES section above
 - Format the sources section exactly like this:
   
@@ -123,6 +357,18 @@ Your responses should sound natural and helpful, as if you're simply sharing kno
 IMPORTANT: YOU MUST INCLUDE THE SOURCES SECTION AT THE END OF YOUR RESPONSE WITH ALL THE URLS LISTED.
 """
 
+# Follow-up rewrite prompt template
+CONDENSE_PROMPT_TEMPLATE = """
+Given this conversation about Northeastern University:
+{history}
+
+Rewrite the follow-up question below as a standalone question that can be understood without the conversation. Keep it short, keep names, courses and dates, and do not answer it.
+
+Follow-up question: {question}
+
+Respond ONLY with the standalone question.
+"""
+
 # Query analyzer prompt template
 QUERY_ANALYZER_TEMPLATE = """
 Analyze this complex question and break it down into 2-3 sub-questions that will help answer the main question comprehensively:
@@ -0,0 +1,117 @@
+"""
+Conversation memory module with bounded per-session history for follow-up questions.
+Each session keeps its last few turns verbatim and folds older turns into a compact
+rolling summary held within a token budget; idle sessions are evicted by LRU and TTL.
+"""
+
+import re
+import sys
+import threading
+from collections import deque
+from typing import Dict, Any, Optional
+import config
+from cache import LRUCache
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of English text (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+def strip_sources(answer: str) -> str:
+    """Drop the Sources section the synthesis prompt appends to every answer."""
+    return answer.split("Sources:", 1)[0].strip()
+
+
+def compress_turn(question: str, answer: str, max_chars: int) -> str:
+    """Reduce a turn to a one-line summary: the question and the first sentence of the answer."""
+    first_sentence = _SENTENCE_END.split(strip_sources(answer), 1)[0]
+    line = f"- Asked: {question.strip()} Answered: {first_sentence}"
+    return line if len(line) <= max_chars else line[:max_chars - 3] + "..."
+
+
+class ConversationSession:
+    """Recent turns of one session plus the summary lines of older turns."""
+
+    __slots__ = ("turns", "summary")
+
+    def __init__(self):
+        self.turns = deque()
+        self.summary = deque()
+
+    def turn_tokens(self) -> int:
+        """Estimated tokens of the verbatim turns."""
+        return sum(estimate_tokens(question) + estimate_tokens(answer) for question, answer in self.turns)
+
+    def summary_tokens(self) -> int:
+        """Estimated tokens of the summary lines."""
+        return sum(estimate_tokens(line) for line in self.summary)
+
+    def size_bytes(self) -> int:
+        """Approximate memory held by the session's strings."""
+        return sum(sys.getsizeof(question) + sys.getsizeof(answer) for question, answer in self.turns) + \
+            sum(sys.getsizeof(line) for line in self.summary)
+
+
+class ConversationMemory:
+    """Per-session conversation history with bounded turns, tokens and sessions."""
+
+    def __init__(self, conversation_config: Dict[str, Any] = config.CONVERSATION_CONFIG):
+        """Create an empty memory sized by the conversation configuration."""
+        self.max_turns = conversation_config["max_turns"]
+        self.history_token_budget = conversation_config["history_token_budget"]
+        self.summary_token_budget = conversation_config["summary_token_budget"]
+        self.answer_chars = conversation_config["answer_chars"]
+        self.summary_line_chars = conversation_config["summary_line_chars"]
+        self.sessions = LRUCache(conversation_config["max_sessions"], conversation_config["session_ttl"])
+        self._lock = threading.Lock()
+
+    def get_history(self, session_id: Optional[str]) -> str:
+        """Return the session's history as prompt text, or an empty string for a new session."""
+        session = self.sessions.get(session_id) if session_id else None
+        if session is None:
+            return ""
+
+        with self._lock:
+            parts = []
+            if session.summary:
+                parts.append("Earlier in the conversation:\n" + "\n".join(session.summary))
+            if session.turns:
+                parts.append("\n".join(f"User: {question}\nAssistant: {answer}" for question, answer in session.turns))
+            return "\n\n".join(parts)
+
+    def add_turn(self, session_id: str, question: str, answer: str) -> None:
+        """Record a turn, compressing the oldest turns into the summary to stay within budget."""
+        answer = strip_sources(answer)
+        if len(answer) > self.answer_chars:
+            answer = answer[:self.answer_chars - 3] + "..."
+
+        with self._lock:
+            session = self.sessions.get(session_id) or ConversationSession()
+            session.turns.append((question, answer))
+
+            while len(session.turns) > 1 and (
+                len(session.turns) > self.max_turns or session.turn_tokens() > self.history_token_budget
+            ):
+                old_question, old_answer = session.turns.popleft()
+                session.summary.append(compress_turn(old_question, old_answer, self.summary_line_chars))
+
+            while session.summary and session.summary_tokens() > self.summary_token_budget:
+                session.summary.popleft()
+
+            # Re-inserting marks the session as recently used and restarts its idle TTL
+            self.sessions.set(session_id, session)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return session counts, history size and cache counters."""
+        sessions = [session for _, session in self.sessions.items()]
+        with self._lock:
+            return {
+                **self.sessions.stats(),
+                "turns": sum(len(session.turns) for session in sessions),
+                "summary_lines": sum(len(session.summary) for session in sessions),
+                "history_tokens": sum(session.turn_tokens() + session.summary_tokens() for session in sessions),
+                "memory_bytes": sum(session.size_bytes() for session in sessions)
+            }
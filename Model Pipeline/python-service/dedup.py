@@ -0,0 +1,57 @@
+"""
+Near-duplicate detection module for retrieved chunks.
+Chunks are fingerprinted with a 64-bit SimHash over word shingles, and any chunk
+whose fingerprint is within the configured similarity of a better-ranked chunk is dropped.
+"""
+
+import hashlib
+import re
+from typing import List, Any, Tuple
+import numpy as np
+import config
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def simhash(text: str, shingle_size: int = config.DEDUP_CONFIG["shingle_size"]) -> int:
+    """Compute the 64-bit SimHash fingerprint of a text from its word shingles."""
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) < shingle_size:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+
+    digests = b"".join(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest() for shingle in shingles)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(len(shingles), 8), axis=1)
+    # A fingerprint bit is set when most shingle hashes set it
+    majority = bits.sum(axis=0) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(majority).tobytes(), "big")
+
+
+def similarity(a: int, b: int) -> float:
+    """Fraction of matching bits between two fingerprints."""
+    return 1.0 - bin(a ^ b).count("1") / 64.0
+
+
+def remove_near_duplicates(
+    docs: List[Any],
+    threshold: float = config.DEDUP_CONFIG["threshold"]
+) -> Tuple[List[Any], int]:
+    """
+    Drop documents that are near-duplicates of an earlier document in the list.
+
+    Args:
+        docs: Documents in rank order; the first of each near-duplicate group is kept
+        threshold: Minimum fingerprint similarity (0-1) for two chunks to count as duplicates
+
+    Returns:
+        The kept documents and the number of documents removed
+    """
+    kept, fingerprints = [], []
+    for doc in docs:
+        fingerprint = simhash(doc.page_content)
+        if any(similarity(fingerprint, other) >= threshold for other in fingerprints):
+            continue
+        kept.append(doc)
+        fingerprints.append(fingerprint)
+    return kept, len(docs) - len(kept)
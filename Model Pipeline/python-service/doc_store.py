@@ -0,0 +1,123 @@
+"""
+Document store module for serving chunk text and metadata locally.
+The embedding DAG writes every chunk it upserts into Pinecone to a SQLite file,
+keyed by the same `{filename_stem}_{i}` ids, so Pinecone can return ids and scores only.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+from langchain_core.documents import Document
+from chunk_record import ChunkRecord
+import config
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# SQLite limits the number of bound parameters per statement
+_MAX_IDS_PER_QUERY = 500
+
+
+def document_key(doc: Any) -> Any:
+    """Identify a document by its vector id, falling back to a digest of its content (stable across processes)."""
+    return getattr(doc, "id", None) or hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+
+
+class DocumentStore:
+    """Read-only, memory-mapped SQLite store of chunk text keyed by vector id."""
+
+    def __init__(self, path: str, mmap_size: int = config.DOC_STORE_CONFIG["mmap_size"]):
+        """Open the document store at the given path."""
+        self.path = str(path)
+        self.mmap_size = mmap_size
+        self._uri = Path(self.path).resolve().as_uri() + "?mode=ro"
+        self._local = threading.local()
+        self.build_id = self._read_meta("build_id") or "unknown"
+        logger.info(f"Loaded document store {self.path} (build {self.build_id}, {len(self)} chunks)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            conn.execute("PRAGMA query_only=ON")
+            self._local.conn = conn
+        return conn
+
+    def _read_meta(self, key: str) -> Optional[str]:
+        """Read a value from the build metadata table."""
+        row = self._connection().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def namespaces(self) -> List[str]:
+        """List the namespaces present in the store."""
+        return [row[0] for row in self._connection().execute("SELECT DISTINCT namespace FROM chunks")]
+
+    def iter_texts(self, namespace: str = "") -> Iterator[Tuple[str, str]]:
+        """Yield (id, text) for every chunk of a namespace, used to build derived indexes."""
+        rows = self._connection().execute("SELECT id, text FROM chunks WHERE namespace = ? ORDER BY id", (namespace,))
+        for chunk_id, text in rows:
+            yield chunk_id, zlib.decompress(text).decode("utf-8")
+
+    def iter_metadata(self, namespace: str = "") -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield (id, metadata) for every chunk of a namespace in the same order as iter_texts."""
+        rows = self._connection().execute("SELECT id, metadata FROM chunks WHERE namespace = ? ORDER BY id", (namespace,))
+        for chunk_id, metadata in rows:
+            yield chunk_id, json.loads(metadata)
+
+    def get_records(self, ids: List[str], namespace: str = "") -> Dict[str, Dict[str, Any]]:
+        """Fetch the text and metadata of the given chunk ids as plain dicts."""
+        records = {}
+        conn = self._connection()
+        for start in range(0, len(ids), _MAX_IDS_PER_QUERY):
+            batch = ids[start:start + _MAX_IDS_PER_QUERY]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT id, text, metadata FROM chunks WHERE namespace = ? AND id IN ({placeholders})",
+                [namespace, *batch]
+            )
+            for chunk_id, text, metadata in rows:
+                records[chunk_id] = {
+                    "text": zlib.decompress(text).decode("utf-8"),
+                    "metadata": json.loads(metadata)
+                }
+        return records
+
+    def get_chunks(self, ids: List[str], namespace: str = "") -> List[ChunkRecord]:
+        """Fetch chunk records for the given chunk ids, preserving the order of the ids."""
+        records = self.get_records(ids, namespace)
+
+        missing = [chunk_id for chunk_id in ids if chunk_id not in records]
+        if missing:
+            logger.warning(f"{len(missing)} chunk ids not found in document store (build {self.build_id})")
+
+        return [
+            ChunkRecord(chunk_id, records[chunk_id]["text"], records[chunk_id]["metadata"])
+            for chunk_id in ids
+            if chunk_id in records
+        ]
+
+    def get_documents(self, ids: List[str], namespace: str = "") -> List[Document]:
+        """Fetch LangChain documents for the given chunk ids, preserving the order of the ids."""
+        return [chunk.to_document() for chunk in self.get_chunks(ids, namespace)]
+
+
+def load_document_store(path: str = config.DOC_STORE_PATH) -> Optional[DocumentStore]:
+    """Open the document store if the file exists, otherwise return None."""
+    if not Path(path).exists():
+        logger.info(f"No document store found at {path}")
+        return None
+    try:
+        return DocumentStore(path)
+    except sqlite3.Error as e:
+        logger.warning(f"Could not open document store at {path}: {str(e)}")
+        return None
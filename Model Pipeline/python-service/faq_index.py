@@ -0,0 +1,197 @@
+"""
+FAQ answer index module for precomputed answers to frequent questions.
+An offline job answers a curated question list (plus the most frequent logged questions)
+with the full RAG pipeline and writes the answers, with their question embeddings, to a
+compact .npz file. The service serves a stored answer when an asked question is close
+enough to a FAQ question; indexes built for another document store build are ignored.
+"""
+
+import json
+import logging
+import os
+import time
+import zlib
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+import config
+from cache import normalize_query, template_version
+from local_index import normalize_rows
+from query_log import top_queries
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Report metrics kept with a FAQ answer
+_ENTRY_METRICS = ("sources_found", "documents_retrieved", "query_type", "search_mode", "llm_used")
+
+
+class FaqIndex:
+    """Precomputed answers searched by cosine similarity of question embeddings."""
+
+    def __init__(self, vectors: np.ndarray, entries: List[Dict[str, Any]], build_id: str, prompt_version: str):
+        """
+        Create an index from question vectors and the matching answer entries.
+
+        Args:
+            vectors: One question embedding per entry (normalized on load)
+            entries: Dicts with question, namespace, search_mode, answer, doc_ids and metrics
+            build_id: Document store build the answers were computed from
+            prompt_version: Version of the synthesis prompt that produced the answers
+        """
+        self.vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        self.entries = entries
+        self.build_id = build_id
+        self.prompt_version = prompt_version
+        self.rows = {}
+        for row, entry in enumerate(entries):
+            self.rows.setdefault((entry["namespace"], entry["search_mode"]), []).append(row)
+        self.rows = {key: np.asarray(rows, dtype=np.int64) for key, rows in self.rows.items()}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def save(self, path: str) -> None:
+        """Serialize to .npz: float16 vectors and the zlib-compressed JSON entries."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        entries = zlib.compress(json.dumps(self.entries, separators=(",", ":")).encode("utf-8"))
+        np.savez(
+            tmp_path,
+            vectors=self.vectors.astype(np.float16),
+            entries=np.frombuffer(entries, dtype=np.uint8),
+            build_id=np.array(self.build_id),
+            prompt_version=np.array(self.prompt_version)
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "FaqIndex":
+        """Load an index serialized with save()."""
+        with np.load(path, allow_pickle=False) as data:
+            entries = json.loads(zlib.decompress(data["entries"].tobytes()).decode("utf-8"))
+            return cls(data["vectors"], entries, str(data["build_id"]), str(data["prompt_version"]))
+
+    def lookup(
+        self,
+        query_vector: List[float],
+        namespace: str,
+        search_mode: str,
+        min_similarity: float = config.FAQ_CONFIG["min_similarity"]
+    ) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Return the closest FAQ entry of a namespace and mode with its similarity, or None if none is close enough."""
+        rows = self.rows.get((namespace, search_mode))
+        if rows is None:
+            return None
+        scores = self.vectors[rows] @ normalize_rows(np.asarray(query_vector, dtype=np.float32))
+        best = int(np.argmax(scores))
+        if scores[best] < min_similarity:
+            return None
+        return self.entries[rows[best]], float(scores[best])
+
+
+def load_faq_index(path: str = config.FAQ_CONFIG["path"], build_id: Optional[str] = None) -> Optional[FaqIndex]:
+    """Load the FAQ index, or return None if it is missing, unreadable or stale for this build and prompt."""
+    if not config.FAQ_CONFIG.get("enabled", True) or not os.path.exists(path):
+        return None
+    try:
+        index = FaqIndex.load(path)
+    except (OSError, ValueError, KeyError, zlib.error) as e:
+        logger.warning(f"Could not load FAQ index at {path}: {str(e)}")
+        return None
+    if build_id is not None and index.build_id != build_id:
+        logger.info(f"FAQ index {path} is stale (build {index.build_id}, serving {build_id}), ignoring it")
+        return None
+    if index.prompt_version != template_version(config.SYNTHESIS_PROMPT_TEMPLATE):
+        logger.info(f"FAQ index {path} was built with another synthesis prompt, ignoring it")
+        return None
+    logger.info(f"Loaded FAQ index with {len(index)} answers for build {index.build_id}")
+    return index
+
+
+def faq_questions(
+    path: Optional[str] = config.FAQ_CONFIG["questions_path"],
+    namespace: str = "default",
+    modes: Tuple[str, ...] = ("direct",),
+    mine_top_n: int = config.FAQ_CONFIG["mine_top_n"],
+    mine_hours: float = config.FAQ_CONFIG["mine_hours"],
+    mine_min_count: int = config.FAQ_CONFIG["mine_min_count"]
+) -> List[Dict[str, Any]]:
+    """
+    Collect the questions to precompute: the curated list plus the most frequent logged questions.
+
+    Args:
+        path: Curated questions, one per line (lines starting with '#' are comments); None skips it
+        namespace: Namespace the curated questions are answered in
+        modes: Search modes the curated questions are answered in
+        mine_top_n: Most frequent logged questions added (0 disables mining)
+        mine_hours: How far back the query log is read
+        mine_min_count: Times a logged question must have been asked
+
+    Returns:
+        Batch items (query, namespace, search_mode), one per distinct normalized question
+    """
+    items = []
+    if path and os.path.exists(path):
+        with open(path, "r") as f:
+            questions = [line.strip() for line in f if not line.lstrip().startswith("#")]
+        items.extend({"query": question, "namespace": namespace, "search_mode": mode} for question in questions if question for mode in modes)
+    elif path:
+        logger.warning(f"No curated FAQ questions found at {path}")
+
+    if mine_top_n:
+        since = time.time() - mine_hours * 3600
+        for query in top_queries(config.QUERY_LOG_CONFIG["path"], mine_top_n, since):
+            if query["count"] < mine_min_count:
+                break
+            # Progressive requests are answered in both modes
+            query_modes = ["direct", "deepsearch"] if query["search_mode"] == "progressive" else [query["search_mode"]]
+            items.extend({"query": query["query"], "namespace": query["namespace"], "search_mode": mode} for mode in query_modes)
+
+    distinct = {}
+    for item in items:
+        distinct.setdefault((normalize_query(item["query"]), item["namespace"], item["search_mode"]), item)
+    return list(distinct.values())
+
+
+def build_faq_index(agent: Any, items: List[Dict[str, Any]], batch_size: int = config.BATCH_CONFIG["max_items"]) -> FaqIndex:
+    """
+    Answer FAQ questions with the full pipeline of a RAGAgent and index the answers.
+
+    Questions that fail, find no documents or whose synthesis fails are left out.
+
+    Args:
+        agent: RAGAgent answering from the document store build the index is for
+        items: Batch items (query, namespace, search_mode)
+        batch_size: Questions answered per answer_batch call
+    """
+    # Answer from the pipeline rather than from the index being replaced
+    agent.faq_index = None
+    vectors, entries = [], []
+    for i in range(0, len(items), batch_size):
+        batch = items[i:i + batch_size]
+        for item, report in zip(batch, agent.answer_batch(batch)):
+            metrics = report.get("metrics", {})
+            if report.get("error") or not report.get("doc_ids") or "synthesis_error" in metrics:
+                logger.warning(f"Leaving unanswered FAQ question out of the index: {item['query']}")
+                continue
+            vectors.append(agent.embed_query(item["query"]))
+            entries.append({
+                "question": item["query"],
+                "namespace": item["namespace"],
+                "search_mode": item["search_mode"],
+                "answer": report["answer"],
+                "sub_questions": report.get("sub_questions", []),
+                "doc_ids": report["doc_ids"],
+                "answer_namespace": report.get("namespace", item["namespace"]),
+                "metrics": {key: metrics[key] for key in _ENTRY_METRICS if key in metrics}
+            })
+        logger.info(f"Answered {min(i + batch_size, len(items))}/{len(items)} FAQ questions")
+    if not entries:
+        raise ValueError("No FAQ question could be answered")
+
+    return FaqIndex(
+        np.asarray(vectors, dtype=np.float32),
+        entries,
+        agent.index_version,
+        template_version(config.SYNTHESIS_PROMPT_TEMPLATE)
+    )
@@ -0,0 +1,431 @@
+"""
+Feedback store module that keeps answer ratings durably and shared across workers.
+Requests only queue records in a bounded in-memory buffer; a background flusher writes
+them in batches to the configured backend (a SQLite file, or an append-only JSONL file
+for local use). Every answer's context (question, namespace, mode) is recorded under
+its query_id so ratings can be aggregated by namespace and time window.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional
+import config
+from cache import LRUCache, normalize_query
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class FeedbackStore(ABC):
+    """
+    Base class of the feedback backends: buffering, the background flusher and aggregation.
+
+    Backends implement _write(kind, records) for 'answer' and 'feedback' records,
+    _rows(since, until) yielding the rated (namespace, rating, timestamp) rows and
+    _stored_answer(query_id). Readers on the request path never flush: records still buffered (at most
+    flush_interval old) are missing from aggregates, and answer contexts of recent
+    requests are served from memory.
+    """
+
+    def __init__(self, queue_size: int = 5000, batch_size: int = 500, flush_interval: float = 1.0, recent_answers: int = 10000):
+        """
+        Start the background flusher.
+
+        Args:
+            queue_size: Records buffered in memory; further records are dropped (and counted) until the flusher catches up
+            batch_size: Most records written per transaction
+            flush_interval: Seconds between flushes
+            recent_answers: Answer contexts of the latest record_answer calls kept in memory
+                (at least queue_size, so buffered answers are always found)
+        """
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.recent = LRUCache(max(recent_answers, queue_size))
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self._retry = []
+        self._dropped_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._run, name="feedback-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def _put(self, kind: str, record: Dict[str, Any]) -> None:
+        try:
+            self.queue.put_nowait((kind, record))
+        except queue.Full:
+            # Bounded memory, and requests never write or fail because of a slow or failing backend
+            with self._dropped_lock:
+                self.dropped += 1
+                dropped = self.dropped
+            if dropped == 1 or dropped % 1000 == 0:
+                logger.warning(f"Feedback buffer full, dropped {dropped} records so far")
+
+    def record_answer(
+        self,
+        query_id: str,
+        query: str,
+        namespace: str,
+        search_mode: str,
+        answer_cache: Optional[str] = None,
+        index_version: Optional[str] = None
+    ) -> None:
+        """Remember the context of an answer so feedback on its query_id can be attributed."""
+        record = {
+            "query_id": query_id,
+            "query": query,
+            "normalized_query": normalize_query(query),
+            "namespace": namespace,
+            "search_mode": search_mode,
+            "answer_cache": answer_cache,
+            "index_version": index_version,
+            "timestamp": time.time()
+        }
+        self.recent.set(query_id, record)
+        self._put("answer", record)
+
+    def add_feedback(self, query_id: str, rating: str, feedback_text: str = "") -> None:
+        """Store a rating ('positive' or 'negative'); a later rating of the same answer replaces it."""
+        self._put("feedback", {
+            "query_id": query_id,
+            "rating": rating,
+            "feedback_text": feedback_text,
+            "timestamp": time.time()
+        })
+
+    def _run(self) -> None:
+        while True:
+            stopping = self._stop.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Feedback flush failed: {str(e)}")
+            if stopping:
+                return
+
+    def flush(self) -> None:
+        """Write all buffered records, in batches grouped by kind; records of a failed write are retried first next time."""
+        with self._write_lock:
+            while True:
+                batch, self._retry = self._retry, []
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return
+                kinds = ("answer", "feedback")
+                for i, kind in enumerate(kinds):
+                    records = [record for record_kind, record in batch if record_kind == kind]
+                    if not records:
+                        continue
+                    try:
+                        self._write(kind, records)
+                    except Exception:
+                        # Keep what was not written rather than losing it with the batch
+                        self._retry = [(record_kind, record) for record_kind, record in batch if record_kind in kinds[i:]]
+                        raise
+                    self.written += len(records)
+
+    def close(self) -> None:
+        """Stop the flusher after writing the buffered records."""
+        if not self._stop.is_set():
+            self._stop.set()
+            self._flusher.join(timeout=5)
+
+    @abstractmethod
+    def _write(self, kind: str, records: List[Dict[str, Any]]) -> None:
+        """Write a batch of 'answer' or 'feedback' records."""
+
+    @abstractmethod
+    def _rows(self, since: Optional[float], until: Optional[float]):
+        """Return the (namespace, rating, timestamp) rows of the feedback in a time range."""
+
+    @abstractmethod
+    def _rated(self, since: Optional[float], until: Optional[float]) -> List[Dict[str, Any]]:
+        """Return the rated answers in a time range: rating, timestamp and the answer context."""
+
+    @abstractmethod
+    def _stored_answer(self, query_id: str) -> Optional[Dict[str, Any]]:
+        """Return the written context of an answer, or None."""
+
+    def get_answer(self, query_id: str) -> Optional[Dict[str, Any]]:
+        """Return the recorded context of an answer, or None; recent answers are found without reading the backend."""
+        record = self.recent.get(query_id)
+        if record is not None:
+            return dict(record)
+        return self._stored_answer(query_id)
+
+    @abstractmethod
+    def get_feedback(self, query_id: str) -> Optional[Dict[str, Any]]:
+        """Return the latest feedback on an answer with the answer's context, or None."""
+
+    def rated_answers(self, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Return the rated answers since a timestamp, oldest first, with question, namespace, mode and index version."""
+        return sorted(self._rated(since, None), key=lambda record: record["timestamp"])
+
+    def cache_outcomes_by_rating(self, since: Optional[float] = None, until: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """Answer cache outcomes (hit/miss/bypass) of rated answers per rating, with the hit rate."""
+        buckets = {}
+        for record in self._rated(since, until):
+            counts = buckets.setdefault(record["rating"], {})
+            outcome = record.get("answer_cache") or "unknown"
+            counts[outcome] = counts.get(outcome, 0) + 1
+        for counts in buckets.values():
+            counts["hit_rate"] = counts.get("hit", 0) / sum(counts.values())
+        return buckets
+
+    def rating_aggregates(
+        self,
+        namespace: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        window: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Count ratings per namespace, optionally per time window.
+
+        Args:
+            namespace: Only this namespace (None for all)
+            since: Only feedback given at or after this timestamp
+            until: Only feedback given before this timestamp
+            window: Window length in seconds; None aggregates the whole range
+
+        Returns:
+            One dict per (namespace, window start) with positive, negative and total
+            counts and the positive rate
+        """
+        groups = {}
+        for row_namespace, rating, timestamp in self._rows(since, until):
+            row_namespace = row_namespace or "unknown"
+            if namespace is not None and row_namespace != namespace:
+                continue
+            start = int(timestamp // window * window) if window else None
+            counts = groups.setdefault((row_namespace, start), {"positive": 0, "negative": 0, "total": 0})
+            if rating in ("positive", "negative"):
+                counts[rating] += 1
+            counts["total"] += 1
+
+        return [
+            {
+                "namespace": group_namespace,
+                "window_start": start,
+                **counts,
+                "positive_rate": counts["positive"] / counts["total"]
+            }
+            for (group_namespace, start), counts in sorted(groups.items(), key=lambda item: (item[0][0], item[0][1] or 0))
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return buffer and write counters."""
+        return {
+            "backend": type(self).__name__,
+            "buffered": self.queue.qsize(),
+            "retrying": len(self._retry),
+            "dropped": self.dropped,
+            "written": self.written
+        }
+
+
+class SQLiteFeedbackStore(FeedbackStore):
+    """Feedback in a SQLite file (WAL mode), shared by the workers of one host."""
+
+    def __init__(self, path: str, answer_retention_days: Optional[float] = 90, **kwargs):
+        """
+        Open or create the database.
+
+        Args:
+            path: SQLite file path
+            answer_retention_days: Answer contexts older than this are deleted unless rated
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.answer_retention_days = answer_retention_days
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers (query_id TEXT PRIMARY KEY, query TEXT, normalized_query TEXT, "
+            "namespace TEXT, search_mode TEXT, answer_cache TEXT, index_version TEXT, timestamp REAL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(answers)")}
+        if "index_version" not in columns:
+            self._conn.execute("ALTER TABLE answers ADD COLUMN index_version TEXT")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS feedback (query_id TEXT PRIMARY KEY, rating TEXT, feedback_text TEXT, timestamp REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_timestamp ON answers (timestamp)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS feedback_timestamp ON feedback (timestamp)")
+        self._conn.commit()
+        self._last_prune = 0.0
+        super().__init__(**kwargs)
+
+    def _write(self, kind: str, records: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            if kind == "answer":
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO answers (query_id, query, normalized_query, namespace, search_mode, answer_cache, "
+                    "index_version, timestamp) VALUES (:query_id, :query, :normalized_query, :namespace, :search_mode, "
+                    ":answer_cache, :index_version, :timestamp)",
+                    records
+                )
+            else:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO feedback (query_id, rating, feedback_text, timestamp) "
+                    "VALUES (:query_id, :rating, :feedback_text, :timestamp)",
+                    records
+                )
+            self._conn.commit()
+            self._prune()
+
+    def _prune(self) -> None:
+        """Delete old unrated answer contexts, at most once an hour."""
+        now = time.time()
+        if self.answer_retention_days is None or now - self._last_prune < 3600:
+            return
+        self._last_prune = now
+        self._conn.execute(
+            "DELETE FROM answers WHERE timestamp < ? AND query_id NOT IN (SELECT query_id FROM feedback)",
+            (now - self.answer_retention_days * 86400,)
+        )
+        self._conn.commit()
+
+    def _rows(self, since: Optional[float], until: Optional[float]):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT a.namespace, f.rating, f.timestamp FROM feedback f LEFT JOIN answers a ON a.query_id = f.query_id "
+                "WHERE f.timestamp >= ? AND f.timestamp < ?",
+                (since if since is not None else 0, until if until is not None else float("inf"))
+            ).fetchall()
+
+    def _rated(self, since: Optional[float], until: Optional[float]) -> List[Dict[str, Any]]:
+        keys = ("query_id", "rating", "timestamp", "query", "namespace", "search_mode", "answer_cache", "index_version")
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT f.query_id, f.rating, f.timestamp, a.query, a.namespace, a.search_mode, a.answer_cache, a.index_version "
+                "FROM feedback f JOIN answers a ON a.query_id = f.query_id WHERE f.timestamp >= ? AND f.timestamp < ?",
+                (since if since is not None else 0, until if until is not None else float("inf"))
+            ).fetchall()
+        return [dict(zip(keys, row)) for row in rows]
+
+    def _stored_answer(self, query_id: str) -> Optional[Dict[str, Any]]:
+        keys = ("query", "namespace", "search_mode", "answer_cache", "index_version", "timestamp")
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT query, namespace, search_mode, answer_cache, index_version, timestamp FROM answers WHERE query_id = ?",
+                (query_id,)
+            ).fetchone()
+        return {"query_id": query_id, **dict(zip(keys, row))} if row is not None else None
+
+    def get_feedback(self, query_id: str) -> Optional[Dict[str, Any]]:
+        self.flush()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT f.rating, f.feedback_text, f.timestamp, a.query, a.namespace, a.search_mode "
+                "FROM feedback f LEFT JOIN answers a ON a.query_id = f.query_id WHERE f.query_id = ?",
+                (query_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("rating", "feedback_text", "timestamp", "query", "namespace", "search_mode")
+        return {"query_id": query_id, **dict(zip(keys, row))}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            answers = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            ratings = self._conn.execute("SELECT COUNT(*) FROM feedback").fetchone()[0]
+        return {**super().stats(), "answers": answers, "ratings": ratings}
+
+
+class JsonlFeedbackStore(FeedbackStore):
+    """Feedback appended to a JSONL file, for local use; queries scan the file."""
+
+    def __init__(self, path: str, **kwargs):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        super().__init__(**kwargs)
+
+    def _write(self, kind: str, records: List[Dict[str, Any]]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps({"kind": kind, **record}, separators=(",", ":")) + "\n" for record in records))
+
+    def _scan(self):
+        """Return the answer contexts and the latest feedback per query_id."""
+        answers, feedback = {}, {}
+        if not os.path.exists(self.path):
+            return answers, feedback
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                (answers if record.pop("kind") == "answer" else feedback)[record["query_id"]] = record
+        return answers, feedback
+
+    def _rows(self, since: Optional[float], until: Optional[float]):
+        answers, feedback = self._scan()
+        return [
+            (answers.get(query_id, {}).get("namespace"), record["rating"], record["timestamp"])
+            for query_id, record in feedback.items()
+            if (since is None or record["timestamp"] >= since) and (until is None or record["timestamp"] < until)
+        ]
+
+    def _rated(self, since: Optional[float], until: Optional[float]) -> List[Dict[str, Any]]:
+        answers, feedback = self._scan()
+        return [
+            {**answers[query_id], **record}
+            for query_id, record in feedback.items()
+            if query_id in answers
+            and (since is None or record["timestamp"] >= since) and (until is None or record["timestamp"] < until)
+        ]
+
+    def _stored_answer(self, query_id: str) -> Optional[Dict[str, Any]]:
+        answers, _ = self._scan()
+        return answers.get(query_id)
+
+    def get_feedback(self, query_id: str) -> Optional[Dict[str, Any]]:
+        self.flush()
+        answers, feedback = self._scan()
+        if query_id not in feedback:
+            return None
+        answer = answers.get(query_id, {})
+        return {
+            **feedback[query_id],
+            "query": answer.get("query"),
+            "namespace": answer.get("namespace"),
+            "search_mode": answer.get("search_mode")
+        }
+
+
+# Feedback backends by FEEDBACK_CONFIG["backend"] name
+FEEDBACK_BACKENDS = {
+    "sqlite": SQLiteFeedbackStore,
+    "jsonl": JsonlFeedbackStore
+}
+
+
+def load_feedback_store(feedback_config: Dict[str, Any] = config.FEEDBACK_CONFIG) -> FeedbackStore:
+    """Create the configured feedback backend."""
+    backend = feedback_config.get("backend", "sqlite")
+    options = {
+        "queue_size": feedback_config["queue_size"],
+        "batch_size": feedback_config["batch_size"],
+        "flush_interval": feedback_config["flush_interval"],
+        "recent_answers": feedback_config.get("recent_answers", 10000)
+    }
+    if backend == "sqlite":
+        options["answer_retention_days"] = feedback_config.get("answer_retention_days")
+    store = FEEDBACK_BACKENDS[backend](feedback_config["paths"][backend], **options)
+    logger.info(f"Feedback store: {backend} at {feedback_config['paths'][backend]}")
+    return store
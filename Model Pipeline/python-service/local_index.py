@@ -0,0 +1,292 @@
+"""
+Local vector index module providing an in-process replica of the Pinecone index.
+Each namespace is a memory-mapped NumPy matrix of normalized vectors written by the
+embedding DAG, searched exactly (brute force) or approximately (IVF) with metadata filters.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from chunk_record import ChunkRecord
+import config
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Directory name used for Pinecone's unnamed namespace in a snapshot
+DEFAULT_NAMESPACE_DIR = "__default__"
+
+# Pinecone-style metadata filter operators
+_FILTER_OPERATORS = {
+    "$eq": lambda column, value: column == value,
+    "$ne": lambda column, value: column != value,
+    "$gt": lambda column, value: column > value,
+    "$gte": lambda column, value: column >= value,
+    "$lt": lambda column, value: column < value,
+    "$lte": lambda column, value: column <= value,
+    "$in": lambda column, value: np.isin(column, list(value)),
+    "$nin": lambda column, value: ~np.isin(column, list(value)),
+}
+
+
+def namespace_dir(namespace: Optional[str]) -> str:
+    """Return the snapshot directory name for a Pinecone namespace."""
+    return namespace or DEFAULT_NAMESPACE_DIR
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize the rows of a matrix so dot products are cosine similarities."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the indices of the k largest scores, best first."""
+    if k >= len(scores):
+        return np.argsort(-scores)
+    candidates = np.argpartition(-scores, k)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+def write_snapshot(path: str, ids: List[str], vectors: np.ndarray, metadatas: List[Dict[str, Any]]) -> None:
+    """Write one namespace of a vector snapshot in the layout the embedding DAG produces."""
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "vectors.npy"), normalize_rows(vectors))
+    with open(os.path.join(path, "rows.json"), "w") as f:
+        json.dump({"ids": list(ids), "metadata": metadatas}, f, separators=(",", ":"))
+
+
+def build_columns(metadatas: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Convert row metadata into one array per key for vectorized filtering."""
+    keys = set()
+    for metadata in metadatas:
+        keys.update(metadata)
+
+    columns = {}
+    for key in keys:
+        values = [metadata.get(key) for metadata in metadatas]
+        present = [value for value in values if value is not None]
+        if present and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+            columns[key] = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        else:
+            columns[key] = np.array(values, dtype=object)
+    return columns
+
+
+def filter_mask(columns: Dict[str, np.ndarray], filter: Dict[str, Any], n_rows: int) -> np.ndarray:
+    """Evaluate a Pinecone-style metadata filter over metadata columns into a boolean row mask."""
+    mask = np.ones(n_rows, dtype=bool)
+    for key, condition in filter.items():
+        if key == "$and":
+            for sub_filter in condition:
+                mask &= filter_mask(columns, sub_filter, n_rows)
+            continue
+        if key == "$or":
+            any_mask = np.zeros(n_rows, dtype=bool)
+            for sub_filter in condition:
+                any_mask |= filter_mask(columns, sub_filter, n_rows)
+            mask &= any_mask
+            continue
+
+        column = columns.get(key)
+        if column is None:
+            return np.zeros(n_rows, dtype=bool)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, value in condition.items():
+            if operator not in _FILTER_OPERATORS:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+            mask &= np.asarray(_FILTER_OPERATORS[operator](column, value), dtype=bool)
+    return mask
+
+
+class NamespaceIndex:
+    """Vector matrix, ids and columnar metadata of a single namespace."""
+
+    def __init__(self, path: str, nlist: int = 0, kmeans_iterations: int = 10):
+        """Load a namespace snapshot, memory-mapping the vector matrix."""
+        self.path = path
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        with open(os.path.join(path, "rows.json"), "r") as f:
+            rows = json.load(f)
+        self.ids = rows["ids"]
+        self.columns = build_columns(rows["metadata"])
+        self.metadata = rows["metadata"]
+
+        # IVF coarse quantizer for approximate search
+        self.centroids = None
+        self.cell_rows = []
+        if nlist and len(self.ids) > nlist:
+            self._build_ivf(nlist, kmeans_iterations)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _build_ivf(self, nlist: int, iterations: int) -> None:
+        """Cluster the vectors with spherical k-means and index rows by cell."""
+        vectors = np.asarray(self.vectors)
+        rng = np.random.default_rng(0)
+        centroids = vectors[rng.choice(len(vectors), size=nlist, replace=False)]
+
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, vectors)
+            empty = np.bincount(assignments, minlength=nlist) == 0
+            sums[empty] = centroids[empty]
+            centroids = normalize_rows(sums)
+
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        self.centroids = centroids
+        self.cell_rows = [np.flatnonzero(assignments == cell) for cell in range(nlist)]
+
+    def filter_mask(self, filter: Dict[str, Any]) -> np.ndarray:
+        """Evaluate a Pinecone-style metadata filter into a boolean row mask."""
+        return filter_mask(self.columns, filter, len(self.ids))
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        filter: Optional[Dict[str, Any]] = None,
+        exact: bool = True,
+        nprobe: int = 8
+    ) -> List[Tuple[int, float]]:
+        """Return (row, cosine score) pairs of the top-k rows for a normalized query vector."""
+        if exact or self.centroids is None:
+            candidates = None
+        else:
+            cells = top_k_indices(self.centroids @ query_vector, nprobe)
+            candidates = np.concatenate([self.cell_rows[cell] for cell in cells])
+
+        if filter:
+            mask = self.filter_mask(filter)
+            candidates = np.flatnonzero(mask) if candidates is None else candidates[mask[candidates]]
+
+        if candidates is None:
+            scores = self.vectors @ query_vector
+            rows = top_k_indices(scores, k)
+            return [(int(row), float(scores[row])) for row in rows]
+
+        if not len(candidates):
+            return []
+        scores = self.vectors[candidates] @ query_vector
+        order = top_k_indices(scores, k)
+        return [(int(candidates[i]), float(scores[i])) for i in order]
+
+
+class LocalVectorStore:
+    """In-process vector store with the similarity search interface of PineconeVectorStore, returning ChunkRecords."""
+
+    def __init__(self, path: str, embedding: Any, doc_store: Any, index_config: Dict[str, Any] = config.LOCAL_INDEX_CONFIG):
+        """Load every namespace found under the snapshot directory."""
+        self.path = path
+        self.embedding = embedding
+        self.doc_store = doc_store
+        self.index_config = index_config
+        self.namespaces = {}
+
+        nlist = 0 if index_config.get("exact", True) else index_config.get("nlist", 64)
+        for entry in sorted(Path(path).iterdir()):
+            if (entry / "vectors.npy").exists():
+                self.namespaces[entry.name] = NamespaceIndex(str(entry), nlist=nlist)
+                logger.info(f"Loaded local index namespace '{entry.name}' with {len(self.namespaces[entry.name])} vectors")
+
+    def has_namespace(self, namespace: Optional[str]) -> bool:
+        """Check whether the snapshot contains the given Pinecone namespace."""
+        return namespace_dir(namespace) in self.namespaces
+
+    def _search_rows(
+        self,
+        embedding: List[float],
+        k: int,
+        filter: Optional[Dict[str, Any]],
+        namespace: Optional[str]
+    ) -> Tuple[Optional[NamespaceIndex], List[Tuple[ChunkRecord, float, int]]]:
+        """Search a namespace by vector and return (chunk, score, row) triples."""
+        index = self.namespaces.get(namespace_dir(namespace))
+        if index is None:
+            return None, []
+
+        query_vector = normalize_rows(np.asarray(embedding, dtype=np.float32))
+        hits = index.search(
+            query_vector,
+            k,
+            filter=filter,
+            exact=self.index_config.get("exact", True),
+            nprobe=self.index_config.get("nprobe", 8)
+        )
+
+        ids = [index.ids[row] for row, _ in hits]
+        docs = {doc.id: doc for doc in self.doc_store.get_chunks(ids, namespace=namespace or "")}
+        results = []
+        for chunk_id, (row, score) in zip(ids, hits):
+            if chunk_id in docs:
+                docs[chunk_id].score = score
+                results.append((docs[chunk_id], score, row))
+        return index, results
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        namespace: Optional[str] = None
+    ) -> List[Tuple[ChunkRecord, float]]:
+        """Search a namespace by vector and return documents with cosine scores."""
+        _, results = self._search_rows(embedding, k, filter, namespace)
+        return [(doc, score) for doc, score, _ in results]
+
+    def similarity_search_with_vectors(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        namespace: Optional[str] = None
+    ) -> Tuple[List[ChunkRecord], np.ndarray]:
+        """Search a namespace by vector and return the documents with their stored vectors."""
+        index, results = self._search_rows(embedding, k, filter, namespace)
+        if not results:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        rows = [row for _, _, row in results]
+        return [doc for doc, _, _ in results], np.asarray(index.vectors[rows])
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        namespace: Optional[str] = None
+    ) -> List[Tuple[ChunkRecord, float]]:
+        """Embed the query and search a namespace, returning documents with scores."""
+        return self.similarity_search_by_vector_with_score(
+            self.embedding.embed_query(query), k=k, filter=filter, namespace=namespace
+        )
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        namespace: Optional[str] = None
+    ) -> List[ChunkRecord]:
+        """Embed the query and return the top-k chunks of a namespace."""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter, namespace=namespace)]
+
+
+def load_local_vector_store(embedding: Any, doc_store: Any, path: str = config.LOCAL_INDEX_PATH) -> Optional[LocalVectorStore]:
+    """Load the local vector snapshot if it and the document store are available."""
+    if doc_store is None or not Path(path).is_dir():
+        logger.info(f"No local vector index available at {path}")
+        return None
+    try:
+        store = LocalVectorStore(path, embedding, doc_store)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Could not load local vector index at {path}: {str(e)}")
+        return None
+    return store if store.namespaces else None
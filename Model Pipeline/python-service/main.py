@@ -4,42 +4,18 @@ This module provides a simple interface for asking questions and getting answers
 """
 
 import logging
+import os
+import threading
 import time
 import argparse
 import json
-from typing import Dict, Any, Optional
-from rag_agent import RAGAgent
-import config
-
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
-logger = logging.getLogger(__name__)
-
-# Create a singleton RAG agent
-_rag_agent = None
-
-def get_rag_agent() -> RAGAgent:
-    """Get the singleton RAG agent instance."""
-    global _rag_agent
-    if _rag_agent is None:
-        _rag_agent = RAGAgent()
-    return _rag_agent
-
-"""
-Main interface module for the RAG system.
-This module provides a simple interface for asking questions and getting answers.
-"""
-
-import logging
-import time
-import argparse
-import json
-from typing import Dict, Any, Optional
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+import numpy as np
 from rag_agent import RAGAgent
+from query_log import top_queries
+from faq_index import faq_questions, build_faq_index
 import config
 
 # Set up logging
@@ -64,16 +40,18 @@ def ask_question(
     question: str, 
     namespace: str = "default", 
     search_mode: str = "direct",
-    verbose: bool = False
+    verbose: bool = False,
+    session_id: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Ask a question and get an answer from the RAG system.
     
     Args:
         question: The question to ask
-        namespace: The namespace to use for this query (for memory/context)
+        namespace: The namespace to use for this query
         search_mode: The search mode to use ('direct' or 'deepsearch')
         verbose: Whether to print detailed information
+        session_id: Conversation session for follow-up questions (None for a one-off question)
     
     Returns:
         A dictionary containing the answer and metadata
@@ -81,7 +59,7 @@ def ask_question(
     agent = get_rag_agent()
     start_time = time.time()
     
-    result = agent.answer_question(question, namespace, search_mode)
+    result = agent.answer_question(question, namespace, search_mode, session_id)
     
     if verbose:
         print("\n" + "=" * 80)
@@ -103,6 +81,38 @@ def ask_question(
     
     return result
 
+def ask_question_progressive(
+    question: str,
+    namespace: str = "default",
+    session_id: Optional[str] = None
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Ask a question in progressive mode: a fast direct answer, then the deepsearch answer.
+    
+    Args:
+        question: The question to ask
+        namespace: The namespace to use for this query
+        session_id: Conversation session for follow-up questions (None for a one-off question)
+    
+    Yields:
+        ('direct', result) as soon as the direct answer is ready, then ('deepsearch', result)
+    """
+    agent = get_rag_agent()
+    yield from agent.answer_progressively(question, namespace, session_id)
+
+def ask_question_batch(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Ask many questions at once, sharing embedding and setup work.
+    
+    Args:
+        items: Dicts with 'query' and optional 'namespace' and 'search_mode'
+    
+    Returns:
+        One result per item in input order; failed items carry an 'error' key
+    """
+    agent = get_rag_agent()
+    return agent.answer_batch(items)
+
 def clean_answer(result: Dict[str, Any]) -> Dict[str, Any]:
     """
     Process the raw result from ask_question into a cleaner format.
@@ -149,6 +159,7 @@ def clean_answer(result: Dict[str, Any]) -> Dict[str, Any]:
     # Add document counts
     logs.append(f"DOCUMENTS RETRIEVED: {result.get('metrics', {}).get('documents_retrieved', 0)}")
     logs.append(f"SOURCES FOUND: {result.get('metrics', {}).get('sources_found', 0)}")
+    logs.append(f"NEAR-DUPLICATES REMOVED: {result.get('metrics', {}).get('near_duplicates_removed', 0)}")
     
     # Combine logs
     logs_text = "\n".join(logs)
@@ -161,179 +172,199 @@ def clean_answer(result: Dict[str, Any]) -> Dict[str, Any]:
         "raw_result": result  # Include the original result for reference if needed
     }
 
+class RateLimiter:
+    """Spaces out calls so that at most `rate` start per second across threads."""
+    
+    def __init__(self, rate: Optional[float]):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_time = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def wait(self) -> None:
+        """Block until the caller may start its next call."""
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time)
+            self.next_time = start + self.interval
+        time.sleep(max(start - now, 0.0))
+
+def load_answered(output_file: str) -> set:
+    """Return the questions that already have an answer without error or synthesis failure in a JSONL results file."""
+    answered = set()
+    if not os.path.exists(output_file):
+        return answered
+    with open(output_file, 'r') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A line cut short by a crash
+            # A failed synthesis leaves a placeholder answer, so the question is run again
+            if "error" not in result and "synthesis_error" not in result.get("metrics", {}):
+                answered.add(result.get("question"))
+    return answered
+
 def process_batch(
     input_file: str, 
     output_file: str, 
     namespace: str = "default", 
-    search_mode: str = "direct"
+    search_mode: str = "direct",
+    workers: int = 4,
+    rate: Optional[float] = None,
+    resume: bool = True
 ) -> None:
     """
-    Process a batch of questions from a file and save results to another file.
+    Process a batch of questions from a file, appending each result to a JSONL file as it completes.
     
     Args:
         input_file: Path to input file with questions (one per line)
-        output_file: Path to output file for results
+        output_file: Path to JSONL output file for results
         namespace: The namespace to use
         search_mode: The search mode to use
+        workers: Number of questions answered concurrently
+        rate: Maximum questions started per second (None for no limit)
+        resume: Skip questions already answered in the output file
     """
-    results = []
-    
+    with open(input_file, 'r') as f:
+        lines = [line.strip() for line in f if line.strip()]
+    
+    # Identical questions are answered once
+    questions = list(dict.fromkeys(lines))
+    answered = load_answered(output_file) if resume else set()
+    pending = [question for question in questions if question not in answered]
+    logger.info(
+        f"Processing {len(pending)} questions from {input_file} "
+        f"({len(lines) - len(questions)} duplicates, {len(questions) - len(pending)} already answered)"
+    )
+    if not pending:
+        return
+    
+    # Create the agent before the workers start using it
+    get_rag_agent()
+    limiter = RateLimiter(rate)
+    
+    def answer(question):
+        limiter.wait()
+        return ask_question(question, namespace, search_mode)
+    
+    stage_times, completed, errors = {}, 0, 0
+    start_time = time.time()
+    executor = ThreadPoolExecutor(max_workers=workers)
     try:
-        with open(input_file, 'r') as f:
-            questions = [line.strip() for line in f if line.strip()]
-        
-        logger.info(f"Processing {len(questions)} questions from {input_file}")
-        
-        for i, question in enumerate(questions):
-            logger.info(f"Processing question {i+1}/{len(questions)}")
-            result = ask_question(question, namespace, search_mode)
-            results.append(result)
-        
-        with open(output_file, 'w') as f:
-            json.dump(results, f, indent=2)
-        
-        logger.info(f"Results saved to {output_file}")
-    
-    except Exception as e:
-        logger.error(f"Error processing batch: {str(e)}")
+        with open(output_file, 'a' if resume else 'w') as f:
+            futures = {executor.submit(answer, question): question for question in pending}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"question": futures[future], "error": str(e)}
+                f.write(json.dumps(result, default=str) + "\n")
+                f.flush()
+                
+                completed += 1
+                if "error" in result or "synthesis_error" in result.get("metrics", {}):
+                    errors += 1
+                for stage, duration in result.get("processing_time", {}).items():
+                    if isinstance(duration, (int, float)):
+                        stage_times.setdefault(stage, []).append(duration)
+                logger.info(f"Completed question {completed}/{len(pending)}")
+    except KeyboardInterrupt:
+        logger.warning("Batch interrupted; rerun the same command to resume")
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+    
+    elapsed = time.time() - start_time
+    logger.info(f"Results saved to {output_file}")
+    print(f"Answered {completed} questions in {elapsed:.1f}s ({completed / max(elapsed, 1e-9):.2f} questions/s, {errors} errors)")
+    print(f"{'stage':<22}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}")
+    for stage, times in stage_times.items():
+        p50, p95, p99 = np.percentile(times, [50, 95, 99])
+        print(f"{stage:<22}{p50:>9.2f}{p95:>9.2f}{p99:>9.2f}")
 
-def add_namespace_config(
-    namespace: str,
-    direct_top_n: int = 10,
-    direct_llm: str = "gemini",
-    deepsearch_top_n: int = 6,
-    deepsearch_sub_query_top_n: int = 3,
-    deepsearch_llm: str = "openai"
+def warm_caches(
+    top_n: int = config.QUERY_LOG_CONFIG["warm_top_n"],
+    hours: float = config.QUERY_LOG_CONFIG["warm_hours"],
+    url: Optional[str] = None
 ) -> None:
     """
-    Add or update a namespace configuration.
+    Answer the most frequent recent questions from the query log to fill the caches.
+    
+    With a url the questions are sent to the service's /query/batch endpoint (run
+    this after a deploy); without one they are answered in this process, which fills
+    the persistent LLM output cache.
     
     Args:
-        namespace: The namespace to configure
-        direct_top_n: Number of documents to retrieve for direct search
-        direct_llm: LLM to use for direct search
-        deepsearch_top_n: Number of documents to retrieve for simple queries in deepsearch
-        deepsearch_sub_query_top_n: Number of documents per sub-question for complex queries
-        deepsearch_llm: LLM to use for deepsearch
+        top_n: Number of distinct questions to warm
+        hours: How far back the query log is read
+        url: Base URL of a running service
     """
-    config.SEARCH_CONFIG[namespace] = {
-        "direct": {
-            "top_n": direct_top_n,
-            "llm": direct_llm,
-            "rerank": True
-        },
-        "deepsearch": {
-            "top_n": deepsearch_top_n,
-            "sub_query_top_n": deepsearch_sub_query_top_n,
-            "llm": deepsearch_llm,
-            "rerank": True
-        }
-    }
-    
-    logger.info(f"Added/updated configuration for namespace: {namespace}")
-
-def main():
-    """Command-line interface for the RAG system."""
-    parser = argparse.ArgumentParser(description="RAG System CLI")
-    
-    # Command type
-    subparsers = parser.add_subparsers(dest="command", help="Command to run")
-    
-    # Single question command
-    ask_parser = subparsers.add_parser("ask", help="Ask a single question")
-    ask_parser.add_argument("question", help="Question to ask")
-    ask_parser.add_argument("--namespace", "-n", default="default", help="Namespace to use")
-    ask_parser.add_argument("--mode", "-m", default="direct", choices=["direct", "deepsearch"], 
-                           help="Search mode to use")
-    ask_parser.add_argument("--verbose", "-v", action="store_true", help="Print detailed information")
-    
-    # Batch processing command
-    batch_parser = subparsers.add_parser("batch", help="Process a batch of questions")
-    batch_parser.add_argument("input", help="Input file with questions")
-    batch_parser.add_argument("output", help="Output file for results")
-    batch_parser.add_argument("--namespace", "-n", default="default", help="Namespace to use")
-    batch_parser.add_argument("--mode", "-m", default="direct", choices=["direct", "deepsearch"], 
-                             help="Search mode to use")
-    
-    # Config command
-    config_parser = subparsers.add_parser("config", help="Add or update namespace configuration")
-    config_parser.add_argument("namespace", help="Namespace to configure")
-    config_parser.add_argument("--direct-top-n", type=int, default=10, 
-                              help="Number of documents for direct search")
-    config_parser.add_argument("--direct-llm", default="gemini", choices=["gemini", "openai"],
-                              help="LLM to use for direct search")
-    config_parser.add_argument("--deepsearch-top-n", type=int, default=6,
-                              help="Number of documents for simple queries in deepsearch")
-    config_parser.add_argument("--deepsearch-sub-query-top-n", type=int, default=3,
-                              help="Number of documents per sub-question for complex queries")
-    config_parser.add_argument("--deepsearch-llm", default="openai", choices=["gemini", "openai"],
-                              help="LLM to use for deepsearch")
-    
-    # Parse arguments and execute command
-    args = parser.parse_args()
-    
-    if args.command == "ask":
-        result = ask_question(args.question, args.namespace, args.mode, args.verbose)
-        if not args.verbose:
-            print(result["answer"])
-    
-    elif args.command == "batch":
-        process_batch(args.input, args.output, args.namespace, args.mode)
-    
-    elif args.command == "config":
-        add_namespace_config(
-            args.namespace,
-            args.direct_top_n,
-            args.direct_llm,
-            args.deepsearch_top_n,
-            args.deepsearch_sub_query_top_n,
-            args.deepsearch_llm
-        )
+    queries = top_queries(config.QUERY_LOG_CONFIG["path"], top_n, time.time() - hours * 3600)
+    items = []
+    for query in queries:
+        # Progressive requests run and cache both modes
+        modes = ["direct", "deepsearch"] if query["search_mode"] == "progressive" else [query["search_mode"]]
+        items.extend({"query": query["query"], "namespace": query["namespace"], "search_mode": mode} for mode in modes)
+    if not items:
+        print(f"No questions logged in the last {hours:g} hours")
+        return
+    logger.info(f"Warming caches with {len(items)} questions from the last {hours:g} hours")
     
+    start_time = time.time()
+    errors = 0
+    if url:
+        batch_size = config.BATCH_CONFIG["max_items"]
+        for i in range(0, len(items), batch_size):
+            request = urllib.request.Request(
+                url.rstrip("/") + "/query/batch",
+                data=json.dumps({"items": items[i:i + batch_size]}).encode("utf-8"),
+                headers={"Content-Type": "application/json", "X-AskNEU-Warm": "1"}
+            )
+            with urllib.request.urlopen(request, timeout=600) as response:
+                results = json.loads(response.read())["results"]
+            errors += sum(1 for result in results if result.get("error"))
+            logger.info(f"Warmed {min(i + batch_size, len(items))}/{len(items)} questions")
     else:
-        parser.print_help()
-
-# Simple demo code
-if __name__ == "__main__":
-    # If run directly, use the command-line interface
-    main()
-
+        results = get_rag_agent().answer_batch(items)
+        errors = sum(1 for result in results if result.get("error"))
+    
+    print(f"Warmed {len(items)} questions in {time.time() - start_time:.1f}s ({errors} errors)")
 
-def process_batch(
-    input_file: str, 
-    output_file: str, 
-    namespace: str = "default", 
-    search_mode: str = "direct"
+def build_faq(
+    questions_path: Optional[str] = config.FAQ_CONFIG["questions_path"],
+    output: str = config.FAQ_CONFIG["path"],
+    namespace: str = "default",
+    modes: Tuple[str, ...] = ("direct",),
+    mine_top_n: int = config.FAQ_CONFIG["mine_top_n"]
 ) -> None:
     """
-    Process a batch of questions from a file and save results to another file.
+    Precompute the answers of the FAQ questions and write the FAQ index.
+    
+    Run this after every document store build, with ASKNEU_ARTIFACTS_DIR pointing at
+    the new artifacts; the service only serves an index built for its document store.
     
     Args:
-        input_file: Path to input file with questions (one per line)
-        output_file: Path to output file for results
-        namespace: The namespace to use
-        search_mode: The search mode to use
+        questions_path: Curated questions, one per line (None for mined questions only)
+        output: Path of the FAQ index file
+        namespace: Namespace the curated questions are answered in
+        modes: Search modes the curated questions are answered in
+        mine_top_n: Most frequent logged questions to add (0 to disable)
     """
-    results = []
-    
-    try:
-        with open(input_file, 'r') as f:
-            questions = [line.strip() for line in f if line.strip()]
-        
-        logger.info(f"Processing {len(questions)} questions from {input_file}")
-        
-        for i, question in enumerate(questions):
-            logger.info(f"Processing question {i+1}/{len(questions)}")
-            result = ask_question(question, namespace, search_mode)
-            results.append(result)
-        
-        with open(output_file, 'w') as f:
-            json.dump(results, f, indent=2)
-        
-        logger.info(f"Results saved to {output_file}")
+    items = faq_questions(questions_path, namespace, modes, mine_top_n)
+    if not items:
+        print("No FAQ questions to precompute")
+        return
+    logger.info(f"Precomputing answers to {len(items)} FAQ questions")
     
-    except Exception as e:
-        logger.error(f"Error processing batch: {str(e)}")
+    start_time = time.time()
+    index = build_faq_index(get_rag_agent(), items)
+    index.save(output)
+    print(
+        f"Wrote {len(index)}/{len(items)} FAQ answers for build {index.build_id} to {output} "
+        f"in {time.time() - start_time:.1f}s ({os.path.getsize(output) / 1024:.0f} KiB)"
+    )
 
 def add_namespace_config(
     namespace: str,
@@ -392,6 +423,28 @@ def main():
     batch_parser.add_argument("--namespace", "-n", default="default", help="Namespace to use")
     batch_parser.add_argument("--mode", "-m", default="direct", choices=["direct", "deepsearch"], 
                              help="Search mode to use")
+    batch_parser.add_argument("--workers", "-w", type=int, default=4, help="Questions answered concurrently")
+    batch_parser.add_argument("--rate", type=float, default=None, help="Maximum questions started per second")
+    batch_parser.add_argument("--no-resume", action="store_true",
+                             help="Overwrite the output instead of skipping already answered questions")
+    
+    # Cache warming command
+    warm_parser = subparsers.add_parser("warm", help="Warm the caches with the most frequent logged questions")
+    warm_parser.add_argument("--top", type=int, default=config.QUERY_LOG_CONFIG["warm_top_n"],
+                            help="Number of distinct questions to warm")
+    warm_parser.add_argument("--hours", type=float, default=config.QUERY_LOG_CONFIG["warm_hours"],
+                            help="How far back to read the query log")
+    warm_parser.add_argument("--url", default=None, help="Base URL of the service to warm (default: this process)")
+    
+    # FAQ index command
+    faq_parser = subparsers.add_parser("faq", help="Precompute the answers of frequent questions")
+    faq_parser.add_argument("--questions", default=config.FAQ_CONFIG["questions_path"],
+                           help="Curated questions, one per line")
+    faq_parser.add_argument("--output", default=config.FAQ_CONFIG["path"], help="FAQ index file to write")
+    faq_parser.add_argument("--namespace", "-n", default="default", help="Namespace of the curated questions")
+    faq_parser.add_argument("--modes", default="direct", help="Comma-separated search modes of the curated questions")
+    faq_parser.add_argument("--mine", type=int, default=config.FAQ_CONFIG["mine_top_n"],
+                           help="Most frequent logged questions to add (0 to disable)")
     
     # Config command
     config_parser = subparsers.add_parser("config", help="Add or update namespace configuration")
@@ -416,7 +469,13 @@ def main():
             print(result["answer"])
     
     elif args.command == "batch":
-        process_batch(args.input, args.output, args.namespace, args.mode)
+        process_batch(args.input, args.output, args.namespace, args.mode, args.workers, args.rate, not args.no_resume)
+    
+    elif args.command == "warm":
+        warm_caches(args.top, args.hours, args.url)
+    
+    elif args.command == "faq":
+        build_faq(args.questions, args.output, args.namespace, tuple(args.modes.split(",")), args.mine)
     
     elif args.command == "config":
         add_namespace_config(
@@ -0,0 +1,66 @@
+"""
+Metadata filter module for narrowing and re-scoring retrieval by chunk metadata.
+The embedding DAG stores `subdomain`, `date` and `unix_time` on every chunk; filters
+built here are pushed down into the vector and BM25 searches.
+"""
+
+import time
+from typing import List, Dict, Any, Optional
+
+
+def build_metadata_filter(node_config: Dict[str, Any], now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    Build a Pinecone-style metadata filter from a namespace configuration.
+
+    Args:
+        node_config: Namespace/mode configuration with optional 'subdomains' and 'max_age_days'
+        now: Current unix time (defaults to time.time())
+
+    Returns:
+        The filter, or None when the configuration does not restrict the search
+    """
+    conditions = {}
+
+    subdomains = node_config.get("subdomains")
+    if subdomains:
+        conditions["subdomain"] = {"$in": list(subdomains)}
+
+    max_age_days = node_config.get("max_age_days")
+    if max_age_days:
+        now = time.time() if now is None else now
+        conditions["unix_time"] = {"$gte": now - max_age_days * 86400}
+
+    return conditions or None
+
+
+def apply_recency_decay(
+    docs: List[Any],
+    half_life_days: float,
+    weight: float,
+    now: Optional[float] = None
+) -> List[Any]:
+    """
+    Re-score documents so fresher pages rank higher, and sort by the new score.
+
+    The base score is the rerank score, else the retrieval score, else a rank-based
+    score. It is multiplied by (1 - weight) + weight * 0.5 ** (age / half_life), so a
+    page half_life_days old keeps 1 - weight / 2 of its score. Documents without
+    unix_time are treated as fresh.
+    """
+    if not docs:
+        return docs
+
+    now = time.time() if now is None else now
+    rescored = []
+    for rank, doc in enumerate(docs):
+        base = doc.metadata.get("rerank_score", doc.score)
+        if base is None:
+            base = 1.0 / (rank + 1)
+        unix_time = doc.metadata.get("unix_time")
+        age_days = max(now - unix_time, 0.0) / 86400 if isinstance(unix_time, (int, float)) else 0.0
+        decayed = base * ((1 - weight) + weight * 0.5 ** (age_days / half_life_days))
+        doc.metadata["recency_score"] = decayed
+        rescored.append((decayed, rank, doc))
+
+    rescored.sort(key=lambda item: (-item[0], item[1]))
+    return [doc for _, _, doc in rescored]
@@ -0,0 +1,53 @@
+"""
+Maximal marginal relevance module for diversifying retrieved candidates.
+Selection runs locally over the candidate vectors returned with the search results,
+so several chunks of the same page do not crowd out other relevant pages.
+"""
+
+from typing import List
+import numpy as np
+from local_index import normalize_rows
+
+
+def maximal_marginal_relevance(
+    query_vector: np.ndarray,
+    candidate_vectors: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5
+) -> List[int]:
+    """
+    Select k candidates balancing relevance to the query against redundancy.
+
+    Args:
+        query_vector: Embedding of the query
+        candidate_vectors: Matrix of candidate embeddings, one row per candidate
+        k: Number of candidates to select
+        lambda_mult: 1.0 ranks purely by relevance, 0.0 purely by diversity
+
+    Returns:
+        Indices of the selected candidates in selection order
+    """
+    if not len(candidate_vectors) or k <= 0:
+        return []
+
+    candidates = normalize_rows(candidate_vectors)
+    relevance = candidates @ normalize_rows(query_vector)
+    k = min(k, len(candidates))
+
+    # Pairwise similarities are computed once; each step is then a vector update
+    similarity = candidates @ candidates.T
+    first = int(np.argmax(relevance))
+    selected = [first]
+    max_similarity = similarity[first].copy()
+    available = np.ones(len(candidates), dtype=bool)
+    available[first] = False
+
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+
+    return selected
@@ -0,0 +1,120 @@
+"""
+Namespace router module that picks the namespace and subdomain a query belongs to.
+Centroids of the chunk vectors of every (namespace, subdomain) group are computed from
+the local vector snapshot, and queries are classified by cosine similarity to them.
+"""
+
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+import config
+from local_index import DEFAULT_NAMESPACE_DIR, normalize_rows
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class NamespaceRouter:
+    """Nearest-centroid classifier over (namespace, subdomain) groups of the index."""
+
+    def __init__(
+        self,
+        labels: List[Tuple[str, Optional[str]]],
+        centroids: np.ndarray,
+        temperature: float = config.ROUTER_CONFIG["temperature"],
+        min_confidence: float = config.ROUTER_CONFIG["min_confidence"],
+        subdomain_min_confidence: float = config.ROUTER_CONFIG["subdomain_min_confidence"]
+    ):
+        """
+        Create a router from precomputed centroids.
+
+        Args:
+            labels: (service namespace, subdomain) of each centroid; subdomain None pools small subdomains
+            centroids: Normalized centroid matrix with one row per label
+            temperature: Softmax temperature applied to the cosine similarities
+            min_confidence: Probability mass a namespace needs before queries are routed to it
+            subdomain_min_confidence: Probability a subdomain needs before a subdomain filter is applied
+        """
+        self.labels = labels
+        self.centroids = centroids
+        self.temperature = temperature
+        self.min_confidence = min_confidence
+        self.subdomain_min_confidence = subdomain_min_confidence
+        self.namespaces = sorted({namespace for namespace, _ in labels})
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @classmethod
+    def from_local_store(
+        cls,
+        local_store: Any,
+        min_subdomain_chunks: int = config.ROUTER_CONFIG["min_subdomain_chunks"]
+    ) -> "NamespaceRouter":
+        """Compute one centroid per subdomain of every namespace in a local vector snapshot."""
+        labels, centroids = [], []
+        for name, index in local_store.namespaces.items():
+            namespace = "default" if name == DEFAULT_NAMESPACE_DIR else name
+            subdomains = index.columns.get("subdomain")
+            if subdomains is None:
+                subdomains = np.full(len(index), None, dtype=object)
+
+            groups = {}
+            for subdomain in set(subdomains.tolist()):
+                rows = np.flatnonzero(subdomains == subdomain)
+                key = subdomain if subdomain is not None and len(rows) >= min_subdomain_chunks else None
+                groups.setdefault(key, []).append(rows)
+
+            for subdomain, row_groups in groups.items():
+                rows = np.sort(np.concatenate(row_groups))
+                labels.append((namespace, subdomain))
+                centroids.append(np.asarray(index.vectors[rows], dtype=np.float32).mean(axis=0))
+
+        return cls(labels, normalize_rows(np.asarray(centroids, dtype=np.float32)))
+
+    def route(self, query_vector: List[float]) -> Dict[str, Any]:
+        """
+        Classify a query vector.
+
+        Returns:
+            Dict with the best 'namespace' and 'subdomain' (None when not confident enough),
+            their probabilities, and 'routed' telling whether the namespace passed the threshold
+        """
+        scores = self.centroids @ normalize_rows(np.asarray(query_vector, dtype=np.float32))
+        logits = (scores - scores.max()) / self.temperature
+        probabilities = np.exp(logits) / np.exp(logits).sum()
+
+        namespace_mass = {namespace: 0.0 for namespace in self.namespaces}
+        for (namespace, _), probability in zip(self.labels, probabilities):
+            namespace_mass[namespace] += float(probability)
+        namespace = max(namespace_mass, key=namespace_mass.get)
+
+        best = max(
+            (i for i, (label_namespace, _) in enumerate(self.labels) if label_namespace == namespace),
+            key=lambda i: probabilities[i]
+        )
+        subdomain = self.labels[best][1]
+        subdomain_confidence = float(probabilities[best])
+        if subdomain_confidence < self.subdomain_min_confidence:
+            subdomain = None
+
+        return {
+            "namespace": namespace,
+            "namespace_confidence": namespace_mass[namespace],
+            "subdomain": subdomain,
+            "subdomain_confidence": subdomain_confidence,
+            "routed": namespace_mass[namespace] >= self.min_confidence
+        }
+
+
+def load_namespace_router(local_store: Any) -> Optional[NamespaceRouter]:
+    """Build the router from the local vector snapshot, or return None if routing is unavailable."""
+    if not config.ROUTER_CONFIG.get("enabled", True) or local_store is None:
+        return None
+    try:
+        router = NamespaceRouter.from_local_store(local_store)
+    except (ValueError, KeyError) as e:
+        logger.warning(f"Could not build namespace router: {str(e)}")
+        return None
+    logger.info(f"Namespace router ready with {len(router)} centroids over namespaces {router.namespaces}")
+    return router
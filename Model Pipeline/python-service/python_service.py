@@ -1,11 +1,16 @@
 #!/usr/bin/env python
 import json
 import sys
+import threading
 import time
 import uuid
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from main import ask_question, clean_answer  # Import your RAG system
+from main import ask_question, ask_question_batch, ask_question_progressive, clean_answer, get_rag_agent  # Import your RAG system
+from query_log import open_query_log
+from feedback_store import load_feedback_store
+from shared_cache import shared_backend
+import config
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
@@ -15,8 +20,62 @@ print("Initializing ASK NEU RAG System...", file=sys.stderr)
 # No need to initialize anything here - RAG agent is created on first use
 print("ASK NEU System initialized and ready to serve requests", file=sys.stderr)
 
-# Simple in-memory feedback storage
-feedback_store = {}
+# Durable feedback storage shared by the workers (writes are batched in the background)
+feedback_store = load_feedback_store()
+
+# Background-written log of the questions asked (None if disabled)
+query_log = open_query_log()
+
+# Requests sent by 'main.py warm' carry this header and are not logged
+WARM_HEADER = 'X-AskNEU-Warm'
+
+# Stored ratings are applied to each worker's answer cache once, before its first request
+ratings_loaded = False
+ratings_lock = threading.Lock()
+
+def load_stored_ratings():
+    """Pin and exclude answers from the ratings of the last days (a negative rating always wins)"""
+    global ratings_loaded
+    if ratings_loaded:
+        return
+    with ratings_lock:
+        if ratings_loaded:
+            return
+        ratings_loaded = True
+        agent = get_rag_agent()
+        if agent.answer_cache is None:
+            return
+        since = time.time() - config.ANSWER_CACHE_CONFIG.get('rating_lookback_days', 30) * 86400
+        try:
+            ratings = feedback_store.rated_answers(since)
+        except Exception as e:
+            print(f"❌ Could not load stored ratings: {str(e)}", file=sys.stderr)
+            return
+        # Exclusions are permanent for an index version, so the order of application does not matter
+        for record in ratings:
+            agent.apply_feedback(
+                record['query'], record['namespace'], record['search_mode'], record['rating'], record['index_version']
+            )
+        print(f"✅ Applied {len(ratings)} stored ratings to the answer cache", file=sys.stderr)
+
+def log_query(query, namespace, search_mode, result, source='query'):
+    """Queue a query log record; the write happens on the log's background thread"""
+    if query_log is None:
+        return
+    metrics = result.get('metrics', {})
+    query_log.log({
+        'timestamp': time.time(),
+        'query': query,
+        'namespace': namespace,
+        'search_mode': search_mode,
+        'source': source,
+        'follow_up': 'standalone_question' in result,
+        'timing': result.get('processing_time', {}),
+        'answer_cache': metrics.get('answer_cache'),
+        'faq': metrics.get('faq'),
+        'query_type': metrics.get('query_type'),
+        'error': bool(result.get('error'))
+    })
 
 from flask import Response
 import time
@@ -28,15 +87,34 @@ def query_handler():
     namespace = data.get('namespace', 'default')
     search_mode = data.get('search_mode', 'direct')
     feedback_id = data.get('feedback_id', str(uuid.uuid4()))
+    # A new conversation gets a session_id here; clients send it back with follow-up questions
+    session_id = data.get('session_id') or str(uuid.uuid4())
+    log = WARM_HEADER not in request.headers
+    load_stored_ratings()
 
     print(f"Processing query: {query} | namespace: {namespace} | search_mode: {search_mode}", file=sys.stderr)
 
+    if search_mode == 'progressive':
+        return Response(
+            progressive_events(query, namespace, session_id, feedback_id, log),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
     try:
         result = ask_question(
             question=query,
             namespace=namespace,
             search_mode=search_mode,
-            verbose=False
+            verbose=False,
+            session_id=session_id
+        )
+
+        if log:
+            log_query(query, namespace, search_mode, result)
+        feedback_store.record_answer(
+            feedback_id, query, namespace, search_mode, result.get('metrics', {}).get('answer_cache'),
+            get_rag_agent().index_version
         )
 
         clean_result = clean_answer(result)
@@ -46,7 +124,8 @@ def query_handler():
             'sources': clean_result.get('sources', ''),
             'query_id': feedback_id,
             'processing_time': result.get('processing_time', {}).get('total', 0),
-            'search_mode': search_mode
+            'search_mode': search_mode,
+            'session_id': session_id
         }
 
         print("✅ Final response:", response, file=sys.stderr)
@@ -54,9 +133,98 @@ def query_handler():
 
     except Exception as e:
         print(f"❌ Error: {str(e)}", file=sys.stderr)
+        if log:
+            log_query(query, namespace, search_mode, {'error': str(e)})
         return jsonify({'error': str(e)}), 500
 
 
+def progressive_events(query, namespace, session_id, feedback_id, log=True):
+    """Server-sent events: a 'direct' answer first, then the refined 'deepsearch' answer"""
+    try:
+        for stage, result in ask_question_progressive(query, namespace, session_id):
+            if log and stage == 'deepsearch':
+                log_query(query, namespace, 'progressive', result)
+            # A rating applies to the answer shown last, so the deepsearch context replaces the direct one
+            feedback_store.record_answer(
+                feedback_id, query, namespace, stage, result.get('metrics', {}).get('answer_cache'),
+                get_rag_agent().index_version
+            )
+            clean_result = clean_answer(result)
+            event = {
+                'answer': clean_result.get('answer', ''),
+                'sources': clean_result.get('sources', ''),
+                'query_id': feedback_id,
+                'processing_time': result.get('processing_time', {}).get('total', 0),
+                'search_mode': stage,
+                'final': stage == 'deepsearch',
+                'session_id': session_id
+            }
+            print(f"✅ Progressive {stage} response sent", file=sys.stderr)
+            yield f"event: {stage}\ndata: {json.dumps(event)}\n\n"
+    except Exception as e:
+        print(f"❌ Error: {str(e)}", file=sys.stderr)
+        yield f"event: error\ndata: {json.dumps({'error': str(e), 'session_id': session_id})}\n\n"
+
+
+@app.route('/query/batch', methods=['POST'])
+def query_batch_handler():
+    """Answer many questions in one call; results are in input order with per-item errors"""
+    data = request.json or {}
+    items = data.get('items', [])
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'items must be a non-empty list'}), 400
+    if len(items) > config.BATCH_CONFIG['max_items']:
+        return jsonify({'error': f"at most {config.BATCH_CONFIG['max_items']} items per batch"}), 400
+
+    valid = [isinstance(item, dict) and isinstance(item.get('query'), str) and item['query'].strip() for item in items]
+    batch = [
+        {
+            'query': item['query'],
+            'namespace': item.get('namespace', 'default'),
+            'search_mode': item.get('search_mode', 'direct')
+        }
+        for item, ok in zip(items, valid) if ok
+    ]
+
+    print(f"Processing batch of {len(items)} queries", file=sys.stderr)
+    load_stored_ratings()
+    start_time = time.time()
+    try:
+        results = iter(ask_question_batch(batch) if batch else [])
+    except Exception as e:
+        print(f"❌ Error: {str(e)}", file=sys.stderr)
+        return jsonify({'error': str(e)}), 500
+
+    log = WARM_HEADER not in request.headers
+    responses = []
+    for item, ok in zip(items, valid):
+        if not ok:
+            responses.append({'error': 'query is required'})
+            continue
+        result = next(results)
+        if log:
+            log_query(item['query'], item.get('namespace', 'default'), item.get('search_mode', 'direct'), result, 'batch')
+        if result.get('error'):
+            responses.append({'error': result['error'], 'search_mode': result.get('search_mode', item.get('search_mode', 'direct'))})
+            continue
+        query_id = item.get('feedback_id', str(uuid.uuid4()))
+        if log:
+            feedback_store.record_answer(
+                query_id, item['query'], item.get('namespace', 'default'), item.get('search_mode', 'direct'),
+                result.get('metrics', {}).get('answer_cache'), get_rag_agent().index_version
+            )
+        clean_result = clean_answer(result)
+        responses.append({
+            'answer': clean_result.get('answer', ''),
+            'sources': clean_result.get('sources', ''),
+            'query_id': query_id,
+            'processing_time': result.get('processing_time', {}).get('total', 0),
+            'search_mode': item.get('search_mode', 'direct')
+        })
+
+    return jsonify({'results': responses, 'processing_time': time.time() - start_time})
+
+
 @app.route('/feedback', methods=['POST'])
 def store_feedback():
     data = request.json
@@ -68,12 +236,16 @@ def store_feedback():
         rating = data['rating']  # 'positive' or 'negative'
         feedback_text = data.get('feedback_text', '')
         
-        # Store the feedback
-        feedback_store[query_id] = {
-            'rating': rating,
-            'feedback_text': feedback_text,
-            'timestamp': time.time()
-        }
+        # Queue the feedback; the store's flusher writes it in the background
+        feedback_store.add_feedback(query_id, rating, feedback_text)
+
+        # Pin or evict the rated answer in this worker's cache; other workers pick it up on start
+        load_stored_ratings()
+        answer = feedback_store.get_answer(query_id)
+        if answer is not None:
+            get_rag_agent().apply_feedback(
+                answer['query'], answer['namespace'], answer['search_mode'], rating, answer.get('index_version')
+            )
         
         print(f"Stored feedback for query {query_id}: {rating}", file=sys.stderr)
         return jsonify({'success': True})
@@ -81,11 +253,44 @@ def store_feedback():
         print(f"Error storing feedback: {str(e)}", file=sys.stderr)
         return jsonify({'error': str(e)}), 500
 
+@app.route('/feedback/stats', methods=['GET'])
+def feedback_stats():
+    """Rating counts per namespace, optionally filtered by time range (epoch seconds) and split into windows"""
+    try:
+        since = request.args.get('since', type=float)
+        until = request.args.get('until', type=float)
+        window = request.args.get('window', type=float)
+        aggregates = feedback_store.rating_aggregates(request.args.get('namespace'), since, until, window)
+        cache_outcomes = feedback_store.cache_outcomes_by_rating(since, until)
+    except Exception as e:
+        print(f"Error reading feedback: {str(e)}", file=sys.stderr)
+        return jsonify({'error': str(e)}), 500
+    return jsonify({'aggregates': aggregates, 'cache_outcomes': cache_outcomes, 'store': feedback_store.stats()})
+
 @app.route('/healthcheck', methods=['GET'])
 def healthcheck():
     """Simple health check endpoint for monitoring"""
     return jsonify({'status': 'ok', 'service': 'ASK NEU Python Service'})
 
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Hit rates of the service caches, reported per cache"""
+    agent = get_rag_agent()
+    return jsonify({
+        'llm_outputs': agent.llm_cache.stats() if agent.llm_cache is not None else None,
+        'rerank': agent.rerank_cache.stats(),
+        'embeddings': agent.embedding_cache.stats(),
+        'answers': agent.answer_cache.stats() if agent.answer_cache is not None else None,
+        'faq': {'answers': len(agent.faq_index), 'build_id': agent.faq_index.build_id} if agent.faq_index is not None else None,
+        'query_log': query_log.stats() if query_log is not None else None,
+        'shared_tier': shared_backend().stats() if shared_backend() is not None else None
+    })
+
+@app.route('/sessions/stats', methods=['GET'])
+def session_stats():
+    """Conversation memory usage: sessions, turns, history tokens and evictions"""
+    return jsonify(get_rag_agent().conversations.stats())
+
 if __name__ == '__main__':
     # Run the Flask app on port 5001 (different from Node.js)
     app.run(host='0.0.0.0', port=5001)
\ No newline at end of file
@@ -0,0 +1,255 @@
+"""
+Query log module that records the questions users ask without blocking requests.
+Records are queued in memory and a background thread appends them in batches to
+gzip-compressed JSONL files, rotated by record count and age; the oldest files are
+deleted. The logs feed traffic replay (benchmarks.service_load) and cache warming;
+with an upload URL, finished files are also copied to GCS, where the embedding DAG
+mines them for the FAQ tier.
+"""
+
+import atexit
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from typing import List, Dict, Any, Optional, Iterator
+import config
+from cache import normalize_query
+
+try:
+    from google.cloud import storage
+except ImportError:
+    storage = None
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+_FILE_PATTERN = "queries-*.jsonl.gz"
+
+
+class QueryLog:
+    """Asynchronous writer of rotating, compressed JSONL query logs."""
+
+    def __init__(
+        self,
+        directory: str,
+        max_file_records: int = 50000,
+        rotate_seconds: float = 3600,
+        max_files: int = 168,
+        queue_size: int = 10000,
+        flush_interval: float = 1.0,
+        upload_url: Optional[str] = None
+    ):
+        """
+        Create the log directory and start the background writer.
+
+        Args:
+            directory: Directory of the log files (shared by all workers; files carry the pid)
+            max_file_records: Records per file before a new file is started
+            rotate_seconds: Age at which a new file is started
+            max_files: Files kept in the directory; the oldest are deleted
+            queue_size: Records waiting to be written; further records are dropped
+            flush_interval: Seconds between batched writes
+            upload_url: gs://bucket/prefix that finished files are copied to (None keeps them local)
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_file_records = max_file_records
+        self.rotate_seconds = rotate_seconds
+        self.max_files = max_files
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.logged = 0
+        self.dropped = 0
+        self.written = 0
+        self._path = None
+        self._file_records = 0
+        self._file_started = 0.0
+        self._files_started = 0
+        self.uploaded = 0
+        self.upload_url = None
+        self._bucket = None
+        self._pending_uploads = []
+        if upload_url and not upload_url.startswith("gs://"):
+            logger.warning(f"Query log upload URL {upload_url} is not a gs:// URL, files are kept local")
+        elif upload_url and storage is None:
+            logger.warning("google-cloud-storage is not installed, query log files are kept local")
+        elif upload_url:
+            self.upload_url = upload_url.rstrip("/")
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._writer = threading.Thread(target=self._run, name="query-log-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def log(self, record: Dict[str, Any]) -> None:
+        """Queue a record for writing; never blocks, drops the record if the queue is full."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return
+        with self._lock:
+            self.logged += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+            # Finish an idle file once it is old, so its records are uploaded without waiting for traffic
+            if self._path is not None and time.time() - self._file_started >= self.rotate_seconds:
+                self._finish_file()
+        self.flush()
+        self._finish_file()
+
+    def _current_path(self) -> str:
+        """Return the file to append to, starting a new one when the current one is full or old."""
+        now = time.time()
+        if self._path is None or self._file_records >= self.max_file_records or now - self._file_started >= self.rotate_seconds:
+            self._finish_file()
+            self._files_started += 1
+            name = time.strftime("queries-%Y%m%d-%H%M%S", time.gmtime(now)) + f"-{os.getpid()}-{self._files_started:06d}.jsonl.gz"
+            self._path = os.path.join(self.directory, name)
+            self._file_records = 0
+            self._file_started = now
+            self._prune()
+        return self._path
+
+    def _finish_file(self) -> None:
+        """Stop appending to the current file and upload it, retrying earlier failed uploads."""
+        if self._path is not None and self.upload_url:
+            self._pending_uploads.append(self._path)
+        self._path = None
+        if not self._pending_uploads:
+            return
+
+        bucket_name, _, prefix = self.upload_url[len("gs://"):].partition("/")
+        pending = []
+        for path in self._pending_uploads:
+            if not os.path.exists(path):
+                continue  # Pruned, or never written
+            try:
+                if self._bucket is None:
+                    self._bucket = storage.Client().bucket(bucket_name)
+                self._bucket.blob(f"{prefix}/{os.path.basename(path)}".lstrip("/")).upload_from_filename(path)
+            except Exception as e:
+                logger.warning(f"Could not upload query log {path}: {str(e)}")
+                pending.append(path)
+                continue
+            with self._lock:
+                self.uploaded += 1
+        self._pending_uploads = pending
+
+    def _prune(self) -> None:
+        """Delete the oldest files beyond max_files (names sort by creation time)."""
+        paths = sorted(glob.glob(os.path.join(self.directory, _FILE_PATTERN)))
+        for path in paths[:max(len(paths) - self.max_files + 1, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def flush(self) -> None:
+        """Write every queued record. Each write appends a gzip member, so files stay readable after a crash."""
+        records = []
+        while True:
+            try:
+                records.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+
+        while records:
+            path = self._current_path()
+            batch = records[:self.max_file_records - self._file_records]
+            records = records[len(batch):]
+            data = "".join(json.dumps(record, separators=(",", ":"), default=str) + "\n" for record in batch)
+            try:
+                with gzip.open(path, "at", encoding="utf-8") as f:
+                    f.write(data)
+            except OSError as e:
+                logger.warning(f"Could not write query log {path}: {str(e)}")
+                with self._lock:
+                    self.dropped += len(batch)
+                continue
+            self._file_records += len(batch)
+            with self._lock:
+                self.written += len(batch)
+
+    def close(self) -> None:
+        """Stop the writer after writing the queued records."""
+        if not self._stop.is_set():
+            self._stop.set()
+            self._writer.join(timeout=5)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return record counters and the current file."""
+        with self._lock:
+            return {
+                "logged": self.logged,
+                "written": self.written,
+                "dropped": self.dropped,
+                "queued": self.queue.qsize(),
+                "uploaded": self.uploaded,
+                "upload_pending": len(self._pending_uploads),
+                "file": self._path
+            }
+
+
+def open_query_log(log_config: Dict[str, Any] = config.QUERY_LOG_CONFIG) -> Optional[QueryLog]:
+    """Start the query log, or return None if it is disabled or its directory is not writable."""
+    if not log_config.get("enabled", True):
+        return None
+    try:
+        return QueryLog(
+            log_config["path"],
+            log_config["max_file_records"],
+            log_config["rotate_seconds"],
+            log_config["max_files"],
+            log_config["queue_size"],
+            log_config["flush_interval"],
+            log_config.get("upload_url")
+        )
+    except OSError as e:
+        logger.warning(f"Could not open query log: {str(e)}")
+        return None
+
+
+def read_query_log(directory: str = config.QUERY_LOG_DIR, since: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """Yield logged records, oldest file first, optionally only those after a timestamp."""
+    for path in sorted(glob.glob(os.path.join(directory, _FILE_PATTERN))):
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    record = json.loads(line)
+                    if since is None or record.get("timestamp", 0) >= since:
+                        yield record
+        except (OSError, EOFError, ValueError) as e:
+            # A file another worker is appending to can end in a partial gzip member
+            logger.warning(f"Stopped reading query log {path}: {str(e)}")
+
+
+def top_queries(directory: str = config.QUERY_LOG_DIR, n: int = 200, since: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Return the n most frequent one-off questions per (namespace, search mode).
+
+    Questions are counted by normalized text; follow-ups and failed requests are
+    skipped since their answers are never cached.
+    """
+    counts = Counter()
+    variants = {}
+    for record in read_query_log(directory, since):
+        if record.get("follow_up") or record.get("error") or not record.get("query"):
+            continue
+        key = (normalize_query(record["query"]), record.get("namespace", "default"), record.get("search_mode", "direct"))
+        counts[key] += 1
+        variants.setdefault(key, record["query"])
+
+    return [
+        {"query": variants[key], "namespace": key[1], "search_mode": key[2], "count": count}
+        for key, count in counts.most_common(n)
+    ]
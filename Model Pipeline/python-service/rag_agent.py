@@ -4,11 +4,20 @@ This module handles the core RAG processing logic.
 """
 
 import logging
+import math
+import os
+import threading
 import time
 import re
-from typing import List, Dict, Any, Optional, TypedDict
+import sqlite3
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Dict, Any, Optional, Tuple, TypedDict, Iterator
+import numpy as np
 from pydantic import BaseModel, Field
 from langchain_core.messages import SystemMessage, AIMessage, HumanMessage
+from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
 from langchain_core.language_models.chat_models import BaseChatModel
@@ -20,71 +29,362 @@ from langgraph.graph import StateGraph, END
 import cohere
 import config
 from pinecone import Pinecone
+from chunk_record import ChunkRecord
+from doc_store import load_document_store, document_key
+from local_index import load_local_vector_store
+from bm25_index import BM25Store, reciprocal_rank_fusion, tokenize
+from dedup import remove_near_duplicates
+from mmr import maximal_marginal_relevance
+from cache import PersistentCache, normalize_query, template_version
+from metadata_filters import build_metadata_filter, apply_recency_decay
+from namespace_router import load_namespace_router
+from conversation_memory import ConversationMemory, estimate_tokens
+from answer_cache import AnswerCache
+from faq_index import load_faq_index
+from shared_cache import layered_cache, uses_shared_tier
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# Try different import paths for the MemorySaver
+# The ONNX cross-encoder reranker is optional
 try:
-    from langgraph.checkpoint.memory import MemorySaver
+    import onnxruntime
+    from tokenizers import Tokenizer
 except ImportError:
-    try:
-        from langgraph.persist import MemorySaver
-    except ImportError:
-        # If both fail, create a dummy class that doesn't break the code
-        logger.warning("Could not import MemorySaver, state will not persist between calls")
-        class MemorySaver:
-            pass
+    onnxruntime = None
+    Tokenizer = None
 
 class SubQuery(BaseModel):
     sub_questions: List[str] = Field(..., description="List of decomposed sub-questions")
 
 # State definition for LangGraph
 class RAGState(TypedDict):
-    query: str                      # Original user query
+    query: str                      # User query (rewritten as standalone for follow-ups)
+    history: str                    # Compact conversation history of the session
     query_type: Optional[str]       # 'simple' or 'complex'
     sub_questions: List[str]        # Decomposed sub-questions if complex
-    docs: List[Any]                 # Retrieved documents
+    docs: List[ChunkRecord]         # Retrieved chunks (text is referenced, not copied)
     answer: Optional[str]           # Final answer
     sources: List[str]              # Extracted sources
     timing: Dict[str, float]        # Timing information
+    metrics: Dict[str, Any]         # Retrieval counters (e.g. near-duplicates removed)
     error: Optional[str]            # Any error information
     namespace: str                  # The namespace for this query
     search_mode: str                # 'direct' or 'deepsearch'
     config: Dict[str, Any]          # Configuration for this query
 
+class RerankerUnavailable(Exception):
+    """Raised when a reranker backend cannot serve a request (e.g. its circuit is open)."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker; slow calls count as failures."""
+    
+    def __init__(self, failure_threshold: int, reset_timeout: float, slow_threshold: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_threshold = slow_threshold
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        """Check whether a call may go through (after reset_timeout one trial call is allowed)."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Half-open: let this call probe the backend
+                self.opened_at = time.monotonic()
+                return True
+            return False
+    
+    def record(self, success: bool, duration: float) -> None:
+        """Record the outcome of a call and open or close the circuit."""
+        with self._lock:
+            if success and duration <= self.slow_threshold:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Opening reranker circuit after {self.failures} failed or slow calls")
+                self.opened_at = time.monotonic()
+
+
+class Reranker(ABC):
+    """Reranker backend interface."""
+    
+    name = "base"
+    
+    @abstractmethod
+    def rerank(self, query: str, documents: List[str], top_n: int) -> List[Tuple[int, Optional[float]]]:
+        """Return (document index, relevance score) pairs of the top_n documents, best first."""
+
+
+class CohereReranker(Reranker):
+    """Remote reranker using Cohere's rerank API behind a circuit breaker."""
+    
+    name = "cohere"
+    
+    def __init__(self, client: Any, model: str, breaker: CircuitBreaker):
+        self.client = client
+        self.model = model
+        self.breaker = breaker
+    
+    def rerank(self, query: str, documents: List[str], top_n: int) -> List[Tuple[int, Optional[float]]]:
+        if not self.breaker.allow():
+            raise RerankerUnavailable("Cohere reranker circuit is open")
+        
+        start_time = time.time()
+        try:
+            response = self.client.rerank(model=self.model, query=query, documents=documents, top_n=top_n)
+        except Exception:
+            self.breaker.record(False, time.time() - start_time)
+            raise
+        self.breaker.record(True, time.time() - start_time)
+        return [(result.index, result.relevance_score) for result in response.results]
+
+
+class LexicalReranker(Reranker):
+    """
+    Local CPU reranker scoring query-term coverage of each candidate.
+    
+    Terms are weighted by their rarity within the candidate set; matched query
+    bigrams and the original retrieval rank add smaller contributions. Scores
+    fall in [0, 1].
+    """
+    
+    name = "lexical"
+    
+    def __init__(self, coverage_weight: float = 0.6, bigram_weight: float = 0.25, rank_weight: float = 0.15):
+        self.coverage_weight = coverage_weight
+        self.bigram_weight = bigram_weight
+        self.rank_weight = rank_weight
+    
+    def rerank(self, query: str, documents: List[str], top_n: int) -> List[Tuple[int, Optional[float]]]:
+        query_tokens = tokenize(query)
+        query_terms = set(query_tokens)
+        query_bigrams = set(zip(query_tokens, query_tokens[1:]))
+        
+        doc_tokens = [tokenize(document) for document in documents]
+        doc_terms = [set(tokens) for tokens in doc_tokens]
+        n_docs = len(documents)
+        
+        weights = {
+            term: math.log(1 + (n_docs + 1) / (sum(term in terms for terms in doc_terms) + 1))
+            for term in query_terms
+        }
+        total_weight = sum(weights.values()) or 1.0
+        
+        scores = []
+        for i, (tokens, terms) in enumerate(zip(doc_tokens, doc_terms)):
+            coverage = sum(weight for term, weight in weights.items() if term in terms) / total_weight
+            bigrams = len(query_bigrams & set(zip(tokens, tokens[1:]))) / len(query_bigrams) if query_bigrams else 0.0
+            rank_prior = 1.0 - i / n_docs
+            scores.append(self.coverage_weight * coverage + self.bigram_weight * bigrams + self.rank_weight * rank_prior)
+        
+        order = sorted(range(n_docs), key=lambda i: scores[i], reverse=True)
+        return [(i, scores[i]) for i in order[:top_n]]
+
+
+class OnnxCrossEncoderReranker(Reranker):
+    """Local cross-encoder reranker loaded from an ONNX model and tokenizer.json on disk."""
+    
+    name = "onnx"
+    
+    def __init__(self, model_dir: str, max_length: int = 512):
+        if onnxruntime is None or Tokenizer is None:
+            raise RerankerUnavailable("onnxruntime and tokenizers are required for the ONNX reranker")
+        
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, "model.onnx"), providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+    
+    def rerank(self, query: str, documents: List[str], top_n: int) -> List[Tuple[int, Optional[float]]]:
+        encodings = self.tokenizer.encode_batch([(query, document) for document in documents])
+        inputs = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+        }
+        logits = self.session.run(None, {name: value for name, value in inputs.items() if name in self.input_names})[0]
+        scores = 1 / (1 + np.exp(-np.asarray(logits, dtype=np.float32).reshape(len(documents), -1)[:, 0]))
+        order = np.argsort(-scores)[:top_n]
+        return [(int(i), float(scores[i])) for i in order]
+
+
+class NoopReranker(Reranker):
+    """Keeps the retrieval order without scoring."""
+    
+    name = "noop"
+    
+    def rerank(self, query: str, documents: List[str], top_n: int) -> List[Tuple[int, Optional[float]]]:
+        return [(i, None) for i in range(min(top_n, len(documents)))]
+
+
 class RAGAgent:
     """RAG Agent implementation with LangGraph workflow."""
     
-    def __init__(self):
-        """Initialize the RAG Agent with necessary components."""
-        # Initialize Pinecone
-        pc = Pinecone(api_key=config.PINECONE_API_KEY)
-        
+    def __init__(
+        self,
+        embeddings: Optional[Any] = None,
+        vectorstore: Optional[Any] = None,
+        index: Optional[Any] = None,
+        rerankers: Optional[Dict[str, Reranker]] = None,
+        llms: Optional[Dict[str, BaseChatModel]] = None
+    ):
+        """
+        Initialize the RAG Agent with necessary components.
+        
+        Every argument defaults to the live client built from the configuration;
+        benchmarks and tests pass local stand-ins instead so no network is needed.
+        
+        Args:
+            embeddings: Embedding model with embed_query/embed_documents
+            vectorstore: Vector store with similarity_search_by_vector_with_score
+            index: Pinecone index used by ids-only and MMR retrieval
+            rerankers: Reranker backends by name
+            llms: Chat models by MODEL_CONFIG name, used instead of building them in get_llm
+        """
         # Initialize embeddings
-        self.embeddings = OpenAIEmbeddings(
+        self.embeddings = embeddings or OpenAIEmbeddings(
             model=config.MODEL_CONFIG["embeddings"]["model_name"],
             api_key=config.MODEL_CONFIG["embeddings"]["api_key"]
         )
         
-        # Initialize vector store
-        self.vectorstore = PineconeVectorStore(
-            index=pc.Index(config.PINECONE_INDEX_NAME),
+        # Initialize Pinecone and the vector store (an injected vector store needs no index)
+        self.index = index
+        if self.index is None and vectorstore is None:
+            pc = Pinecone(api_key=config.PINECONE_API_KEY)
+            self.index = pc.Index(config.PINECONE_INDEX_NAME)
+        self.vectorstore = vectorstore or PineconeVectorStore(
+            index=self.index,
             embedding=self.embeddings,
             text_key="text"
         )
         
-        # Initialize Cohere client
-        self.cohere_client = cohere.Client(api_key=config.COHERE_API_KEY)
+        # Chat models by configuration name that get_llm returns as-is
+        self.llms = llms or {}
+        
+        # Local chunk text for ids-only retrieval (None if the DAG artifact is not deployed)
+        self.doc_store = load_document_store(config.DOC_STORE_PATH)
+        
+        # In-process replica of the index (None if no snapshot is deployed)
+        self.local_store = load_local_vector_store(self.embeddings, self.doc_store, config.LOCAL_INDEX_PATH)
+        
+        # Query embeddings shared by the router and every search path (and by workers, with a shared tier)
+        self.embedding_cache = layered_cache(
+            "embeddings",
+            config.MODEL_CONFIG["embeddings"]["cache_size"],
+            version=config.MODEL_CONFIG["embeddings"]["model_name"]
+        )
+        
+        # Namespace/subdomain classifier (None without a local snapshot)
+        self.router = load_namespace_router(self.local_store)
+        
+        # BM25 indexes over the document store for hybrid retrieval
+        self.lexical_store = BM25Store(self.doc_store, config.BM25_INDEX_PATH) if self.doc_store is not None else None
+        
+        # Worker threads for retrieval work that runs alongside network calls
+        self.executor = ThreadPoolExecutor(max_workers=8)
+        
+        # Separate workers for federated shard searches, which submit BM25 work to the executor above
+        self.shard_executor = ThreadPoolExecutor(max_workers=8)
+        
+        # Background deepsearch runs of progressive answers
+        self.answer_executor = ThreadPoolExecutor(max_workers=4)
+        
+        # Reranker backends by name ('onnx' is added only if the model is deployed)
+        if rerankers is not None:
+            self.cohere_client = None
+            self.rerankers = dict(rerankers)
+        else:
+            self.cohere_client = cohere.Client(api_key=config.COHERE_API_KEY, timeout=config.RERANK_CONFIG["timeout"])
+            self.rerankers = {
+                "cohere": CohereReranker(
+                    self.cohere_client,
+                    config.RERANK_CONFIG["model"],
+                    CircuitBreaker(
+                        config.RERANK_CONFIG["failure_threshold"],
+                        config.RERANK_CONFIG["reset_timeout"],
+                        config.RERANK_CONFIG["slow_threshold"]
+                    )
+                ),
+                "lexical": LexicalReranker(),
+                "noop": NoopReranker()
+            }
+            if os.path.exists(os.path.join(config.RERANK_CONFIG["onnx_model_dir"], "model.onnx")):
+                try:
+                    self.rerankers["onnx"] = OnnxCrossEncoderReranker(config.RERANK_CONFIG["onnx_model_dir"])
+                except Exception as e:
+                    logger.warning(f"Could not load ONNX reranker: {str(e)}")
+        
+        # Routing and decomposition outputs keyed by prompt version, model and query; kept in the
+        # shared tier if one is configured, else in a SQLite file that survives restarts
+        self.llm_cache = None
+        if config.LLM_CACHE_CONFIG.get("enabled", True) and uses_shared_tier("llm_outputs"):
+            self.llm_cache = layered_cache(
+                "llm_outputs",
+                config.LLM_CACHE_CONFIG["memory_size"],
+                config.LLM_CACHE_CONFIG["ttl"]
+            )
+        elif config.LLM_CACHE_CONFIG.get("enabled", True):
+            try:
+                self.llm_cache = PersistentCache(
+                    config.LLM_CACHE_CONFIG["path"],
+                    config.LLM_CACHE_CONFIG["maxsize"],
+                    config.LLM_CACHE_CONFIG["ttl"],
+                    config.LLM_CACHE_CONFIG["memory_size"]
+                )
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Could not open LLM output cache: {str(e)}")
+        
+        # Rerank results keyed by query and candidate chunk ids
+        self.rerank_cache = layered_cache("rerank", config.RERANK_CONFIG["cache_size"], config.RERANK_CONFIG["cache_ttl"])
+        
+        # Bounded per-session conversation history
+        self.conversations = ConversationMemory()
+        
+        # Final answers of one-off questions, invalidated when the document store is rebuilt;
+        # positively rated answers are pinned and negatively rated ones are never cached
+        self.answer_cache = None
+        if config.ANSWER_CACHE_CONFIG.get("enabled", True):
+            # With a shared tier the ratings are shared too, so every worker honours them
+            answer_ratings = None
+            if uses_shared_tier("answers"):
+                answer_ratings = layered_cache(
+                    "answers",
+                    config.ANSWER_CACHE_CONFIG["max_pinned"] + config.ANSWER_CACHE_CONFIG["max_excluded"],
+                    config.ANSWER_CACHE_CONFIG["rating_lookback_days"] * 86400,
+                    version="ratings",
+                    local_ttl=config.ANSWER_CACHE_CONFIG.get("ratings_refresh", 10)
+                )
+            self.answer_cache = AnswerCache(
+                config.ANSWER_CACHE_CONFIG["maxsize"],
+                config.ANSWER_CACHE_CONFIG["ttl"],
+                config.ANSWER_CACHE_CONFIG["max_pinned"],
+                config.ANSWER_CACHE_CONFIG["max_excluded"],
+                layered_cache("answers", config.ANSWER_CACHE_CONFIG["maxsize"], config.ANSWER_CACHE_CONFIG["ttl"]),
+                answer_ratings
+            )
+        self.index_version = self.doc_store.build_id if self.doc_store is not None else "unknown"
         
-        # Create memory saver for persisting state
-        self.memory_saver = MemorySaver()
+        # Precomputed answers to frequent questions, only if built for this document store build
+        self.faq_index = load_faq_index(config.FAQ_CONFIG["path"], self.index_version)
         
         # Create and compile the workflow
         self.rag_graph = self._create_workflow().compile()
         
     def get_llm(self, config_name: str) -> BaseChatModel:
         """Get the appropriate LLM based on configuration name."""
+        if config_name in self.llms:
+            return self.llms[config_name]
         if config_name == "gemini":
             model_config = config.MODEL_CONFIG["gemini"]
             return ChatGoogleGenerativeAI(
@@ -93,8 +393,8 @@ class RAGAgent:
                 max_retries=model_config["max_retries"],
                 google_api_key=model_config["api_key"]
             )
-        else:  # Default to OpenAI
-            model_config = config.MODEL_CONFIG["openai"]
+        else:  # OpenAI models, defaulting to the large one
+            model_config = config.MODEL_CONFIG.get(config_name, config.MODEL_CONFIG["openai"])
             return ChatOpenAI(
                 model=model_config["model_name"],
                 temperature=model_config["temperature"],
@@ -112,48 +412,433 @@ class RAGAgent:
         router_prompt = ChatPromptTemplate.from_template(config.ROUTER_PROMPT_TEMPLATE)
         return router_prompt | llm | StrOutputParser()
     
-    def extract_sources_from_metadata(self, docs: List[Any]) -> List[str]:
-        """Extract source URLs from document metadata."""
+    def cached_llm_output(self, step: str, template: str, llm_name: str, query: str, compute):
+        """
+        Return a cached intermediate LLM output, or compute and cache it.
+        
+        Keys combine the step, the prompt template version, the model and the
+        normalized query. Empty outputs are not cached.
+        """
+        if self.llm_cache is None:
+            return compute()
+        
+        model_name = config.MODEL_CONFIG.get(llm_name, config.MODEL_CONFIG["openai"])["model_name"]
+        key = f"{step}:{template_version(template)}:{model_name}:{normalize_query(query)}"
+        value = self.llm_cache.get(key)
+        if value is not None:
+            logger.info(f"Using cached {step} output")
+            return value
+        
+        value = compute()
+        if value:
+            self.llm_cache.set(key, value)
+        return value
+    
+    def condense_question(self, question: str, history: str) -> str:
+        """Rewrite a follow-up question as a standalone question using the conversation history."""
+        llm = self.get_llm(config.CONVERSATION_CONFIG["condense_llm"])
+        condense_prompt = ChatPromptTemplate.from_template(config.CONDENSE_PROMPT_TEMPLATE)
+        try:
+            standalone = (condense_prompt | llm | StrOutputParser()).invoke({"history": history, "question": question}).strip()
+        except Exception as e:
+            logger.warning(f"Could not rewrite follow-up question: {str(e)}")
+            return question
+        return standalone or question
+    
+    def extract_sources_from_metadata(self, docs: List[ChunkRecord]) -> List[str]:
+        """Extract source URLs from the retrieved chunks."""
         sources = []
         
         for doc in docs:
-            if hasattr(doc, 'metadata') and isinstance(doc.metadata, dict):
-                source = doc.metadata.get('source')
-                if source and isinstance(source, str):
-                    sources.append(source)
+            if doc.source and isinstance(doc.source, str):
+                sources.append(doc.source)
         
         return list(set(sources))
     
-    def rerank_documents(self, docs, query):
-        """Rerank documents using Cohere's reranking API."""
+    def rerank_documents(self, docs, query, node_config: Optional[Dict[str, Any]] = None):
+        """
+        Rerank documents with the namespace's reranker backend.
+        
+        The 'reranker' backend falls back to 'reranker_fallback' when it fails, times
+        out or has an open circuit. Results are cached per (backend, query, candidate
+        ids). Only the best rerank_max_k documents scoring at least rerank_min_score
+        are kept, each with its score in metadata['rerank_score'].
+        """
         if not docs:
             logger.warning("No documents to rerank")
             return docs
         
-        try:
-            logger.info(f"Attempting to rerank {len(docs)} documents using Cohere")
-            rerank_start = time.time()
+        node_config = node_config or {}
+        max_k = min(node_config.get("rerank_max_k") or len(docs), len(docs))
+        min_score = node_config.get("rerank_min_score", 0.0)
+        doc_keys = tuple(document_key(doc) for doc in docs)
+        docs_for_reranking = [doc.page_content for doc in docs]
+        
+        backends = [node_config.get("reranker", "cohere"), node_config.get("reranker_fallback", "lexical")]
+        results = None
+        
+        for backend in dict.fromkeys(backends):
+            reranker = self.rerankers.get(backend)
+            if reranker is None:
+                logger.warning(f"Reranker backend '{backend}' is not available")
+                continue
             
-            docs_for_reranking = [doc.page_content for doc in docs]
+            cache_key = (reranker.name, query, max_k, doc_keys)
+            results = self.rerank_cache.get(cache_key)
+            if results is not None:
+                logger.info(f"Using cached {reranker.name} rerank results for {len(docs)} documents")
+                break
             
-            rerank_response = self.cohere_client.rerank(
-                model='rerank-v3.5',
-                query=query,
-                documents=docs_for_reranking,
-                top_n=min(len(docs_for_reranking), len(docs_for_reranking) - 1)  # Ensure top_n is valid
+            try:
+                logger.info(f"Attempting to rerank {len(docs)} documents using {reranker.name}")
+                rerank_start = time.time()
+                results = reranker.rerank(query, docs_for_reranking, max_k)
+                self.rerank_cache.set(cache_key, results)
+                logger.info(f"Reranking with {reranker.name} completed in {time.time() - rerank_start:.2f} seconds")
+                break
+            except Exception as e:
+                logger.warning(f"Reranking with {reranker.name} failed: {str(e)}")
+        
+        if results is None:
+            logger.warning("All rerankers failed, using original document order")
+            return docs
+        
+        reordered_docs = []
+        
+        for index, score in results:
+            if score is not None and score < min_score:
+                continue
+            doc = docs[index]
+            if score is not None:
+                doc.metadata["rerank_score"] = score
+            reordered_docs.append(doc)
+        
+        if len(reordered_docs) < len(results):
+            logger.info(f"Dropped {len(results) - len(reordered_docs)} documents below rerank score {min_score}")
+        
+        return reordered_docs
+    
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query, reusing the vector if the same query was embedded recently."""
+        vector = self.embedding_cache.get(query)
+        if vector is None:
+            vector = self.embeddings.embed_query(query)
+            self.embedding_cache.set(query, vector)
+        return vector
+    
+    def embed_queries(self, queries: List[str]) -> None:
+        """Embed the uncached queries in one request and add them to the embedding cache."""
+        missing = [query for query in dict.fromkeys(queries) if self.embedding_cache.get(query) is None]
+        if not missing:
+            return
+        for query, vector in zip(missing, self.embeddings.embed_documents(missing)):
+            self.embedding_cache.set(query, vector)
+    
+    def route_namespace(self, question: str, namespace: str) -> Tuple[str, Optional[str], Dict[str, Any]]:
+        """
+        Narrow a broad namespace request using the centroid router.
+        
+        Returns:
+            The namespace to search, a subdomain to filter on (or None), and the routing metrics
+            (including 'namespace_routing_time')
+        """
+        if self.router is None or namespace not in config.ROUTER_CONFIG["route_namespaces"]:
+            return namespace, None, {}
+        
+        route_start = time.time()
+        try:
+            route = self.router.route(self.embed_query(question))
+        except Exception as e:
+            logger.warning(f"Namespace routing failed, searching '{namespace}': {str(e)}")
+            return namespace, None, {}
+        
+        metrics = {
+            "route_namespace_confidence": route["namespace_confidence"],
+            "route_subdomain_confidence": route["subdomain_confidence"],
+            "namespace_routing_time": time.time() - route_start
+        }
+        if not route["routed"]:
+            logger.info(f"Router not confident ({route['namespace_confidence']:.2f}), using the broad search")
+            return namespace, None, metrics
+        
+        logger.info(
+            f"Routed query to namespace '{route['namespace']}' ({route['namespace_confidence']:.2f})"
+            f" subdomain '{route['subdomain']}' ({route['subdomain_confidence']:.2f})"
+        )
+        metrics["routed_namespace"] = route["namespace"]
+        metrics["routed_subdomain"] = route["subdomain"]
+        return route["namespace"], route["subdomain"], metrics
+    
+    def get_pinecone_namespace(self, namespace: str) -> Optional[str]:
+        """Map a service namespace to a Pinecone namespace (None is the unnamed namespace)."""
+        if namespace == "default" or not namespace:
+            return None
+        return namespace
+    
+    def query_pinecone(
+        self,
+        query_vector: List[float],
+        namespace: Optional[str],
+        k: int,
+        use_doc_store: bool,
+        include_values: bool = False,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[Any], Optional[np.ndarray]]:
+        """
+        Query the Pinecone index directly and build documents from the matches.
+        
+        Args:
+            query_vector: Embedding of the query
+            namespace: Pinecone namespace (None for the unnamed namespace)
+            k: Number of matches to return
+            use_doc_store: Fetch ids/scores only and read chunk text from the document store
+            include_values: Also return the matched vectors
+            metadata_filter: Pinecone metadata filter applied inside the query
+        
+        Returns:
+            The documents and, if requested, a matrix of their vectors
+        """
+        response = self.index.query(
+            vector=query_vector,
+            top_k=k,
+            namespace=namespace or "",
+            include_values=include_values,
+            include_metadata=not use_doc_store,
+            filter=metadata_filter
+        )
+        
+        if use_doc_store:
+            stored = self.doc_store.get_chunks([match.id for match in response.matches], namespace=namespace or "")
+            stored = {doc.id: doc for doc in stored}
+        
+        docs, vectors = [], []
+        for match in response.matches:
+            if use_doc_store:
+                doc = stored.get(match.id)
+            else:
+                metadata = dict(match.metadata or {})
+                text = metadata.pop("text", None)
+                doc = ChunkRecord(match.id, text, metadata) if text is not None else None
+            if doc is None:
+                continue
+            doc.score = match.score
+            docs.append(doc)
+            vectors.append(match.values)
+        
+        return docs, (np.asarray(vectors, dtype=np.float32) if include_values else None)
+    
+    def search_mmr(
+        self,
+        query: str,
+        namespace: Optional[str],
+        k: int,
+        node_config: Dict[str, Any],
+        use_local: bool,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Any]:
+        """Over-fetch candidates with their vectors and select a diverse top-k by MMR."""
+        fetch_k = max(node_config.get("mmr_fetch_k", 4 * k), k)
+        query_vector = self.embed_query(query)
+        
+        if use_local:
+            docs, vectors = self.local_store.similarity_search_with_vectors(
+                query_vector, k=fetch_k, filter=metadata_filter, namespace=namespace
             )
+        else:
+            use_doc_store = node_config.get("ids_only", False) and self.doc_store is not None
+            docs, vectors = self.query_pinecone(
+                query_vector, namespace, fetch_k, use_doc_store, include_values=True, metadata_filter=metadata_filter
+            )
+        
+        selected = maximal_marginal_relevance(
+            np.asarray(query_vector, dtype=np.float32),
+            vectors,
+            k,
+            node_config.get("mmr_lambda", 0.5)
+        )
+        logger.info(f"MMR selected {len(selected)} of {len(docs)} candidates")
+        return [docs[i] for i in selected]
+    
+    def search_documents(
+        self,
+        query: str,
+        namespace: str,
+        k: int,
+        node_config: Dict[str, Any],
+        metrics: Optional[Dict[str, Any]] = None
+    ) -> List[Any]:
+        """
+        Retrieve the top-k documents for a query, fusing in BM25 results in hybrid mode.
+        
+        Subdomain allow-lists and max page age from the configuration are pushed down
+        into both searches as a metadata filter. Namespace aliases with 'shards' are
+        searched across all of their namespaces.
+        """
+        if node_config.get("shards"):
+            return self.federated_search(query, k, node_config, metrics if metrics is not None else {})
+        
+        metadata_filter = build_metadata_filter(node_config)
+        if metadata_filter:
+            logger.info(f"Applying metadata filter: {metadata_filter}")
+        
+        if not (node_config.get("hybrid", False) and self.lexical_store is not None):
+            return self.search_vectors(query, namespace, k, node_config, metadata_filter)
+        
+        # The in-process BM25 search runs while the vector search waits on the network
+        pinecone_namespace = self.get_pinecone_namespace(namespace)
+        lexical_future = self.executor.submit(
+            self.lexical_store.search, query, node_config.get("bm25_top_n", k), pinecone_namespace, metadata_filter
+        )
+        vector_docs = self.search_vectors(query, namespace, k, node_config, metadata_filter)
+        
+        try:
+            lexical_docs = lexical_future.result()
+        except Exception as e:
+            logger.warning(f"BM25 search failed, using vector results only: {str(e)}")
+            return vector_docs
+        
+        logger.info(f"Fusing {len(vector_docs)} vector and {len(lexical_docs)} BM25 results")
+        return reciprocal_rank_fusion([vector_docs, lexical_docs], k=config.BM25_CONFIG["rrf_k"])[:k]
+    
+    def federated_search(self, query: str, k: int, node_config: Dict[str, Any], metrics: Dict[str, Any]) -> List[Any]:
+        """
+        Search every shard namespace of an alias concurrently and merge by normalized score.
+        
+        Shards that miss the shard timeout or fail are left out, so a slow shard yields
+        partial results instead of a slow answer. Per-shard calls, time, documents,
+        timeouts and errors accumulate in metrics['shards'].
+        """
+        shards = node_config["shards"]
+        shard_config = {key: value for key, value in node_config.items() if key != "shards"}
+        timeout = node_config.get("shard_timeout", 2.0)
+        
+        def search_shard(shard):
+            start = time.time()
+            docs = self.search_documents(query, shard, k, shard_config)
+            return docs, time.time() - start
+        
+        start_time = time.time()
+        futures = {shard: self.shard_executor.submit(search_shard, shard) for shard in shards}
+        wait(futures.values(), timeout=timeout)
+        
+        merged = {}
+        shard_metrics = metrics.setdefault("shards", {})
+        for shard, future in futures.items():
+            stats = shard_metrics.setdefault(shard, {"calls": 0, "time": 0.0, "docs": 0, "timeouts": 0, "errors": 0})
+            stats["calls"] += 1
+            if not future.done():
+                future.cancel()
+                stats["timeouts"] += 1
+                stats["time"] += time.time() - start_time
+                logger.warning(f"Shard '{shard}' did not answer within {timeout:.1f}s, returning partial results")
+                continue
+            try:
+                docs, elapsed = future.result()
+            except Exception as e:
+                stats["errors"] += 1
+                stats["time"] += time.time() - start_time
+                logger.warning(f"Shard '{shard}' search failed: {str(e)}")
+                continue
+            stats["time"] += elapsed
+            stats["docs"] += len(docs)
             
-            reordered_docs = []
-            
-            for result in rerank_response.results:
-                reordered_docs.append(docs[result.index])
-            
-            logger.info(f"Reranking completed in {time.time() - rerank_start:.2f} seconds")
-            return reordered_docs
+            # Scores are only comparable within a shard, so rescale each shard to 0-1
+            scores = [doc.metadata.get("rrf_score", doc.score) for doc in docs]
+            if any(score is None for score in scores):
+                scores = [1.0 / (rank + 1) for rank in range(len(docs))]
+            low, high = (min(scores), max(scores)) if scores else (0.0, 0.0)
+            for doc, score in zip(docs, scores):
+                doc.metadata["namespace"] = shard
+                doc.metadata["federated_score"] = (score - low) / (high - low) if high > low else 1.0
+                key = document_key(doc)
+                if key not in merged or doc.metadata["federated_score"] > merged[key].metadata["federated_score"]:
+                    merged[key] = doc
+        
+        docs = sorted(merged.values(), key=lambda doc: doc.metadata["federated_score"], reverse=True)[:k]
+        logger.info(f"Federated search over {len(shards)} shards returned {len(docs)} documents in {time.time() - start_time:.2f} seconds")
+        return docs
+    
+    def search_vectors(
+        self,
+        query: str,
+        namespace: str,
+        k: int,
+        node_config: Dict[str, Any],
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Any]:
+        """Run the vector search for a query using the configured backend."""
+        pinecone_namespace = self.get_pinecone_namespace(namespace)
+        
+        if pinecone_namespace is None:
+            logger.info("Querying default (unnamed) namespace.")
+        else:
+            logger.info(f"Querying specific namespace: {namespace}")
+        
+        has_local = self.local_store is not None and self.local_store.has_namespace(pinecone_namespace)
         
+        use_local = node_config.get("backend", "pinecone") == "local"
+        if use_local and not has_local:
+            logger.warning(f"Local backend requested but namespace '{namespace}' is not in the local index, using Pinecone")
+            use_local = False
+        
+        try:
+            return self._search_backend(query, pinecone_namespace, k, node_config, use_local, metadata_filter)
         except Exception as e:
-            logger.warning(f"Cohere reranking failed, using original document order: {str(e)}")
+            if use_local or not (has_local and config.LOCAL_INDEX_CONFIG.get("fallback", True)):
+                raise
+            logger.warning(f"Pinecone search failed, falling back to the local index: {str(e)}")
+            return self._search_backend(query, pinecone_namespace, k, node_config, True, metadata_filter)
+    
+    def _search_backend(
+        self,
+        query: str,
+        namespace: Optional[str],
+        k: int,
+        node_config: Dict[str, Any],
+        use_local: bool,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Any]:
+        """Run the vector search against the local index or Pinecone."""
+        if node_config.get("mmr", False):
+            return self.search_mmr(query, namespace, k, node_config, use_local, metadata_filter)
+        
+        query_vector = self.embed_query(query)
+        if use_local:
+            results = self.local_store.similarity_search_by_vector_with_score(
+                query_vector, k=k, filter=metadata_filter, namespace=namespace
+            )
+            return [doc for doc, _ in results]
+        
+        if node_config.get("ids_only", False):
+            if self.doc_store is not None:
+                docs, _ = self.query_pinecone(
+                    query_vector, namespace, k, use_doc_store=True, metadata_filter=metadata_filter
+                )
+                return docs
+            logger.warning("ids_only retrieval requested but no document store is loaded, using metadata search")
+        
+        results = self.vectorstore.similarity_search_by_vector_with_score(
+            query_vector, k=k, filter=metadata_filter, namespace=namespace
+        )
+        return [ChunkRecord.from_document(doc, score) for doc, score in results]
+    
+    def filter_near_duplicates(self, docs: List[Any], metrics: Dict[str, Any]) -> List[Any]:
+        """Drop near-duplicate chunks and count them in the metrics."""
+        if not config.DEDUP_CONFIG.get("enabled", True):
             return docs
+        
+        docs, removed = remove_near_duplicates(docs, config.DEDUP_CONFIG["threshold"])
+        metrics["near_duplicates_removed"] = metrics.get("near_duplicates_removed", 0) + removed
+        if removed:
+            logger.info(f"Removed {removed} near-duplicate documents")
+        return docs
+    
+    def apply_recency(self, docs: List[Any], node_config: Dict[str, Any]) -> List[Any]:
+        """Re-score documents by page age when a recency half-life is configured."""
+        half_life_days = node_config.get("recency_half_life_days")
+        if not half_life_days:
+            return docs
+        return apply_recency_decay(docs, half_life_days, node_config.get("recency_weight", 0.3))
     
     # LangGraph node functions
     def route_query(self, state: RAGState) -> Dict[str, Any]:
@@ -167,7 +852,13 @@ class RAGAgent:
         query_router = self.create_query_router(llm)
         
         logger.info(f"Routing query using {llm_name}: {query}")
-        query_type = query_router.invoke({"question": query}).strip().lower()
+        query_type = self.cached_llm_output(
+            "route",
+            config.ROUTER_PROMPT_TEMPLATE,
+            llm_name,
+            query,
+            lambda: query_router.invoke({"question": query}).strip().lower()
+        )
         
         timing = state.get("timing", {})
         timing["routing"] = time.time() - start_time
@@ -192,13 +883,16 @@ class RAGAgent:
         
         logger.info(f"Decomposing complex query using {llm_name}: {query}")
         
-        try:
+        def decompose():
             decomposition_result = query_analyzer.invoke({"question": query})
             try:
-                sub_questions = decomposition_result.sub_questions
+                return decomposition_result.sub_questions
             except AttributeError:
                 logger.warning("Failed to parse SubQuery model, falling back to dict access")
-                sub_questions = decomposition_result.get("sub_questions", [])
+                return decomposition_result.get("sub_questions", [])
+        
+        try:
+            sub_questions = self.cached_llm_output("decompose", config.QUERY_ANALYZER_TEMPLATE, llm_name, query, decompose)
         except Exception as e:
             logger.error(f"Error during query decomposition: {str(e)}")
             sub_questions = []
@@ -214,58 +908,6 @@ class RAGAgent:
             "timing": timing
         }
     
-    def retrieve_documents_simple(self, state: RAGState) -> Dict[str, Any]:
-        """Retrieve documents for simple queries."""
-        query = state["query"]
-        node_config = state["config"]
-        namespace = state["namespace"]  # Get the namespace from state
-        start_time = time.time()
-        
-        top_n = node_config.get("top_n", 6)
-        should_rerank = node_config.get("rerank", True)
-        
-        logger.info(f"Retrieving documents for simple query with top_n={top_n} in namespace '{namespace}': {query}")
-        
-        if namespace == "default" or not namespace: # Check if it's default or empty/None
-             logger.info("Querying default (unnamed) namespace.")
-             docs = self.vectorstore.similarity_search(
-                 query,
-                 k=top_n,
-             )
-        else:
-             logger.info(f"Querying specific namespace: {namespace}")
-             docs = self.vectorstore.similarity_search(
-                 query,
-                 k=top_n,
-                 namespace=namespace # Add namespace parameter here for specific namespaces
-             )    
-
-        timing = state.get("timing", {})
-        timing["search"] = time.time() - start_time
-        
-        logger.info(f"Retrieved {len(docs)} documents in {timing['search']:.2f} seconds")
-        
-        if should_rerank:
-            rerank_start = time.time()
-            try:
-                docs = self.rerank_documents(docs, query)
-                timing["reranking"] = time.time() - rerank_start
-                logger.info(f"Reranking completed in {timing['reranking']:.2f} seconds")
-            except Exception as e:
-                timing["reranking"] = time.time() - rerank_start
-                logger.warning(f"Reranking failed: {str(e)}")
-        
-        sources = self.extract_sources_from_metadata(docs)
-        
-        return {
-            **state,
-            "docs": docs,
-            "sources": sources,
-            "timing": timing
-        }
-    
-   
-
     def retrieve_documents_simple(self, state: RAGState) -> Dict[str, Any]:
         """Retrieve documents for simple queries."""
         query = state["query"]
@@ -278,41 +920,40 @@ class RAGAgent:
         
         logger.info(f"Retrieving documents for simple query with top_n={top_n} in namespace '{namespace}': {query}")
         
-        if namespace == "default":
-            docs = self.vectorstore.similarity_search(query, k=top_n)
-        else:
-            docs = self.vectorstore.similarity_search(
-                query, 
-                k=top_n,
-                namespace=namespace
-            )
+        metrics = state.get("metrics", {})
+        docs = self.search_documents(query, namespace, top_n, node_config, metrics)
         
         timing = state.get("timing", {})
         timing["search"] = time.time() - start_time
         
         logger.info(f"Retrieved {len(docs)} documents in {timing['search']:.2f} seconds")
         
+        docs = self.filter_near_duplicates(docs, metrics)
+        
         if should_rerank:
             rerank_start = time.time()
             try:
-                docs = self.rerank_documents(docs, query)
+                docs = self.rerank_documents(docs, query, node_config)
                 timing["reranking"] = time.time() - rerank_start
                 logger.info(f"Reranking completed in {timing['reranking']:.2f} seconds")
             except Exception as e:
                 timing["reranking"] = time.time() - rerank_start
                 logger.warning(f"Reranking failed: {str(e)}")
         
+        docs = self.apply_recency(docs, node_config)
         sources = self.extract_sources_from_metadata(docs)
         
         return {
             **state,
             "docs": docs,
             "sources": sources,
-            "timing": timing
+            "timing": timing,
+            "metrics": metrics
         }
     
     def retrieve_documents_complex(self, state: RAGState) -> Dict[str, Any]:
         """Retrieve documents for complex queries using sub-questions."""
+        query = state["query"]
         sub_questions = state["sub_questions"]
         node_config = state["config"]
         namespace = state["namespace"]  # Get the namespace from state
@@ -320,61 +961,74 @@ class RAGAgent:
         
         top_n = node_config.get("sub_query_top_n", 3)
         should_rerank = node_config.get("rerank", True)
+        rerank_strategy = node_config.get("rerank_strategy", "sequential")
+        rerank_top_k = node_config.get("rerank_top_k")
         
         logger.info(f"Retrieving documents for {len(sub_questions)} sub-questions with top_n={top_n} in namespace '{namespace}'")
         
-        all_docs = []
+        candidates = []
+        metrics = state.get("metrics", {})
         
         for idx, sub_q in enumerate(sub_questions):
             logger.info(f"Processing sub-question {idx+1}/{len(sub_questions)}: {sub_q}")
             
-            if namespace == "default" :
-                logger.info("Querying default  namespace.")
-                sub_docs = self.vectorstore.similarity_search(
-                    sub_q,
-                    k=top_n
-                )
-            else:
-                logger.info(f"Querying specific namespace: {namespace}")
-                sub_docs = self.vectorstore.similarity_search(
-                    sub_q,
-                    k=top_n,
-                    namespace=namespace 
-                )
+            sub_docs = self.search_documents(sub_q, namespace, top_n, node_config, metrics)
                 
             logger.info(f"Retrieved {len(sub_docs)} documents for sub-question {idx+1}")
             
-            if should_rerank:
+            candidates.append(self.filter_near_duplicates(sub_docs, metrics))
+        
+        timing = state.get("timing", {})
+        timing["search"] = time.time() - start_time
+        
+        rerank_start = time.time()
+        if not should_rerank:
+            docs = self.filter_near_duplicates([doc for sub_docs in candidates for doc in sub_docs], metrics)
+        elif rerank_strategy == "merged":
+            # One rerank call over the deduplicated union, scored against the original query
+            docs = self.filter_near_duplicates([doc for sub_docs in candidates for doc in sub_docs], metrics)
+            docs = self.rerank_documents(docs, query, node_config)
+            metrics["rerank_calls"] = 1 if docs else 0
+        elif rerank_strategy == "concurrent":
+            # One rerank call per sub-question, issued together and merged by relevance score
+            futures = [
+                self.executor.submit(self.rerank_documents, sub_docs, sub_q, node_config)
+                for sub_q, sub_docs in zip(sub_questions, candidates)
+            ]
+            reranked = [doc for future in futures for doc in future.result()]
+            reranked.sort(key=lambda doc: doc.metadata.get("rerank_score", 0.0), reverse=True)
+            docs = self.filter_near_duplicates(reranked, metrics)
+            metrics["rerank_calls"] = sum(1 for sub_docs in candidates if sub_docs)
+        else:
+            all_docs = []
+            for idx, (sub_q, sub_docs) in enumerate(zip(sub_questions, candidates)):
                 try:
-                    reranked_docs = self.rerank_documents(sub_docs, sub_q)
-                    all_docs.extend(reranked_docs)
+                    all_docs.extend(self.rerank_documents(sub_docs, sub_q, node_config))
                 except Exception as e:
                     logger.warning(f"Reranking failed for sub-question {idx+1}: {str(e)}")
                     all_docs.extend(sub_docs)
-            else:
-                all_docs.extend(sub_docs)
+            # Deduplicate documents across sub-questions (exact and near-duplicates)
+            docs = self.filter_near_duplicates(all_docs, metrics)
+            metrics["rerank_calls"] = sum(1 for sub_docs in candidates if sub_docs)
         
-        # Deduplicate documents by content
-        unique_docs = {}
-        for doc in all_docs:
-            content_hash = hash(doc.page_content)
-            if content_hash not in unique_docs:
-                unique_docs[content_hash] = doc
+        if should_rerank:
+            timing["reranking"] = time.time() - rerank_start
+            logger.info(f"Reranking ({rerank_strategy}) completed in {timing['reranking']:.2f} seconds")
         
-        docs = list(unique_docs.values())
+        docs = self.apply_recency(docs, node_config)
+        if rerank_top_k:
+            docs = docs[:rerank_top_k]
         
         sources = self.extract_sources_from_metadata(docs)
         
-        timing = state.get("timing", {})
-        timing["search"] = time.time() - start_time
-        
-        logger.info(f"Retrieved {len(docs)} unique documents in {timing['search']:.2f} seconds")
+        logger.info(f"Retrieved {len(docs)} unique documents in {time.time() - start_time:.2f} seconds")
         
         return {
             **state,
             "docs": docs,
             "sources": sources,
-            "timing": timing
+            "timing": timing,
+            "metrics": metrics
         }
     
     def direct_search(self, state: RAGState) -> Dict[str, Any]:
@@ -390,36 +1044,28 @@ class RAGAgent:
         logger.info(f"Performing direct search for query with top_n={top_n} in namespace '{namespace}': {query}")
         
 
-        if namespace == "default": 
-             logger.info("Querying default (unnamed) namespace.")
-             docs = self.vectorstore.similarity_search(
-                 query,
-                 k=top_n,
-             )
-        else:
-             logger.info(f"Querying specific namespace: {namespace}")
-             docs = self.vectorstore.similarity_search(
-                 query,
-                 k=top_n,
-                 namespace=namespace 
-             )         
+        metrics = state.get("metrics", {})
+        docs = self.search_documents(query, namespace, top_n, node_config, metrics)
         
         timing = state.get("timing", {})
         timing["search"] = time.time() - start_time
         
         logger.info(f"Retrieved {len(docs)} documents in {timing['search']:.2f} seconds")
         
+        docs = self.filter_near_duplicates(docs, metrics)
+        
         if should_rerank:
             rerank_start = time.time()
             
             try:
-                docs = self.rerank_documents(docs, query)
+                docs = self.rerank_documents(docs, query, node_config)
                 timing["reranking"] = time.time() - rerank_start
                 logger.info(f"Reranking completed in {timing['reranking']:.2f} seconds")
             except Exception as e:
                 timing["reranking"] = time.time() - rerank_start
                 logger.warning(f"Reranking failed: {str(e)}")
         
+        docs = self.apply_recency(docs, node_config)
         sources = self.extract_sources_from_metadata(docs)
         
         return {
@@ -427,18 +1073,60 @@ class RAGAgent:
             "docs": docs,
             "sources": sources,
             "timing": timing,
+            "metrics": metrics,
             "query_type": "direct"
         }
     
+    def select_synthesis_llm(self, state: RAGState) -> Tuple[str, str, str]:
+        """
+        Pick the synthesis model tier for a query.
+        
+        Simple queries start at the small tier and complex ones at the large tier. The
+        tier moves up with the amount of retrieved context and down when little of the
+        latency budget is left.
+        
+        Returns:
+            The MODEL_CONFIG name, the tier and the reason for the choice
+        """
+        tier_config = config.LLM_TIER_CONFIG
+        context_tokens = sum(estimate_tokens(doc.page_content) for doc in state["docs"])
+        
+        if state.get("query_type") == "complex" or state.get("sub_questions"):
+            tier, reason = "large", "complex query"
+            if context_tokens <= tier_config["small_max_context_tokens"]:
+                tier, reason = "medium", "complex query with little context"
+        else:
+            tier, reason = "small", "simple query"
+            if context_tokens > tier_config["medium_max_context_tokens"]:
+                tier, reason = "large", "large context"
+            elif context_tokens > tier_config["small_max_context_tokens"]:
+                tier, reason = "medium", "medium context"
+        
+        remaining = tier_config["latency_budget"] - sum(state.get("timing", {}).values())
+        if tier == "large" and remaining < tier_config["large_min_remaining"]:
+            tier, reason = "medium", f"{reason}, {remaining:.1f}s of latency budget left"
+        if tier == "medium" and remaining < tier_config["medium_min_remaining"]:
+            tier, reason = "small", f"{reason}, {remaining:.1f}s of latency budget left"
+        
+        return tier_config["tiers"][tier], tier, reason
+    
     def synthesize_answer(self, state: RAGState) -> Dict[str, Any]:
         """Generate a final answer from the retrieved documents."""
         query = state["query"]
         docs = state["docs"]
         sources = state["sources"]
         node_config = state["config"]
+        metrics = state.get("metrics", {})
         start_time = time.time()
         
-        llm_name = node_config.get("llm", "openai")
+        if node_config.get("tiered_llm", False):
+            llm_name, tier, reason = self.select_synthesis_llm(state)
+            metrics["synthesis_tier"] = tier
+            metrics["synthesis_tier_reason"] = reason
+            logger.info(f"Selected {tier} synthesis tier ({llm_name}): {reason}")
+        else:
+            llm_name = node_config.get("llm", "openai")
+        metrics["llm_used"] = llm_name
         llm = self.get_llm(llm_name)
         
         logger.info(f"Synthesizing answer using {llm_name} from {len(docs)} documents")
@@ -454,6 +1142,7 @@ class RAGAgent:
                 answer = (synthesis_prompt | llm | StrOutputParser()).invoke({
                     "question": query,
                     "contexts": "\n\n".join([doc.page_content for doc in docs]),
+                    "history": state.get("history") or "None",
                     "sources": sources_list
                 })
                 
@@ -463,6 +1152,7 @@ class RAGAgent:
             except Exception as e:
                 logger.error(f"Error during answer synthesis: {str(e)}")
                 answer = f"I encountered an error while synthesizing an answer: {str(e)[:100]}..."
+                metrics["synthesis_error"] = str(e)[:200]
         
         timing = state.get("timing", {})
         timing["synthesis"] = time.time() - start_time
@@ -472,7 +1162,8 @@ class RAGAgent:
         return {
             **state,
             "answer": answer,
-            "timing": timing
+            "timing": timing,
+            "metrics": metrics
         }
     
     def determine_search_path(self, state):
@@ -531,21 +1222,63 @@ class RAGAgent:
         return workflow
 
     def initialize_graph(self):
-        """Initialize the graph by compiling it with memory checkpointing if available."""
-        try:
-            # Try to compile with checkpoint
-            self.rag_graph = self._create_workflow().compile(
-                checkpointer=self.memory_saver
-            )
-        except TypeError:
-            # Fallback to simple compile without checkpoint
-            logger.warning("Compiling without checkpoint functionality")
-            self.rag_graph = self._create_workflow().compile()
+        """
+        Recompile the graph.
         
+        Conversation context lives in the bounded ConversationMemory, so the graph is
+        compiled without a checkpointer that would keep every request's state.
+        """
+        self.rag_graph = self._create_workflow().compile()
         return self.rag_graph
     
-    def answer_question(self, question: str, namespace: str = "default", search_mode: str = "direct") -> Dict[str, Any]:
-        """Process a user question and return a comprehensive answer."""
+    def answer_cache_key(self, question: str, namespace: str, search_mode: str) -> Tuple[str, ...]:
+        """Key of a cached answer: index build, synthesis prompt version, namespace, mode and normalized question."""
+        return (
+            self.index_version,
+            template_version(config.SYNTHESIS_PROMPT_TEMPLATE),
+            namespace,
+            search_mode,
+            normalize_query(question)
+        )
+    
+    def apply_feedback(
+        self,
+        question: str,
+        namespace: str,
+        search_mode: str,
+        rating: str,
+        index_version: Optional[str] = None
+    ) -> None:
+        """
+        Pin the cached answer of a positively rated question, or evict and exclude a negatively rated one.
+        
+        Ratings given against another index version are ignored.
+        """
+        if self.answer_cache is None or (index_version is not None and index_version != self.index_version):
+            return
+        key = self.answer_cache_key(question, namespace, search_mode)
+        if rating == "negative":
+            self.answer_cache.exclude(key)
+            logger.info(f"Excluded negatively rated answer from the cache: {question}")
+        elif rating == "positive":
+            self.answer_cache.pin(key)
+            logger.info(f"Pinned positively rated answer: {question}")
+    
+    def answer_question(
+        self,
+        question: str,
+        namespace: str = "default",
+        search_mode: str = "direct",
+        session_id: Optional[str] = None,
+        remember: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Process a user question and return a comprehensive answer.
+        
+        With a session_id, the session's recent turns are used to rewrite follow-up
+        questions for retrieval and are shown to the synthesis prompt, and the new
+        turn is added to the session unless remember is False.
+        """
         logger.info("=" * 50)
         logger.info(f"Processing question in namespace '{namespace}' with search mode '{search_mode}': {question}")
         
@@ -556,20 +1289,102 @@ class RAGAgent:
             logger.warning(f"Invalid search_mode '{search_mode}', defaulting to 'direct'")
             search_mode = "direct"
         
+        # Rewrite follow-ups into standalone questions using the session history
+        timing = {}
+        history = self.conversations.get_history(session_id)
+        
+        # One-off questions may be answered from the FAQ index or the answer cache; follow-ups depend on the history
+        cache_key = None
+        answer_cache_outcome = "bypass"
+        faq_outcome = "bypass"
+        if self.answer_cache is not None and not history:
+            cache_key = self.answer_cache_key(question, namespace, search_mode)
+        
+        # Negatively rated questions skip the FAQ answer too
+        if self.faq_index is not None and not history and not (cache_key and self.answer_cache.bucket(cache_key) == "negative"):
+            faq_outcome = "miss"
+            try:
+                match = self.faq_index.lookup(self.embed_query(question), namespace, search_mode)
+            except Exception as e:
+                logger.warning(f"FAQ lookup failed: {str(e)}")
+                match = None
+            if match is not None:
+                entry, similarity = match
+                elapsed = time.time() - start_time
+                logger.info(f"Answered from the FAQ index ({similarity:.3f} similar to '{entry['question']}') in {elapsed:.3f} seconds")
+                report = {
+                    "question": question,
+                    "answer": entry["answer"],
+                    "processing_time": {"total": elapsed, "faq": elapsed},
+                    "sub_questions": entry.get("sub_questions", []),
+                    "doc_ids": entry["doc_ids"],
+                    "metrics": {
+                        **entry["metrics"],
+                        "faq": "hit",
+                        "faq_question": entry["question"],
+                        "faq_similarity": similarity,
+                        "answer_cache": answer_cache_outcome
+                    },
+                    "namespace": entry.get("answer_namespace", namespace)
+                }
+                if session_id:
+                    if remember:
+                        self.conversations.add_turn(session_id, question, report["answer"])
+                    report["session_id"] = session_id
+                return report
+        
+        if cache_key is not None:
+            cached = self.answer_cache.get(cache_key)
+            answer_cache_outcome = "miss"
+            if cached is not None:
+                elapsed = time.time() - start_time
+                logger.info(f"Answered from the answer cache in {elapsed:.3f} seconds")
+                report = {
+                    **cached,
+                    "question": question,
+                    "processing_time": {"total": elapsed, "answer_cache": elapsed},
+                    "metrics": {**cached["metrics"], "answer_cache": "hit", "faq": faq_outcome}
+                }
+                if session_id:
+                    if remember:
+                        self.conversations.add_turn(session_id, question, report["answer"])
+                    report["session_id"] = session_id
+                return report
+        
+        query = question
+        if history and config.CONVERSATION_CONFIG.get("condense_followups", True):
+            condense_start = time.time()
+            query = self.condense_question(question, history)
+            timing["condense"] = time.time() - condense_start
+            logger.info(f"Rewrote follow-up question as: {query}")
+        
+        # Narrow broad requests to the namespace/subdomain the query belongs to
+        namespace, subdomain, route_metrics = self.route_namespace(query, namespace)
+        if history:
+            route_metrics["history_tokens"] = estimate_tokens(history)
+        if "namespace_routing_time" in route_metrics:
+            timing["namespace_routing"] = route_metrics.pop("namespace_routing_time")
+        if namespace == "auto":
+            namespace = "default"
+        
         # Get configuration for this namespace and search mode
         node_config = config.get_namespace_config(namespace, search_mode)
+        if subdomain and not node_config.get("subdomains"):
+            node_config = {**node_config, "subdomains": [subdomain]}
         logger.info(f"Using configuration: {node_config}")
         
         try:
             # Initialize the state
             initial_state = {
-                "query": question,
+                "query": query,
+                "history": history,
                 "query_type": None,
                 "sub_questions": [],
                 "docs": [],
                 "answer": None,
                 "sources": [],
-                "timing": {},
+                "timing": timing,
+                "metrics": route_metrics,
                 "error": None,
                 "namespace": namespace,
                 "search_mode": search_mode,
@@ -581,7 +1396,7 @@ class RAGAgent:
                 # Try with config for thread_id support
                 result = self.rag_graph.invoke(
                     initial_state,
-                    config={"configurable": {"thread_id": namespace}},
+                    config={"configurable": {"thread_id": session_id or str(uuid.uuid4())}},
                 )
             except (TypeError, ValueError):
                 # Fallback if config is not supported
@@ -589,7 +1404,8 @@ class RAGAgent:
                 result = self.rag_graph.invoke(initial_state)
             
             total_time = time.time() - start_time
-            logger.info(f"Question answered in {total_time:.2f} seconds using {search_mode} mode with {node_config.get('llm')} LLM")
+            llm_used = result.get("metrics", {}).get("llm_used", node_config.get("llm"))
+            logger.info(f"Question answered in {total_time:.2f} seconds using {search_mode} mode with {llm_used} LLM")
             
             # Create a simplified report
             report = {
@@ -600,15 +1416,29 @@ class RAGAgent:
                     **result.get("timing", {})
                 },
                 "sub_questions": result.get("sub_questions", []),
+                "doc_ids": [doc.id for doc in result.get("docs", [])],
                 "metrics": {
                     "sources_found": len(result.get("sources", [])),
                     "documents_retrieved": len(result.get("docs", [])),
                     "query_type": result.get("query_type", "unknown"),
                     "search_mode": search_mode,
-                    "llm_used": node_config.get("llm", "unknown")
+                    "llm_used": node_config.get("llm", "unknown"),
+                    **result.get("metrics", {})
                 },
                 "namespace": namespace
             }
+            if query != question:
+                report["standalone_question"] = query
+            report["metrics"]["answer_cache"] = answer_cache_outcome
+            report["metrics"]["faq"] = faq_outcome
+            
+            if cache_key is not None and report["doc_ids"] and "synthesis_error" not in report["metrics"]:
+                self.answer_cache.set(cache_key, dict(report))
+            
+            if session_id:
+                if remember:
+                    self.conversations.add_turn(session_id, question, result["answer"])
+                report["session_id"] = session_id
             
             return report
             
@@ -626,5 +1456,75 @@ class RAGAgent:
                 "namespace": namespace,
                 "search_mode": search_mode
             }
-
-
+    
+    def answer_progressively(
+        self,
+        question: str,
+        namespace: str = "default",
+        session_id: Optional[str] = None
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Answer with the fast direct path first and the deepsearch path second.
+        
+        Both paths start immediately; the deepsearch run executes in the background
+        while the direct answer is produced. Yields ('direct', report) and then
+        ('deepsearch', report). Only the deepsearch answer is added to the session,
+        unless it fails, in which case the direct answer is kept.
+        """
+        deepsearch_future = self.answer_executor.submit(
+            self.answer_question, question, namespace, "deepsearch", session_id, False
+        )
+        direct = self.answer_question(question, namespace, "direct", session_id, remember=False)
+        direct["progressive_stage"] = "direct"
+        yield "direct", direct
+        
+        try:
+            deepsearch = deepsearch_future.result()
+        except Exception as e:
+            logger.error(f"Background deepsearch failed: {str(e)}", exc_info=True)
+            deepsearch = {"question": question, "answer": direct["answer"], "error": str(e), "namespace": namespace}
+        deepsearch["progressive_stage"] = "deepsearch"
+        
+        if session_id:
+            final = direct if deepsearch.get("error") else deepsearch
+            self.conversations.add_turn(session_id, question, final["answer"])
+        yield "deepsearch", deepsearch
+    
+    def answer_batch(self, items: List[Dict[str, Any]], max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Answer many questions at once, returning one report per item in input order.
+        
+        All questions are embedded in a single embeddings request, identical
+        (question, namespace, search mode) items are answered once, and the distinct
+        questions run concurrently. A failing item gets a report with an 'error' key
+        instead of failing the batch.
+        
+        Args:
+            items: Dicts with 'query' and optional 'namespace' and 'search_mode'
+            max_workers: Questions answered concurrently (default: BATCH_CONFIG["workers"])
+        """
+        if max_workers is None:
+            max_workers = config.BATCH_CONFIG["workers"]
+        keys = [
+            (item["query"], item.get("namespace", "default"), item.get("search_mode", "direct"))
+            for item in items
+        ]
+        distinct = list(dict.fromkeys(keys))
+        logger.info(f"Answering batch of {len(items)} questions ({len(distinct)} distinct)")
+        
+        try:
+            self.embed_queries([question for question, _, _ in distinct])
+        except Exception as e:
+            logger.warning(f"Batch embedding failed, embedding questions individually: {str(e)}")
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as batch_executor:
+            futures = {key: batch_executor.submit(self.answer_question, *key) for key in distinct}
+        
+        reports = {}
+        for key, future in futures.items():
+            try:
+                reports[key] = future.result()
+            except Exception as e:
+                logger.error(f"Batch question failed: {str(e)}", exc_info=True)
+                reports[key] = {"question": key[0], "answer": None, "error": str(e), "namespace": key[1], "search_mode": key[2]}
+        return [reports[key] for key in keys]
@@ -0,0 +1,469 @@
+"""
+Shared cache module that layers the in-process LRU caches over a tier shared by workers.
+A SQLite file (in shared memory where available) shares entries between the workers of
+one host; a Redis-protocol server shares them between hosts. Values are serialized
+compactly: float vectors as raw float32 bytes, other values as JSON, zlib-compressed
+when large. Each tier counts its hits and misses, and a failing shared tier is skipped
+for a while instead of slowing every request down.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from urllib.parse import urlparse
+import numpy as np
+import config
+from cache import LRUCache
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Returned by the local tier on a miss
+_MISSING = object()
+
+# Serialization tags: float32 vector, JSON, zlib-compressed JSON
+_VECTOR = b"V"
+_JSON = b"J"
+_COMPRESSED = b"Z"
+
+# JSON payloads from this size on are compressed
+_COMPRESS_MIN_BYTES = 256
+
+
+def encode_value(value: Any) -> bytes:
+    """Serialize a cache value: float lists as float32 bytes, anything else as (compressed) JSON."""
+    if isinstance(value, list) and value and all(isinstance(item, float) for item in value):
+        return _VECTOR + np.asarray(value, dtype=np.float32).tobytes()
+    data = json.dumps(value, separators=(",", ":")).encode("utf-8")
+    if len(data) >= _COMPRESS_MIN_BYTES:
+        return _COMPRESSED + zlib.compress(data)
+    return _JSON + data
+
+
+def decode_value(data: bytes) -> Any:
+    """Deserialize a value written by encode_value (tuples come back as lists)."""
+    tag, body = data[:1], data[1:]
+    if tag == _VECTOR:
+        return np.frombuffer(body, dtype=np.float32).tolist()
+    if tag == _COMPRESSED:
+        body = zlib.decompress(body)
+    elif tag != _JSON:
+        raise ValueError(f"Unknown cache value tag {tag!r}")
+    return json.loads(body)
+
+
+class SharedBackend(ABC):
+    """Shared tier interface: byte values under string keys, with error backoff."""
+
+    name = "base"
+
+    def __init__(self, retry_interval: float = 30):
+        """
+        Args:
+            retry_interval: Seconds the tier is skipped after a failed call
+        """
+        self.retry_interval = retry_interval
+        self.errors = 0
+        self._failed_at = None
+        self._error_lock = threading.Lock()
+
+    def available(self) -> bool:
+        """Whether calls may go to the tier (False for retry_interval seconds after an error)."""
+        failed_at = self._failed_at
+        return failed_at is None or time.monotonic() - failed_at >= self.retry_interval
+
+    def record_error(self, error: Exception) -> None:
+        """Count a failed call and skip the tier for retry_interval seconds."""
+        with self._error_lock:
+            self.errors += 1
+            if self._failed_at is None:
+                logger.warning(f"Shared {self.name} cache failed, skipping it for {self.retry_interval}s: {str(error)}")
+            self._failed_at = time.monotonic()
+
+    def record_success(self) -> None:
+        if self._failed_at is not None:
+            with self._error_lock:
+                self._failed_at = None
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the bytes stored under a key, or None."""
+
+    @abstractmethod
+    def set(self, key: str, data: bytes, ttl: Optional[float]) -> None:
+        """Store bytes under a key, expiring after ttl seconds (None to keep them)."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove a key if present."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "errors": self.errors, "available": self.available()}
+
+
+class SQLiteSharedBackend(SharedBackend):
+    """Shared tier in a SQLite file used by every worker process of a host."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, maxsize: int = 200000, timeout: float = 0.25, retry_interval: float = 30, prune_every: int = 1000):
+        """
+        Open or create the cache file.
+
+        Args:
+            path: SQLite file path; a file in /dev/shm keeps the tier in shared memory
+            maxsize: Entries kept; the oldest are evicted first
+            timeout: Seconds a call waits for another worker's write lock
+            retry_interval: Seconds the tier is skipped after an error
+            prune_every: Writes between removals of expired and excess entries
+        """
+        super().__init__(retry_interval)
+        self.path = path
+        self.maxsize = maxsize
+        self.prune_every = prune_every
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB, created REAL, expires REAL) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_created ON entries (created)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return row[0]
+
+    def set(self, key: str, data: bytes, ttl: Optional[float]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created, expires) VALUES (?, ?, ?, ?)",
+                (key, data, now, now + ttl if ttl is not None else None)
+            )
+            self._writes += 1
+            if self._writes % self.prune_every == 0:
+                self._prune(now)
+            self._conn.commit()
+
+    def _prune(self, now: float) -> None:
+        """Delete expired entries, then the oldest entries beyond maxsize."""
+        self._conn.execute("DELETE FROM entries WHERE expires < ?", (now,))
+        excess = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.maxsize
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY created LIMIT ?)", (excess,)
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {**super().stats(), "path": self.path, "size": size, "maxsize": self.maxsize}
+
+
+class RedisError(Exception):
+    """Error reply of a Redis-protocol server."""
+
+
+class RedisSharedBackend(SharedBackend):
+    """Shared tier on a Redis-protocol server, with one connection per thread."""
+
+    name = "redis"
+
+    def __init__(self, url: str = "redis://localhost:6379/0", timeout: float = 0.25, retry_interval: float = 30):
+        """
+        Args:
+            url: redis://[:password@]host[:port][/db]
+            timeout: Socket timeout in seconds
+            retry_interval: Seconds the tier is skipped after an error
+        """
+        super().__init__(retry_interval)
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.password = parsed.password
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self) -> Tuple[socket.socket, Any]:
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connection = (sock, sock.makefile("rb"))
+        try:
+            if self.password:
+                self._call(connection, ("AUTH", self.password))
+            if self.db:
+                self._call(connection, ("SELECT", self.db))
+        except Exception:
+            # Only authenticated connections on the right database are kept
+            self._close(connection)
+            raise
+        self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _close(connection: Tuple[socket.socket, Any]) -> None:
+        sock, reader = connection
+        reader.close()
+        sock.close()
+
+    def _call(self, connection: Tuple[socket.socket, Any], args: Tuple[Any, ...]) -> Any:
+        sock, reader = connection
+        parts = [arg if isinstance(arg, bytes) else str(arg).encode("utf-8") for arg in args]
+        payload = b"*%d\r\n" % len(parts) + b"".join(b"$%d\r\n%s\r\n" % (len(part), part) for part in parts)
+        sock.sendall(payload)
+        return self._read_reply(reader)
+
+    def command(self, *args: Any) -> Any:
+        """Send one command and return its decoded reply; the connection is dropped on errors."""
+        connection = getattr(self._local, "connection", None) or self._connect()
+        try:
+            return self._call(connection, args)
+        except (OSError, ConnectionError, ValueError):
+            self._local.connection = None
+            self._close(connection)
+            raise
+
+    def _read_reply(self, reader: Any) -> Any:
+        line = reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by the shared cache server")
+        prefix, body = line[:1], line[1:-2]
+        if prefix == b"+":
+            return body.decode("utf-8")
+        if prefix == b"-":
+            raise RedisError(body.decode("utf-8"))
+        if prefix == b":":
+            return int(body)
+        if prefix == b"$":
+            length = int(body)
+            return None if length < 0 else reader.read(length + 2)[:-2]
+        if prefix == b"*":
+            length = int(body)
+            return None if length < 0 else [self._read_reply(reader) for _ in range(length)]
+        raise ValueError(f"Unexpected reply {line[:20]!r}")
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.command("GET", key)
+
+    def set(self, key: str, data: bytes, ttl: Optional[float]) -> None:
+        if ttl is not None:
+            self.command("SET", key, data, "PX", int(ttl * 1000))
+        else:
+            self.command("SET", key, data)
+
+    def delete(self, key: str) -> None:
+        self.command("DEL", key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "server": f"{self.host}:{self.port}/{self.db}"}
+
+
+class LayeredCache:
+    """In-process LRU tier in front of a shared tier, with the LRUCache interface."""
+
+    def __init__(self, name: str, local: LRUCache, shared: SharedBackend, ttl: Optional[float] = None):
+        """
+        Args:
+            name: Key prefix in the shared tier (include a version that changes when values do)
+            local: In-process tier, looked up first
+            shared: Tier shared by workers, looked up on a local miss
+            ttl: Seconds entries live in the shared tier
+        """
+        self.name = name
+        self.local = local
+        self.shared = shared
+        self.ttl = ttl
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self.shared_errors = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.local)
+
+    def _key(self, key: Hashable) -> str:
+        raw = key if isinstance(key, str) else json.dumps(key, separators=(",", ":"), default=str)
+        return f"{self.name}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+    def _shared_call(self, method: str, *args: Any) -> Any:
+        """Call the shared tier, returning None if it is unavailable or fails."""
+        if not self.shared.available():
+            return None
+        try:
+            result = getattr(self.shared, method)(*args)
+        except Exception as e:
+            self.shared.record_error(e)
+            with self._lock:
+                self.shared_errors += 1
+            return None
+        self.shared.record_success()
+        return result
+
+    def _shared_get(self, key: Hashable) -> Any:
+        data = self._shared_call("get", self._key(key))
+        if data is None:
+            return _MISSING
+        try:
+            return decode_value(data)
+        except (ValueError, zlib.error) as e:
+            logger.warning(f"Dropping undecodable {self.name} entry from the shared cache: {str(e)}")
+            return _MISSING
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the value from the local tier, else from the shared tier (copying it locally), else default."""
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        value = self._shared_get(key)
+        with self._lock:
+            if value is _MISSING:
+                self.shared_misses += 1
+                return default
+            self.shared_hits += 1
+        self.local.set(key, value)
+        return value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Return the value from either tier without counting a lookup."""
+        value = self.local.peek(key, _MISSING)
+        if value is _MISSING:
+            value = self._shared_get(key)
+        return default if value is _MISSING else value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value in both tiers; values that cannot be serialized stay local."""
+        self.local.set(key, value)
+        try:
+            data = encode_value(value)
+        except (TypeError, ValueError) as e:
+            logger.debug(f"Keeping unserializable {self.name} value local: {str(e)}")
+            return
+        self._shared_call("set", self._key(key), data, self.ttl)
+
+    def delete(self, key: Hashable) -> None:
+        """Remove a key from both tiers."""
+        self.local.delete(key)
+        self._shared_call("delete", self._key(key))
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Return a snapshot of the local tier's (key, value) pairs."""
+        return self.local.items()
+
+    def clear(self) -> None:
+        """Empty the local tier and reset the counters; shared entries expire on their own."""
+        self.local.clear()
+        with self._lock:
+            self.shared_hits = 0
+            self.shared_misses = 0
+            self.shared_errors = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the combined counters and the hits and misses of each tier."""
+        local = self.local.stats()
+        with self._lock:
+            shared_lookups = self.shared_hits + self.shared_misses
+            hits = local["hits"] + self.shared_hits
+            return {
+                **local,
+                "hits": hits,
+                "misses": self.shared_misses,
+                "hit_rate": hits / (hits + self.shared_misses) if hits + self.shared_misses else 0.0,
+                "tiers": {
+                    "local": {"hits": local["hits"], "misses": local["misses"], "hit_rate": local["hit_rate"]},
+                    "shared": {
+                        "backend": self.shared.name,
+                        "hits": self.shared_hits,
+                        "misses": self.shared_misses,
+                        "errors": self.shared_errors,
+                        "hit_rate": self.shared_hits / shared_lookups if shared_lookups else 0.0
+                    }
+                }
+            }
+
+
+# Shared tier of this process, opened on first use
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def shared_backend(cache_config: Dict[str, Any] = config.SHARED_CACHE_CONFIG) -> Optional[SharedBackend]:
+    """Return the process-wide shared tier, or None if it is disabled or cannot be opened."""
+    global _backend
+    backend = cache_config.get("backend", "none")
+    if backend == "none":
+        return None
+    with _backend_lock:
+        if _backend is not None and _backend.name == backend:
+            return _backend
+        try:
+            if backend == "sqlite":
+                _backend = SQLiteSharedBackend(
+                    cache_config["sqlite_path"],
+                    cache_config["sqlite_maxsize"],
+                    cache_config["timeout"],
+                    cache_config["retry_interval"]
+                )
+            elif backend == "redis":
+                _backend = RedisSharedBackend(cache_config["redis_url"], cache_config["timeout"], cache_config["retry_interval"])
+            else:
+                logger.warning(f"Unknown shared cache backend '{backend}', using in-process caches only")
+                return None
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Could not open the shared {backend} cache: {str(e)}")
+            return None
+        logger.info(f"Using the shared {backend} cache tier")
+        return _backend
+
+
+def uses_shared_tier(name: str, cache_config: Dict[str, Any] = config.SHARED_CACHE_CONFIG) -> bool:
+    """Whether a cache is configured to be layered over an available shared tier."""
+    return name in cache_config.get("caches", ()) and shared_backend(cache_config) is not None
+
+
+def layered_cache(
+    name: str,
+    maxsize: int,
+    ttl: Optional[float] = None,
+    version: str = "",
+    cache_config: Dict[str, Any] = config.SHARED_CACHE_CONFIG,
+    local_ttl: Optional[float] = None
+) -> Any:
+    """
+    Create an in-process LRU cache, layered over the shared tier if it is enabled for this cache.
+
+    Args:
+        name: Cache name, as listed in SHARED_CACHE_CONFIG["caches"]
+        maxsize: Entries kept in the local tier
+        ttl: Seconds entries stay valid (the shared tier uses default_ttl when None)
+        version: Added to the shared keys, e.g. the model whose outputs are cached
+        local_ttl: Seconds entries stay in the local tier when shorter than ttl, so
+            changes made by other workers are seen after that long
+    """
+    local = LRUCache(maxsize, ttl if local_ttl is None else local_ttl)
+    if not uses_shared_tier(name, cache_config):
+        return local
+    prefix = ":".join(part for part in (cache_config.get("key_prefix", "askneu"), name, version) if part)
+    return LayeredCache(prefix, local, shared_backend(cache_config), ttl if ttl is not None else cache_config["default_ttl"])
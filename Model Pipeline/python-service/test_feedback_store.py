@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from feedback_store import SQLiteFeedbackStore, JsonlFeedbackStore
+
+
+def failing_once(store_class):
+    """Subclass of a feedback backend whose first write of each kind in fail_kinds raises."""
+
+    class FailingOnceStore(store_class):
+        def __init__(self, *args, fail_kinds=("answer",), **kwargs):
+            self.fail_kinds = set(fail_kinds)
+            self.attempts = []
+            super().__init__(*args, **kwargs)
+
+        def _write(self, kind, records):
+            self.attempts.append((kind, len(records)))
+            if kind in self.fail_kinds:
+                self.fail_kinds.discard(kind)
+                raise sqlite3.OperationalError("database is locked")
+            super()._write(kind, records)
+
+    return FailingOnceStore
+
+
+class TestFeedbackStoreFlush(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def make_store(self, store_class, file_name, **kwargs):
+        # A long flush interval keeps the background flusher out of the test
+        store = failing_once(store_class)(os.path.join(self.tmp_dir.name, file_name), flush_interval=3600, **kwargs)
+        self.addCleanup(store.close)
+        return store
+
+    def test_failed_write_is_retried(self):
+        """Records of a batch whose write fails are written by the next flush."""
+        store = self.make_store(SQLiteFeedbackStore, "feedback.sqlite")
+        store.record_answer("q1", "What is Canvas?", "default", "direct")
+        store.add_feedback("q1", "positive")
+
+        with self.assertRaises(sqlite3.OperationalError):
+            store.flush()
+        self.assertEqual(store.queue.qsize(), 0)
+        self.assertEqual(store.stats()["retrying"], 2)
+        self.assertEqual(store.written, 0)
+
+        store.flush()
+        self.assertEqual(store.stats()["retrying"], 0)
+        self.assertEqual(store.written, 2)
+        self.assertEqual(store._stored_answer("q1")["query"], "What is Canvas?")
+        self.assertEqual(store.get_feedback("q1")["rating"], "positive")
+
+    def test_written_kind_is_not_retried(self):
+        """When only the feedback write fails, the answers already written are not written again."""
+        store = self.make_store(JsonlFeedbackStore, "feedback.jsonl", fail_kinds=("feedback",))
+        store.record_answer("q1", "What is Canvas?", "default", "direct")
+        store.add_feedback("q1", "negative", "outdated")
+
+        with self.assertRaises(sqlite3.OperationalError):
+            store.flush()
+        store.flush()
+        self.assertEqual(store.attempts, [("answer", 1), ("feedback", 1), ("feedback", 1)])
+        with open(store.path, "r") as f:
+            self.assertEqual(len(f.readlines()), 2)
+        self.assertEqual(store.get_feedback("q1")["feedback_text"], "outdated")
+
+    def test_retry_comes_before_new_records(self):
+        """Retried records are written with the records buffered after the failure."""
+        store = self.make_store(SQLiteFeedbackStore, "feedback.sqlite", batch_size=10)
+        store.record_answer("q1", "What is Canvas?", "default", "direct")
+        with self.assertRaises(sqlite3.OperationalError):
+            store.flush()
+        store.record_answer("q2", "Where can I get Canvas support?", "default", "direct")
+
+        store.flush()
+        self.assertEqual(store.attempts[-1], ("answer", 2))
+        self.assertIsNotNone(store._stored_answer("q1"))
+        self.assertIsNotNone(store._stored_answer("q2"))
+
+    def test_get_answer_does_not_flush(self):
+        """A buffered answer context is found in memory, without writing the buffer."""
+        store = self.make_store(SQLiteFeedbackStore, "feedback.sqlite")
+        store.record_answer("q1", "What is Canvas?", "default", "direct", index_version="b1")
+
+        answer = store.get_answer("q1")
+        self.assertEqual((answer["query"], answer["index_version"]), ("What is Canvas?", "b1"))
+        self.assertEqual(store.attempts, [])
+        self.assertEqual(store.queue.qsize(), 1)
+        self.assertIsNone(store.get_answer("q2"))
+
+    def test_full_buffer_drops_without_raising(self):
+        """With the backend failing and the buffer full, records are dropped and counted instead of raising."""
+        store = self.make_store(SQLiteFeedbackStore, "feedback.sqlite", queue_size=2, fail_kinds=("answer", "feedback"))
+        store.record_answer("q1", "What is Canvas?", "default", "direct")
+        store.add_feedback("q1", "positive")
+        store.record_answer("q2", "Where can I get Canvas support?", "default", "direct")
+        store.add_feedback("q2", "negative")
+
+        self.assertEqual(store.attempts, [])
+        self.assertEqual(store.stats()["buffered"], 2)
+        self.assertEqual(store.stats()["dropped"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -16,6 +16,7 @@ const ConversationSchema = new mongoose.Schema({
   id: { type: String, required: true, index: true },
   userId: { type: String, required: true, index: true },
   title: String,
+  sessionId: String,
   messages: [MessageSchema],
   date: { type: Date, default: Date.now },
   activeConversation: Boolean,
@@ -38,18 +38,20 @@ app.use('/api/conversations', conversationRoutes);
 
 // Chat endpoint
 app.post('/api/chat', async (req, res) => {
-  const { query, namespace = "default", search_mode = "direct", userId } = req.body;
+  const { query, namespace = "default", search_mode = "direct", session_id, userId } = req.body;
 
   try {
-    console.log("🔁 Incoming Query:", { query, namespace, search_mode });
+    console.log("🔁 Incoming Query:", { query, namespace, search_mode, session_id });
 
+    // session_id links follow-up questions to the conversation memory of the Python service
     const response = await axios.post(PYTHON_SERVICE_URL, {
       query,
       namespace,
-      search_mode
+      search_mode,
+      session_id
     });
 
-    const { answer, sources, processing_time, search_mode: returnedSearchMode, query_id } = response.data;
+    const { answer, sources, processing_time, search_mode: returnedSearchMode, query_id, session_id: returnedSessionId } = response.data;
     console.log("✅ Response with query_id:", query_id);
     
     res.json({
@@ -57,7 +59,8 @@ app.post('/api/chat', async (req, res) => {
       sources: sources || [],
       query_id: query_id,
       processing_time: processing_time || 0,
-      search_mode: returnedSearchMode || search_mode
+      search_mode: returnedSearchMode || search_mode,
+      session_id: returnedSessionId || session_id
     });
   } catch (err) {
     console.error("❌ Error forwarding to Python:", err.message);
@@ -618,6 +618,7 @@ function App({ user, onLogout }) {
           query: input, 
           namespace: namespace, 
           search_mode: actualSearchMode,
+          session_id: currentConv.sessionId,
           userId: userId
         })
       });
@@ -632,6 +633,11 @@ function App({ user, onLogout }) {
       const withResponseConversations = { ...updatedConversations };
       const withResponseConv = { ...withResponseConversations[activeConversationId] };
       
+      // Keep the session so follow-up questions see the earlier turns
+      if (data.session_id) {
+        withResponseConv.sessionId = data.session_id;
+      }
+      
       // Create bot message
 	  const responseMessage = { 
 		  sender: 'bot', 
@@ -784,6 +790,7 @@ function App({ user, onLogout }) {
         query: question,
         namespace: namespace,
         search_mode: actualSearchMode,
+        session_id: currentConv.sessionId,
         userId: userId
       })
     })
@@ -798,6 +805,11 @@ function App({ user, onLogout }) {
       const withResponseConversations = { ...updatedConversations };
       const withResponseConv = { ...withResponseConversations[activeConversationId] };
       
+      // Keep the session so follow-up questions see the earlier turns
+      if (data.session_id) {
+        withResponseConv.sessionId = data.session_id;
+      }
+      
 	  const responseMessage = { 
 		  sender: 'bot', 
 		  text: data.answer || "Sorry, I couldn't generate a response.",